@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Feeds a UDP client protocol with the chat messages and user lists of a
+busy movie room, on a fake clock, and counts the calls made to the
+client proxy (the user interface), compared with the former one call
+per chat message and one call per listed user.
+"""
+from c2w.protocol.format_type import FormatType
+from c2w.protocol.udp_chat_client import c2wUdpChatClientProtocol
+from c2w.bench.fakes import FakeClock, FakeTransport, FakeMovie
+import argparse
+import json
+import time
+
+SERVER = ('127.0.0.1', 1950)
+
+
+class FakeClientProxy:
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.calls = 0
+        self.frames = set()  # Flush instants, the interface being updated once per instant
+        self.chatMessages = 0
+        self.latencies = []  # Seconds between the reception of a chat message and its display
+        self.sentAt = {}
+
+    def record(self):
+        self.calls += 1
+        self.frames.add(self.clock.seconds())
+
+    def initCompleteONE(self, userList, movieList):
+        self.record()
+
+    def setUserListONE(self, userList):
+        self.record()
+
+    def userUpdateReceivedONE(self, userName, roomName):
+        self.record()
+
+    def chatMessageReceivedONE(self, userName, message):
+        self.record()
+        self.chatMessages += 1
+        self.latencies.append(self.clock.seconds() - self.sentAt.pop(message))
+
+    def joinRoomOKONE(self):
+        self.record()
+
+
+def advanceTo(clock, when):
+    # Runs the calls due before ``when`` at their own time
+    while clock.calls and clock.calls[0][0] <= when:
+        clock.advance(max(0, clock.calls[0][0] - clock.seconds()))
+    clock.advance(when - clock.seconds())
+
+
+def run(users, duration, chatRate, listRate):
+    format = FormatType()
+    clock = FakeClock()
+    clientProxy = FakeClientProxy(clock)
+    clientProtocol = c2wUdpChatClientProtocol(SERVER[0], SERVER[1], clientProxy, 0)
+    clientProtocol.transport = FakeTransport()
+    clientProtocol.updates.clock = clock
+    sequence = [0]
+
+    def receive(pack):
+        clientProtocol.datagramReceived(pack, SERVER)
+        sequence[0] += 1
+
+    # Login, then the user is in a movie room with the other users
+    movies = [FakeMovie('Movie 1', '127.0.0.1', 1961, 1)]
+    receive(format.msg_acceptation_connexion(sequence[0]))
+    receive(format.msg_liste_des_films(movies, sequence[0]))
+    receive(format.msg_liste_des_utilisateurs_encodee(b'', sequence[0]))
+    clientProtocol.mainRoom = False
+    clientProtocol.room = 'Movie 1'
+    records = b''.join(format.encode_utilisateur('user%d' % i, 1) for i in range(users))
+
+    # Events of the room, in time order: (time, is a list)
+    events = [(i / chatRate, False) for i in range(int(duration * chatRate))]
+    events += [(i / listRate, True) for i in range(int(duration * listRate))]
+    events.sort()
+    lists = 0
+    startTime = time.perf_counter()
+    for eventTime, isList in events:
+        advanceTo(clock, eventTime)
+        if isList:
+            receive(format.msg_liste_des_utilisateurs_encodee(records, sequence[0]))
+            lists += 1
+        else:
+            message = 'message %d' % sequence[0]
+            clientProxy.sentAt[message] = clock.seconds()
+            receive(format.msg_chat(sequence[0], 'user0', message))
+    advanceTo(clock, clock.seconds() + 1)
+    elapsed = time.perf_counter() - startTime
+
+    chats = len(events) - lists
+    latencies = sorted(clientProxy.latencies)
+    return {
+        'users': users,
+        'duration': duration,
+        'chat_messages': chats,
+        'user_lists': lists,
+        'proxy_calls': clientProxy.calls - 1,
+        'former_proxy_calls': chats + lists * (1 + users),
+        'interface_updates_per_second': len(clientProxy.frames) / duration,
+        'chat_messages_shown': clientProxy.chatMessages,
+        'chat_delay_ms_max': latencies[-1] * 1000 if latencies else None,
+        'elapsed': elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='c2w client updates batching')
+    parser.add_argument('-u', '--users', dest='users', type=int,
+                        help='The number of users in the room.',
+                        default=2000)
+    parser.add_argument('-d', '--duration', dest='duration', type=float,
+                        help='The simulated duration, in seconds.',
+                        default=10)
+    parser.add_argument('--chat-rate', dest='chatRate', type=float,
+                        help='The number of chat messages received per second.',
+                        default=300)
+    parser.add_argument('--list-rate', dest='listRate', type=float,
+                        help='The number of user lists received per second.',
+                        default=10)
+    options = parser.parse_args()
+
+    # The sequence numbers of the messages have 12 bits
+    if options.duration * (options.chatRate + options.listRate) > 4000:
+        parser.error('too many messages for the sequence numbers, reduce the duration or the rates')
+    print(json.dumps(run(options.users, options.duration, options.chatRate, options.listRate), indent=2))
+
+
+if __name__ == '__main__':
+    main()
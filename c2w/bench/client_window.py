@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Links UDP clients to a UDP server through a fake network with a round
+trip time and a loss probability, on a fake clock.  A typist sends a
+burst of chat messages which a listener receives through the server:
+the time the burst takes is compared for several windows of messages
+not acknowledged yet (1 being the former stop and wait), and the
+messages are checked to be shown in the order they were typed.
+"""
+from c2w.protocol.udp_chat_client import c2wUdpChatClientProtocol
+from c2w.protocol.udp_chat_server import c2wUdpChatServerProtocol
+from c2w.bench.fakes import FakeClock, FakeLink, FakeNetwork, FakeServerProxy
+import argparse
+import random
+import json
+import time
+
+SERVER = ('127.0.0.1', 1950)
+
+
+class FakeClientProxy:
+
+    def __init__(self):
+        self.chatMessages = []
+        self.ready = False
+        self.rejected = False
+
+    def initCompleteONE(self, userList, movieList):
+        self.ready = True
+
+    def setUserListONE(self, userList):
+        pass
+
+    def chatMessageReceivedONE(self, userName, message):
+        self.chatMessages.append(message)
+
+    def joinRoomOKONE(self):
+        pass
+
+    def leaveSystemOKONE(self):
+        pass
+
+    def connectionRejectedONE(self, message):
+        self.rejected = True
+
+    def applicationQuit(self):
+        pass
+
+
+def runUntil(clock, condition, limit):
+    # Runs the pending calls in time order until the condition holds
+    while not condition() and clock.calls and clock.calls[0][0] <= limit:
+        clock.advance(max(0, clock.calls[0][0] - clock.seconds()))
+    return condition()
+
+
+def run(window, messages, rtt, lossPr, seed):
+    random.seed(seed)
+    clock = FakeClock()
+    network = FakeNetwork(clock, rtt, lossPr)
+    serverProxy = FakeServerProxy([('Movie 1', '127.0.0.1', 1960)])
+    serverProtocol = c2wUdpChatServerProtocol(serverProxy, 0)
+    serverProtocol.transport = FakeLink(network, SERVER)
+    serverProtocol.clock = clock
+    network.protocols[SERVER] = serverProtocol
+
+    clients = []
+    for index, userName in enumerate(('typist', 'listener')):
+        host_port = ('10.0.0.%d' % (index + 1), 5000)
+        clientProxy = FakeClientProxy()
+        clientProtocol = c2wUdpChatClientProtocol(SERVER[0], SERVER[1], clientProxy, lossPr)
+        clientProtocol.transport = FakeLink(network, host_port, SERVER)
+        clientProtocol.clock = clock
+        clientProtocol.updates.clock = clock
+        clientProtocol.sendWindow = window
+        network.protocols[host_port] = clientProtocol
+        clientProtocol.sendLoginRequestOIE(userName)
+        clients.append((clientProtocol, clientProxy))
+    if not runUntil(clock, lambda: all(proxy.ready for _, proxy in clients), 60):
+        raise RuntimeError('login failed')
+
+    typist, listener = clients
+    typed = ['message %d' % i for i in range(messages)]
+    startTime = time.perf_counter()
+    burstStart = clock.seconds()
+    for message in typed:
+        typist[0].sendChatMessageOIE(message)
+
+    def delivered():
+        return not typist[0].waitingMessages and not typist[0].outgoingMessages
+
+    complete = runUntil(clock, delivered, burstStart + 600)
+    burstTime = clock.seconds() - burstStart
+    runUntil(clock, lambda: len(listener[1].chatMessages) >= messages, clock.seconds() + 60)
+    elapsed = time.perf_counter() - startTime
+
+    shown = [message for message in listener[1].chatMessages if message in typed]
+    return {
+        'window': window,
+        'messages': messages,
+        'rtt_ms': rtt * 1000,
+        'loss': lossPr,
+        'complete': complete and not typist[1].rejected,
+        'burst_seconds': burstTime,
+        'messages_per_second': messages / burstTime if burstTime else None,
+        'shown_in_order': shown == typed,
+        'packets': network.packets,
+        'lost': network.lost,
+        'elapsed': elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='c2w client send window')
+    parser.add_argument('-n', '--messages', dest='messages', type=int,
+                        help='The number of chat messages of the burst.',
+                        default=200)
+    parser.add_argument('-w', '--windows', dest='windows', type=int, nargs='+',
+                        help='The windows compared.',
+                        default=[1, 4, 8])
+    parser.add_argument('--rtt', dest='rtt', type=float,
+                        help='The round trip time, in seconds.',
+                        default=0.1)
+    parser.add_argument('-l', '--loss', dest='losses', type=float, nargs='+',
+                        help='The loss probabilities compared.',
+                        default=[0, 0.05])
+    parser.add_argument('--seed', dest='seed', type=int,
+                        help='The seed of the losses.',
+                        default=1)
+    options = parser.parse_args()
+
+    results = [run(window, options.messages, options.rtt, lossPr, options.seed)
+               for lossPr in options.losses for window in options.windows]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
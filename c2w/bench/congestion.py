@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+Runs a UDP server and its clients on a fake clock, the packets being
+dropped by the LossyTransport of the protocols, and measures the fan-out
+of the chat messages of a busy main room: the goodput (chat messages
+shown per second), the retransmission ratio of the server and the delay
+of the chat messages.  The congestion window of the server is compared
+with the former behaviour, a single message in flight per user resent
+every second.
+"""
+from c2w.protocol.udp_chat_client import c2wUdpChatClientProtocol
+from c2w.protocol.udp_chat_server import c2wUdpChatServerProtocol
+from c2w.protocol.congestion import CongestionWindow
+from c2w.bench.fakes import FakeClock, FakeLink, FakeNetwork, FakeServerProxy
+import argparse
+import random
+import json
+import time
+
+SERVER = ('127.0.0.1', 1950)
+
+
+class FixedRetransmission(CongestionWindow):
+    """
+    The former behaviour: stop and wait, resent every second.
+    """
+
+    def size(self):
+        return 1
+
+    def acked(self, rtt=None, full=True):
+        pass
+
+    def timedOut(self):
+        pass
+
+    def timeout(self):
+        return 1
+
+
+class CountingMetrics:
+
+    def __init__(self):
+        self.counts = {}  # Dictionary (name, labels) -> count
+
+    def inc(self, name, labels=(), value=1):
+        self.counts[(name, labels)] = self.counts.get((name, labels), 0) + value
+
+    def total(self, name, excluded=()):
+        return sum(count for (counted, labels), count in self.counts.items()
+                   if counted == name and labels not in excluded)
+
+    def observe(self, name, value, labels=()):
+        pass
+
+
+class FakeClientProxy:
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.ready = False
+        self.latencies = []  # Seconds between the emission of a chat message and its display
+
+    def initCompleteONE(self, userList, movieList):
+        self.ready = True
+
+    def setUserListONE(self, userList):
+        pass
+
+    def chatMessageReceivedONE(self, userName, message):
+        self.latencies.append(self.clock.seconds() - float(message.split()[1]))
+
+    def joinRoomOKONE(self):
+        pass
+
+    def leaveSystemOKONE(self):
+        pass
+
+    def connectionRejectedONE(self, message):
+        pass
+
+    def applicationQuit(self):
+        pass
+
+
+def runUntil(clock, condition, limit):
+    # Runs the pending calls in time order until the condition holds
+    while not condition() and clock.calls and clock.calls[0][0] <= limit:
+        clock.advance(max(0, clock.calls[0][0] - clock.seconds()))
+    return condition()
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(mode, users, duration, chatRate, lossPr, rtt, capacity, seed):
+    random.seed(seed)
+    clock = FakeClock()
+    network = FakeNetwork(clock, rtt)
+    if capacity > 0:
+        network.limit(SERVER, capacity, capacity * rtt)
+    serverProxy = FakeServerProxy([('Movie 1', '127.0.0.1', 1960)])
+    serverProtocol = c2wUdpChatServerProtocol(serverProxy, lossPr)
+    serverProtocol.transport = FakeLink(network, SERVER)
+    serverProtocol.clock = clock
+    serverProtocol.startProtocol()
+    network.protocols[SERVER] = serverProtocol
+
+    # The users log in one after the other, without loss
+    clients = []
+    for index in range(users):
+        host_port = ('10.0.%d.%d' % (index >> 8 & 0xFF, index & 0xFF), 5000)
+        clientProxy = FakeClientProxy(clock)
+        clientProtocol = c2wUdpChatClientProtocol(SERVER[0], SERVER[1], clientProxy, lossPr)
+        clientProtocol.transport = FakeLink(network, host_port, SERVER)
+        clientProtocol.clock = clock
+        clientProtocol.updates.clock = clock
+        network.protocols[host_port] = clientProtocol
+        clientProtocol.startProtocol()
+        clients.append((clientProtocol, clientProxy))
+    serverProtocol.transport.lossPr = 0
+    for clientProtocol, clientProxy in clients:
+        clientProtocol.transport.lossPr = 0
+        clientProtocol.sendLoginRequestOIE('user%d' % len(serverProtocol.connectedUser))
+        if not runUntil(clock, lambda: clientProxy.ready, clock.seconds() + 60):
+            raise RuntimeError('login failed')
+    runUntil(clock, lambda: all(not user.waitingMessages for user in serverProtocol.connectedUser.values()),
+             clock.seconds() + 60)
+
+    for user in serverProtocol.connectedUser.values():
+        if mode == 'fixed':
+            user.congestion = FixedRetransmission()
+        else:
+            user.congestion = CongestionWindow()
+    serverProtocol.transport.lossPr = lossPr
+    for clientProtocol, clientProxy in clients:
+        clientProtocol.transport.lossPr = lossPr
+    serverProtocol.metrics = CountingMetrics()
+
+    # Every user chats at chatRate, with a random phase
+    start = clock.seconds()
+    sent = 0
+    for index, (clientProtocol, clientProxy) in enumerate(clients):
+        phase = random.random() / chatRate
+        for i in range(int(duration * chatRate)):
+            sendTime = start + phase + i / chatRate
+            clock.callLater(sendTime - start, clientProtocol.sendChatMessageOIE, '%d %.6f' % (index, sendTime))
+            sent += 1
+    expected = sent * (users - 1)
+
+    def shown():
+        return sum(len(clientProxy.latencies) for _, clientProxy in clients)
+
+    startTime = time.perf_counter()
+    runUntil(clock, lambda: False, start + duration)
+    shownInTime = shown()
+    runUntil(clock, lambda: shown() >= expected, start + duration + 120)
+    elapsed = time.perf_counter() - startTime
+
+    retransmissions = serverProtocol.metrics.total('c2w_retransmissions_total')
+    # The acks sent by the server are not retransmitted
+    packets = serverProtocol.metrics.total('c2w_packets_sent_total', excluded=[(('type', 0),)])
+    latencies = sorted(latency for _, clientProxy in clients for latency in clientProxy.latencies)
+    return {
+        'mode': mode,
+        'loss': lossPr,
+        'users': users,
+        'chat_messages_expected': expected,
+        'chat_messages_shown': len(latencies),
+        'goodput_per_second': shownInTime / duration,
+        'offered_per_second': expected / duration,
+        'server_packets': packets,
+        'retransmission_ratio': retransmissions / (packets - retransmissions) if packets > retransmissions else None,
+        'queue_overflows': network.overflows,
+        'delay_p50': percentile(latencies, 0.5),
+        'delay_p99': percentile(latencies, 0.99),
+        'users_connected': len(serverProtocol.connectedUser),
+        'elapsed': elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='c2w server congestion control')
+    parser.add_argument('-u', '--users', dest='users', type=int,
+                        help='The number of users in the main room.',
+                        default=20)
+    parser.add_argument('-d', '--duration', dest='duration', type=float,
+                        help='The simulated duration of the chat, in seconds.',
+                        default=60)
+    parser.add_argument('--chat-rate', dest='chatRate', type=float,
+                        help='The number of chat messages sent by each user per second.',
+                        default=0.3)
+    parser.add_argument('-l', '--loss', dest='losses', type=float, nargs='+',
+                        help='The loss probabilities compared.',
+                        default=[0.01, 0.05, 0.1, 0.2, 0.3])
+    parser.add_argument('--rtt', dest='rtt', type=float,
+                        help='The round trip time, in seconds.',
+                        default=0.05)
+    parser.add_argument('--capacity', dest='capacity', type=float,
+                        help='The packets per second of the server link (0 for no limit), '
+                             'its queue holds one round trip of packets.',
+                        default=0)
+    parser.add_argument('--seed', dest='seed', type=int,
+                        help='The seed of the losses.',
+                        default=1)
+    options = parser.parse_args()
+
+    # The sequence numbers of the messages have 12 bits
+    if options.duration * options.chatRate * options.users > 3500:
+        parser.error('too many messages for the sequence numbers, reduce the duration, the rate or the users')
+    results = [run(mode, options.users, options.duration, options.chatRate, lossPr,
+                   options.rtt, options.capacity, options.seed)
+               for lossPr in options.losses for mode in ('fixed', 'aimd')]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+In-memory stand-ins for the clock, the transport, the network and the
+server proxy, used to run the protocols without sockets (replay and
+benchmarks).
+"""
+import itertools
+import random
+import heapq
+
+
+class FakeDelayedCall:
+
+    def __init__(self, time, func, args, kw):
+        self.time = time
+        self.func = func
+        self.args = args
+        self.kw = kw
+        self.cancelled = False
+        self.called = False
+
+    def getTime(self):
+        return self.time
+
+    def active(self):
+        return not (self.cancelled or self.called)
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class FakeClock:
+    """
+    Replaces the reactor for the ``callLater`` calls of the protocols.
+    Unlike :py:class:`twisted.internet.task.Clock`, which sorts all its
+    calls on every ``callLater``, the calls are kept in a heap: the
+    protocols leave thousands of retransmission calls pending.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self.calls = []  # Heap of (time, order, FakeDelayedCall)
+        self.order = itertools.count()
+
+    def seconds(self):
+        return self.now
+
+    def callLater(self, delay, func, *args, **kw):
+        call = FakeDelayedCall(self.now + delay, func, args, kw)
+        heapq.heappush(self.calls, (call.time, next(self.order), call))
+        return call
+
+    def advance(self, amount):
+        self.now += amount
+        while self.calls and self.calls[0][0] <= self.now:
+            call = heapq.heappop(self.calls)[2]
+            if call.active():
+                call.called = True
+                call.func(*call.args, **call.kw)
+
+
+class FakeTransport:
+
+    def __init__(self, keep=False):
+        self.keep = keep
+        self.packets = 0
+        self.written = []  # List of (data, host_port), only filled when keep is set
+
+    def write(self, data, host_port=None):
+        self.packets += 1
+        if self.keep:
+            self.written.append((data, host_port))
+
+    def loseConnection(self):
+        pass
+
+
+class FakeLink:
+    """
+    Transport of one end of a :py:class:`FakeNetwork`.
+    """
+
+    def __init__(self, network, source, destination=None):
+        self.network = network
+        self.source = source
+        self.destination = destination  # Used when write is called without an address (TCP)
+
+    def write(self, data, host_port=None):
+        self.network.deliver(self.source, host_port or self.destination, data)
+
+    def loseConnection(self):
+        pass
+
+
+class FakeNetwork:
+    """
+    Delivers the packets written on its links to the protocols, half a
+    round trip later, on a fake clock.  A part of the packets is lost at
+    random, and the links given a capacity (packets per second) queue
+    their packets, dropping them once ``queue`` packets are waiting.
+    """
+
+    def __init__(self, clock, rtt, lossPr=0):
+        self.clock = clock
+        self.rtt = rtt
+        self.lossPr = lossPr
+        self.protocols = {}  # Dictionary host_port -> protocol
+        self.capacities = {}  # Dictionary host_port -> (packets per second, queue)
+        self.departures = {}  # Dictionary host_port -> time the last queued packet leaves
+        self.packets = 0
+        self.lost = 0
+        self.overflows = 0
+
+    def limit(self, host_port, capacity, queue):
+        self.capacities[host_port] = (capacity, queue)
+
+    def deliver(self, source, destination, data):
+        self.packets += 1
+        if random.random() < self.lossPr:
+            self.lost += 1
+            return
+        delay = self.rtt / 2
+        if source in self.capacities:
+            capacity, queue = self.capacities[source]
+            now = self.clock.seconds()
+            departure = max(now, self.departures.get(source, 0)) + 1 / capacity
+            if (departure - now) * capacity > queue:
+                self.overflows += 1
+                return
+            self.departures[source] = departure
+            delay += departure - now
+        self.clock.callLater(delay, self.protocols[destination].datagramReceived, data, source)
+
+
+class FakeUser:
+
+    def __init__(self, userName, userChatRoom, userChatInstance, userAddress):
+        self.userName = userName
+        self.userChatRoom = userChatRoom
+        self.userChatInstance = userChatInstance
+        self.userAddress = userAddress
+
+
+class FakeMovie:
+
+    def __init__(self, movieTitle, movieIpAddress, moviePort, movieId):
+        self.movieTitle = movieTitle
+        self.movieIpAddress = movieIpAddress
+        self.moviePort = moviePort
+        self.movieId = movieId
+
+
+class FakeServerProxy:
+    """
+    Implements the part of the server proxy used by the server protocols,
+    with the same linear lookups as the real one.  It counts the calls
+    made to start and stop the movie streams.
+    """
+
+    def __init__(self, movies):
+        self.users = []
+        self.movies = [FakeMovie(title, ip, port, movieId)
+                       for movieId, (title, ip, port) in enumerate(movies, 1)]
+        self.streamingStarted = 0
+        self.streamingStopped = 0
+
+    def getUserList(self):
+        return self.users
+
+    def getMovieList(self):
+        return self.movies
+
+    def getUserByName(self, userName):
+        for user in self.users:
+            if user.userName == userName:
+                return user
+        return None
+
+    def getMovieByTitle(self, movieTitle):
+        for movie in self.movies:
+            if movie.movieTitle == movieTitle:
+                return movie
+        return None
+
+    def userExists(self, userName):
+        return self.getUserByName(userName) is not None
+
+    def addUser(self, userName, userChatRoom, userChatInstance=None, userAddress=None):
+        self.users.append(FakeUser(userName, userChatRoom, userChatInstance, userAddress))
+
+    def removeUser(self, userName):
+        self.users.remove(self.getUserByName(userName))
+
+    def updateUserChatroom(self, userName, userChatRoom):
+        self.getUserByName(userName).userChatRoom = userChatRoom
+
+    def startStreamingMovie(self, movieTitle):
+        self.streamingStarted += 1
+
+    def stopStreamingMovie(self, movieTitle):
+        self.streamingStopped += 1
@@ -0,0 +1,381 @@
+# -*- coding: utf-8 -*-
+from twisted.internet.protocol import DatagramProtocol, Protocol, ClientFactory
+from twisted.internet import reactor, task
+import c2w.main.constants as c2w_constants
+import c2w.protocol.constants as constants
+from c2w.protocol.format_type import FormatType
+from c2w.protocol.message import Message
+from collections import deque
+import resource
+import random
+import json
+import time
+import os
+import logging
+
+logging.basicConfig()
+moduleLogger = logging.getLogger('c2w.bench.load_generator')
+
+# Delay (in seconds) before a message without acknowledgement is sent again
+RESEND_DELAY = 1
+# Time left to the simulated clients to leave the server at the end of a run
+GRACE_PERIOD = 3
+
+
+def percentile(values, pr):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pr / 100.0 * (len(values) - 1))))
+    return values[index]
+
+
+def processCpuTime(pid):
+    # CPU time (user + system) of another process, read from /proc (Linux only)
+    try:
+        with open('/proc/%d/stat' % pid) as stat:
+            fields = stat.read().rsplit(')', 1)[1].split()
+    except (OSError, IndexError):
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+class LoadStatistics:
+
+    def __init__(self):
+        self.packetsSent = 0
+        self.packetsReceived = 0
+        self.retransmissions = 0
+        self.logins = 0
+        self.rejected = 0
+        self.failures = 0
+        self.roomChanges = 0
+        self.chatSent = 0
+        self.chatDelivered = 0
+        self.latencies = []  # Chat delivery latencies, in seconds
+
+    def report(self, elapsed, cpu, serverCpu=None):
+        latencies = self.latencies
+        report = {
+            'elapsed': elapsed,
+            'logins': self.logins,
+            'rejected': self.rejected,
+            'failures': self.failures,
+            'room_changes': self.roomChanges,
+            'packets_sent': self.packetsSent,
+            'packets_received': self.packetsReceived,
+            'msgs_per_second': (self.packetsSent + self.packetsReceived) / elapsed,
+            'chat_sent': self.chatSent,
+            'chat_delivered': self.chatDelivered,
+            'chat_delivered_per_second': self.chatDelivered / elapsed,
+            'retransmissions': self.retransmissions,
+            'latency_ms': {
+                'p50': None if not latencies else percentile(latencies, 50) * 1000,
+                'p99': None if not latencies else percentile(latencies, 99) * 1000,
+                'max': None if not latencies else max(latencies) * 1000,
+            },
+            'cpu': {
+                'seconds': cpu,
+                'percent': 100.0 * cpu / elapsed,
+            },
+        }
+        if serverCpu is not None:
+            report['server_cpu'] = {
+                'seconds': serverCpu,
+                'percent': 100.0 * serverCpu / elapsed,
+            }
+        return report
+
+
+class SimulatedClient:
+    """
+    Transport independent part of a simulated c2w client.  It implements
+    the stop-and-wait emission of the c2w protocol (one message waiting
+    for its acknowledgement at a time) and acknowledges every message
+    received from the server.
+
+    Subclasses must implement :py:meth:`writePackage`.
+    """
+
+    def __init__(self, index, generator):
+        self.index = index
+        self.generator = generator
+        self.stats = generator.stats
+        self.userName = 'load%05d' % index
+        self.format = FormatType()
+
+        # Message number in the header of the messages
+        self.numMessage = 0
+        # Received counter
+        self.receivedCounter = 0
+        # Messages waiting to be sent (Type Message)
+        self.outgoing = deque()
+        self.waitingMessage = None
+        self.waitingSequence = None
+        self.resendCall = None
+
+        self.movies = []
+        self.room = None
+        self.loops = []
+        self.stopped = False
+
+    def writePackage(self, pack):
+        raise NotImplementedError
+
+    def login(self):
+        self.queueMessage(self.format.msg_connexion(self.numMessage, self.userName), constants.CONNEXION)
+
+    def logout(self):
+        if self.room is not None and not self.stopped:
+            self.queueMessage(self.format.msg_quitter_app(self.numMessage), constants.QUITTER_APP)
+        self.stop()
+
+    def stop(self):
+        for loop in self.loops:
+            if loop.running:
+                loop.stop()
+        self.loops = []
+        self.stopped = True
+
+    def startActivity(self):
+        options = self.generator
+        if options.chatRate > 0:
+            loop = task.LoopingCall(self.chat)
+            self.loops.append(loop)
+            # Random phase so that the clients do not chat all at the same time
+            reactor.callLater(random.random() / options.chatRate, self.startLoop, loop, 1.0 / options.chatRate)
+        if options.hopRate > 0:
+            loop = task.LoopingCall(self.hop)
+            self.loops.append(loop)
+            reactor.callLater(random.random() / options.hopRate, self.startLoop, loop, 1.0 / options.hopRate)
+
+    def startLoop(self, loop, interval):
+        if not self.stopped and not loop.running:
+            loop.start(interval, now=True)
+
+    def chat(self):
+        # Never pile up chat messages behind a message still waiting for its ack
+        if self.outgoing:
+            return
+        text = '%d %.6f' % (self.index, time.monotonic())
+        self.queueMessage(self.format.msg_chat(self.numMessage, self.userName, text), constants.CHAT)
+        self.stats.chatSent += 1
+
+    def hop(self):
+        if self.outgoing or not self.movies:
+            return
+        if self.room == c2w_constants.ROOM_IDS.MAIN_ROOM:
+            self.room = random.choice(self.movies)[0]
+            self.queueMessage(self.format.msg_selection_film(self.numMessage, self.room), constants.SELECTION_FILM)
+        else:
+            self.room = c2w_constants.ROOM_IDS.MAIN_ROOM
+            self.queueMessage(self.format.msg_quitter_salon(self.numMessage), constants.QUITTER_FILM)
+        self.stats.roomChanges += 1
+
+    def queueMessage(self, pack, type):
+        self.outgoing.append((self.numMessage, Message(pack, type)))
+        self.numMessage += 1
+        self.sendNext()
+
+    def sendNext(self):
+        if self.waitingMessage is None and self.outgoing:
+            self.waitingSequence, self.waitingMessage = self.outgoing.popleft()
+            self.writePackage(self.waitingMessage.data)
+            self.resendCall = reactor.callLater(RESEND_DELAY, self.resendPackage)
+
+    def resendPackage(self):
+        message = self.waitingMessage
+        if message is None:
+            return
+        if message.attempsCounter < constants.MAX_ATTEMPS_RESEND:
+            message.attempsCounter += 1
+            self.stats.retransmissions += 1
+            self.writePackage(message.data)
+            self.resendCall = reactor.callLater(RESEND_DELAY, self.resendPackage)
+        else:
+            # The server is not answering anymore, give up this client
+            self.stats.failures += 1
+            self.waitingMessage = None
+            self.outgoing.clear()
+            self.stop()
+
+    def messageReceived(self, longueur, num_sequence, type, info):
+        self.stats.packetsReceived += 1
+
+        # Acknowledge what the server sends in order only: nothing is kept ahead of a lost message
+        if type != constants.ACQUITTEMENT and num_sequence <= self.receivedCounter:
+            self.writePackage(self.format.msg_acquittemen(num_sequence))
+
+        if type == constants.ACQUITTEMENT:
+            if self.waitingMessage is not None and num_sequence == self.waitingSequence:
+                self.waitingMessage.sended = True
+                self.waitingMessage = None
+                if self.resendCall is not None and self.resendCall.active():
+                    self.resendCall.cancel()
+                self.resendCall = None
+                self.sendNext()
+            return
+
+        if num_sequence != self.receivedCounter:
+            return
+        self.receivedCounter += 1
+
+        # Format Type 7 : Acceptation connexion
+        if type == constants.ACCEPTATION_UTILISATEUR:
+            self.room = c2w_constants.ROOM_IDS.MAIN_ROOM
+            self.stats.logins += 1
+            self.startActivity()
+
+        # Type 5: liste des films
+        if type == constants.LISTE_FILMS:
+            self.movies = self.format.get_movie_list(info)
+
+        # Format Type 8 : Refus de connexion
+        if type == constants.REFUS_CONNEXION:
+            self.stats.rejected += 1
+            self.stop()
+
+        # Format Type 9 : Chat
+        if type == constants.CHAT:
+            sentAt = float(info[1].split()[1])
+            self.stats.latencies.append(time.monotonic() - sentAt)
+            self.stats.chatDelivered += 1
+
+
+class SimulatedUdpClient(SimulatedClient, DatagramProtocol):
+
+    def writePackage(self, pack):
+        self.stats.packetsSent += 1
+        self.transport.write(pack, (self.generator.host, self.generator.port))
+
+    def datagramReceived(self, datagram, host_port):
+        self.messageReceived(*self.format.datagram_received(datagram))
+
+
+class SimulatedTcpClient(SimulatedClient, Protocol):
+
+    def connectionMade(self):
+        self.login()
+
+    def writePackage(self, pack):
+        self.stats.packetsSent += 1
+        self.transport.write(pack)
+
+    def dataReceived(self, data):
+        # One call may hold several messages, drain the FormatType buffer
+        info = self.format.datagram_received_tcp(data)
+        while info is not None:
+            self.format.messageComplete = False
+            self.messageReceived(*info)
+            info = self.format.datagram_received_tcp(b'')
+
+
+class SimulatedTcpClientFactory(ClientFactory):
+
+    def __init__(self, client):
+        self.client = client
+
+    def buildProtocol(self, addr):
+        return self.client
+
+    def clientConnectionFailed(self, connector, reason):
+        self.client.stats.failures += 1
+
+
+class LoadGenerator:
+    """
+    Simulates ``clients`` c2w clients (UDP or TCP) against a local server.
+    The clients log in at ``loginRate`` logins per second, then each of
+    them sends ``chatRate`` chat messages and ``hopRate`` room changes per
+    second until ``duration`` seconds have elapsed.
+    """
+
+    def __init__(self, protocol, host, port, clients, duration,
+                 loginRate, chatRate, hopRate, serverPid=None):
+        self.protocol = protocol
+        self.host = host
+        self.port = port
+        self.clients = clients
+        self.duration = duration
+        self.loginRate = loginRate
+        self.chatRate = chatRate
+        self.hopRate = hopRate
+        self.serverPid = serverPid
+
+        self.stats = LoadStatistics()
+        self.simulatedClients = []
+        self.report = None
+
+    def start(self):
+        self.startTime = time.monotonic()
+        self.startCpu = sum(os.times()[:2])
+        self.startServerCpu = None if self.serverPid is None else processCpuTime(self.serverPid)
+
+        self.loginLoop = task.LoopingCall(self.addClient)
+        self.loginLoop.start(1.0 / self.loginRate, now=True)
+        reactor.callLater(self.duration, self.stop)
+
+    def addClient(self):
+        index = len(self.simulatedClients)
+        if index >= self.clients:
+            self.loginLoop.stop()
+            return
+        if self.protocol == 'UDP':
+            client = SimulatedUdpClient(index, self)
+            reactor.listenUDP(0, client)
+            client.login()
+        else:
+            client = SimulatedTcpClient(index, self)
+            reactor.connectTCP(self.host, self.port, SimulatedTcpClientFactory(client))
+        self.simulatedClients.append(client)
+
+    def stop(self):
+        elapsed = time.monotonic() - self.startTime
+        cpu = sum(os.times()[:2]) - self.startCpu
+        serverCpu = None
+        if self.startServerCpu is not None:
+            serverCpu = processCpuTime(self.serverPid) - self.startServerCpu
+
+        if self.loginLoop.running:
+            self.loginLoop.stop()
+        for client in self.simulatedClients:
+            client.logout()
+
+        self.report = self.stats.report(elapsed, cpu, serverCpu)
+        self.report.update({
+            'protocol': self.protocol,
+            'clients': len(self.simulatedClients),
+            'duration': self.duration,
+            'login_rate': self.loginRate,
+            'chat_rate': self.chatRate,
+            'hop_rate': self.hopRate,
+        })
+        reactor.callLater(GRACE_PERIOD, reactor.stop)
+
+
+def raiseFileLimit():
+    # Every simulated client owns a socket
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def LoadStart(protocol, host, port, clients, duration, loginRate, chatRate,
+              hopRate, serverPid, outputFile, debugFlag):
+    if debugFlag:
+        moduleLogger.setLevel(logging.DEBUG)
+    raiseFileLimit()
+
+    generator = LoadGenerator(protocol, host, port, clients, duration,
+                              loginRate, chatRate, hopRate, serverPid)
+    reactor.callWhenRunning(generator.start)
+    reactor.run()
+
+    moduleLogger.debug('load generator report: %s', generator.report)
+    text = json.dumps(generator.report, indent=2, sort_keys=True)
+    if outputFile is None:
+        print(text)
+    else:
+        with open(outputFile, 'w') as output:
+            output.write(text + '\n')
+    return generator.report
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+import c2w.protocol.constants as constants
+import c2w.protocol.capture as capture
+from c2w.protocol.format_type import FormatType
+from c2w.protocol.udp_chat_server import c2wUdpChatServerProtocol
+from c2w.protocol.tcp_chat_server import c2wTcpChatServerProtocol
+from c2w.bench.fakes import FakeClock, FakeTransport, FakeServerProxy
+import json
+import time
+import os
+import logging
+
+logging.basicConfig()
+moduleLogger = logging.getLogger('c2w.bench.replay')
+
+# Movies used when the capture does not contain any movie list
+DEFAULT_MOVIES = [('Movie %d' % i, '127.0.0.1', 1960 + i) for i in range(1, 6)]
+
+
+def capturedMovies(records):
+    # The movie list is taken from the first Type 5 message sent by the server
+    format = FormatType()
+    for timestamp, direction, host_port, data in records:
+        if direction == capture.SENT and len(data) > constants.SIZE_ENTETE and data[3] & 0xF == constants.LISTE_FILMS:
+            return format.get_movie_list(format.datagram_received(data)[3])
+    return DEFAULT_MOVIES
+
+
+def replay(records, movies, transportType=capture.UDP):
+    """
+    Feeds the received packets of a capture to a
+    :py:class:`c2wUdpChatServerProtocol`, or to a
+    :py:class:`c2wTcpChatServerProtocol` per client for a TCP capture,
+    running against a fake transport and a fake clock.  The clock
+    follows the timestamps of the capture, so that the retransmissions
+    fire as they did, but the packets are replayed as fast as possible.
+    """
+    clock = FakeClock()
+    transport = FakeTransport()
+    serverProxy = FakeServerProxy(movies)
+    if transportType == capture.UDP:
+        serverProtocol = c2wUdpChatServerProtocol(serverProxy, 0)
+        serverProtocol.transport = transport
+        serverProtocol.clock = clock
+        receive = serverProtocol.datagramReceived
+    else:
+        connections = {}  # Dictionary host_port -> protocol of the connection of the client
+
+        def receive(data, host_port):
+            if host_port not in connections:
+                connections[host_port] = c2wTcpChatServerProtocol(serverProxy, host_port[0], host_port[1])
+                connections[host_port].transport = transport
+                connections[host_port].clock = clock
+            connections[host_port].dataReceived(data)
+
+    packets = 0
+    firstTimestamp = None
+    startTime = time.perf_counter()
+    startCpu = sum(os.times()[:2])
+
+    for timestamp, direction, host_port, data in records:
+        if direction != capture.RECEIVED:
+            continue
+        if firstTimestamp is None:
+            firstTimestamp = timestamp
+        if timestamp - firstTimestamp > clock.seconds():
+            clock.advance(timestamp - firstTimestamp - clock.seconds())
+        receive(data, host_port)
+        packets += 1
+
+    elapsed = time.perf_counter() - startTime
+    cpu = sum(os.times()[:2]) - startCpu
+    return {
+        'packets_replayed': packets,
+        'packets_sent': transport.packets,
+        'captured_seconds': clock.seconds(),
+        'elapsed': elapsed,
+        'cpu': cpu,
+        'packets_per_second': packets / elapsed if elapsed > 0 else None,
+        'connected_users': len(serverProxy.getUserList()),
+    }
+
+
+def ReplayStart(captureFile, repeat, outputFile, debugFlag):
+    if debugFlag:
+        moduleLogger.setLevel(logging.DEBUG)
+
+    # The whole capture is decoded first, so that only the protocol is measured
+    transportType = capture.readTransport(captureFile)
+    records = list(capture.readCapture(captureFile))
+    movies = capturedMovies(records)
+    moduleLogger.debug('%d records read from %s', len(records), captureFile)
+
+    runs = [replay(records, movies, transportType) for i in range(repeat)]
+    report = {
+        'capture': captureFile,
+        'transport': 'UDP' if transportType == capture.UDP else 'TCP',
+        'records': len(records),
+        'runs': runs,
+        'best_packets_per_second': max(run['packets_per_second'] or 0 for run in runs),
+    }
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if outputFile is None:
+        print(text)
+    else:
+        with open(outputFile, 'w') as output:
+            output.write(text + '\n')
+    return report
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Profiles a room change in a crowded UDP server: ``users`` users are
+logged in (a part of them watching movies), then one of them chooses a
+movie, which sends the new user lists to the main room and to the
+movie room.  The users are set up directly in the protocol and the
+server proxy, the logins themselves are not profiled.
+"""
+import c2w.main.constants as c2w_constants
+from c2w.protocol.format_type import FormatType
+from c2w.protocol.udp_chat_server import c2wUdpChatServerProtocol
+from c2w.protocol.user import User
+from c2w.bench.fakes import FakeClock, FakeTransport, FakeServerProxy
+import cProfile
+import argparse
+import pstats
+import time
+
+
+def setUp(users, movies, watchingPr):
+    titles = ['Movie %d' % i for i in range(1, movies + 1)]
+    serverProxy = FakeServerProxy([(title, '127.0.0.1', 1960 + i) for i, title in enumerate(titles)])
+    serverProtocol = c2wUdpChatServerProtocol(serverProxy, 0)
+    serverProtocol.transport = FakeTransport()
+    serverProtocol.clock = FakeClock()
+
+    for index in range(users):
+        userName = 'user%d' % index
+        host_port = ('10.%d.%d.%d' % (index >> 16 & 0xFF, index >> 8 & 0xFF, index & 0xFF), 5000)
+        userId = '%s:%d' % host_port
+        user = User(host_port, userName)
+        # As after the login: the connection request received, nothing waiting for an ack
+        user.receptionCounter = 1
+        serverProtocol.connectedUser[userId] = user
+        serverProxy.addUser(userName, c2w_constants.ROOM_IDS.MAIN_ROOM, userChatInstance=None, userAddress=host_port)
+        serverProtocol.index.addUser(userName, c2w_constants.ROOM_IDS.MAIN_ROOM)
+        # Every (1 / watchingPr)th user watches a movie
+        if watchingPr > 0 and index % int(round(1 / watchingPr)) == 1:
+            room = titles[index % movies]
+            serverProxy.updateUserChatroom(userName, room)
+            serverProtocol.index.moveUser(userName, room)
+            serverProtocol.joinMovie(room)
+    return serverProtocol, titles
+
+
+def main():
+    parser = argparse.ArgumentParser(description='c2w room change profile')
+    parser.add_argument('-u', '--users', dest='users', type=int,
+                        help='The number of users logged in.',
+                        default=5000)
+    parser.add_argument('-m', '--movies', dest='movies', type=int,
+                        help='The number of movies.',
+                        default=5)
+    parser.add_argument('-w', '--watching', dest='watchingPr', type=float,
+                        help='The part of the users watching a movie.',
+                        default=0.1)
+    parser.add_argument('-l', '--lines', dest='lines', type=int,
+                        help='The number of functions of the profile printed.',
+                        default=15)
+    options = parser.parse_args()
+
+    serverProtocol, titles = setUp(options.users, options.movies, options.watchingPr)
+    userId, user = next(iter(serverProtocol.connectedUser.items()))
+    pack = FormatType().msg_selection_film(user.receptionCounter, titles[0])
+
+    profile = cProfile.Profile()
+    startTime = time.perf_counter()
+    profile.runcall(serverProtocol.datagramReceived, pack, user.host_port)
+    elapsed = time.perf_counter() - startTime
+
+    print('%d users, room change handled in %.3f s (profiled), %d packets sent'
+          % (options.users, elapsed, serverProtocol.transport.packets))
+    pstats.Stats(profile).sort_stats('cumulative').print_stats(options.lines)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Measures the startup of the c2w and sibyl launcher scripts: each one is
+run with ``--help`` (or with an unknown option) under
+``python -X importtime``, and the report gives the wall time, the
+number of modules imported and the import time, in total and for the
+twisted package.  A script which does not exit as argparse does (0 for
+``--help``, 2 for an unknown option) is reported as failed.
+"""
+import subprocess
+import argparse
+import statistics
+import json
+import time
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+SCRIPT_DIRECTORIES = (os.path.join(ROOT, 'c2w', 'scripts'), os.path.join(ROOT, 'sibyl', 'scripts'))
+# Arguments of the runs, with the return code argparse exits with
+RUNS = ((['--help'], 0), (['--no-such-option'], 2))
+
+
+class ScriptError(Exception):
+    pass
+
+
+def launcherScripts():
+    # The launchers, without the trial wrappers which have no usage to print
+    scripts = []
+    for directory in SCRIPT_DIRECTORIES:
+        for name in sorted(os.listdir(directory)):
+            if name.endswith('.py') and name.startswith(('c2w_', 'sibyl_')) and '_test_' not in name:
+                scripts.append(os.path.join(directory, name))
+    return scripts
+
+
+def parseImportTime(output):
+    """
+    Parses the ``-X importtime`` lines: returns the number of modules
+    imported, the total import time and the time of the twisted
+    package, in microseconds.
+    """
+    modules = 0
+    total = 0
+    twisted = 0
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        selfTime, cumulative, name = line[len('import time:'):].split('|')
+        modules += 1
+        total += int(selfTime)
+        if name.strip() == 'twisted':
+            twisted = int(cumulative)
+    return modules, total, twisted
+
+
+def errorTail(output, lines=5):
+    # The last lines of the standard error which are not import times
+    return '\n'.join([line for line in output.splitlines() if not line.startswith('import time:')][-lines:])
+
+
+def runScript(script, arguments, returnCode, repeats):
+    wallTimes = []
+    for i in range(repeats):
+        startTime = time.perf_counter()
+        process = subprocess.run([sys.executable, '-X', 'importtime', script] + arguments,
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                 universal_newlines=True, cwd=os.path.dirname(script))
+        wallTimes.append(time.perf_counter() - startTime)
+        if process.returncode != returnCode:
+            raise ScriptError('%s %s exited with %d instead of %d:\n%s'
+                              % (os.path.relpath(script, ROOT), ' '.join(arguments), process.returncode,
+                                 returnCode, errorTail(process.stderr)))
+    modules, total, twisted = parseImportTime(process.stderr)
+    return {
+        'script': os.path.relpath(script, ROOT),
+        'arguments': ' '.join(arguments),
+        'wall_ms': statistics.median(wallTimes) * 1000,
+        'modules': modules,
+        'import_ms': total / 1000,
+        'twisted_import_ms': twisted / 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='c2w and sibyl launchers startup benchmark')
+    parser.add_argument('-n', '--repeats', dest='repeats', type=int,
+                        help='The number of runs of each script (the median wall time is reported).',
+                        default=5)
+    parser.add_argument('-o', '--output', dest='outputFile',
+                        help='Write the JSON report to this file instead of the standard output.',
+                        default=None)
+    parser.add_argument('scripts', nargs='*',
+                        help='The scripts to run (all the launchers by default).')
+    options = parser.parse_args()
+
+    results = []
+    failed = 0
+    for script in options.scripts or launcherScripts():
+        for arguments, returnCode in RUNS:
+            try:
+                results.append(runScript(os.path.abspath(script), arguments, returnCode, options.repeats))
+            except ScriptError as error:
+                # The time to a crash is not a startup time
+                print(error, file=sys.stderr)
+                results.append({'script': os.path.relpath(script, ROOT), 'arguments': ' '.join(arguments),
+                                'failed': True})
+                failed += 1
+
+    text = json.dumps(results, indent=2)
+    if options.outputFile is None:
+        print(text)
+    else:
+        with open(options.outputFile, 'w') as output:
+            output.write(text + '\n')
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
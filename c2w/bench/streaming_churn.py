@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Counts the calls made by the server protocols to start and stop the
+movie streams while users join and leave the movie rooms, quit and get
+evicted.  The counts are compared with the ones of the former behaviour
+(a start per join, a stop per leave) and checked against the rooms:
+at the end, exactly the movies with viewers are streaming.
+"""
+import c2w.main.constants as c2w_constants
+from c2w.protocol.format_type import FormatType
+from c2w.protocol.udp_chat_server import c2wUdpChatServerProtocol
+from c2w.protocol.tcp_chat_server import c2wTcpChatServerProtocol
+from c2w.bench.fakes import FakeClock, FakeTransport, FakeServerProxy
+import argparse
+import random
+import json
+import time
+
+
+class ChurnClient:
+
+    def __init__(self, index):
+        self.userName = 'user%d' % index
+        self.host_port = ('10.%d.%d.%d' % (index >> 16 & 0xFF, index >> 8 & 0xFF, index & 0xFF), 5000)
+        self.userId = '%s:%d' % self.host_port
+        self.numMessage = 0
+        self.room = c2w_constants.ROOM_IDS.MAIN_ROOM
+        self.connected = True
+
+
+class UdpServerDriver:
+
+    def __init__(self, serverProxy, clock):
+        self.serverProtocol = c2wUdpChatServerProtocol(serverProxy, 0)
+        self.serverProtocol.transport = FakeTransport()
+        self.serverProtocol.clock = clock
+
+    def send(self, client, pack):
+        self.serverProtocol.datagramReceived(pack, client.host_port)
+
+    def evict(self, client):
+        self.serverProtocol.evictUser(client.userId)
+
+
+class TcpServerDriver:
+
+    def __init__(self, serverProxy, clock):
+        self.serverProxy = serverProxy
+        self.clock = clock
+        self.protocols = {}  # Dictionary userId -> protocol of its connection
+
+    def send(self, client, pack):
+        if client.userId not in self.protocols:
+            protocol = c2wTcpChatServerProtocol(self.serverProxy, client.host_port[0], client.host_port[1])
+            protocol.transport = FakeTransport()
+            protocol.clock = self.clock
+            self.protocols[client.userId] = protocol
+        self.protocols[client.userId].dataReceived(pack)
+
+    def evict(self, client):
+        self.protocols[client.userId].evictUser(client.userId)
+
+
+def churn(driverClass, users, movies, steps, quitPr, evictPr, seed):
+    random.seed(seed)
+    format = FormatType()
+    titles = ['Movie %d' % i for i in range(1, movies + 1)]
+    serverProxy = FakeServerProxy([(title, '127.0.0.1', 1960 + i) for i, title in enumerate(titles)])
+    clock = FakeClock()
+    driver = driverClass(serverProxy, clock)
+
+    def send(client, pack):
+        driver.send(client, pack)
+        client.numMessage += 1
+
+    clients = [ChurnClient(index) for index in range(users)]
+    for client in clients:
+        send(client, format.msg_connexion(client.numMessage, client.userName))
+
+    joins = 0
+    leaves = 0
+    startTime = time.perf_counter()
+    for step in range(steps):
+        client = random.choice(clients)
+        if not client.connected:
+            continue
+        draw = random.random()
+        if draw < evictPr:
+            driver.evict(client)
+            # The evictions are flushed on the next reactor tick
+            clock.advance(0)
+            client.connected = False
+        elif draw < evictPr + quitPr:
+            send(client, format.msg_quitter_app(client.numMessage))
+            client.connected = False
+        elif client.room == c2w_constants.ROOM_IDS.MAIN_ROOM:
+            client.room = random.choice(titles)
+            send(client, format.msg_selection_film(client.numMessage, client.room))
+            joins += 1
+            continue
+        else:
+            send(client, format.msg_quitter_salon(client.numMessage))
+            client.room = c2w_constants.ROOM_IDS.MAIN_ROOM
+            leaves += 1
+            continue
+        if client.room != c2w_constants.ROOM_IDS.MAIN_ROOM:
+            leaves += 1
+    elapsed = time.perf_counter() - startTime
+
+    watched = set(client.room for client in clients
+                  if client.connected and client.room != c2w_constants.ROOM_IDS.MAIN_ROOM)
+    streaming = serverProxy.streamingStarted - serverProxy.streamingStopped
+    assert streaming == len(watched), (streaming, len(watched))
+    return {
+        'server': 'UDP' if driverClass is UdpServerDriver else 'TCP',
+        'users': users,
+        'movies': movies,
+        'steps': steps,
+        'joins': joins,
+        'leaves': leaves,
+        'start_calls': serverProxy.streamingStarted,
+        'stop_calls': serverProxy.streamingStopped,
+        'former_start_calls': joins,
+        'former_stop_calls': leaves,
+        'movies_streaming': streaming,
+        'elapsed': elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='c2w movie streaming churn')
+    parser.add_argument('-u', '--users', dest='users', type=int,
+                        help='The number of users.',
+                        default=50)
+    parser.add_argument('-m', '--movies', dest='movies', type=int,
+                        help='The number of movies.',
+                        default=10)
+    parser.add_argument('-n', '--steps', dest='steps', type=int,
+                        help='The number of random actions.',
+                        default=2000)
+    parser.add_argument('--quit-pr', dest='quitPr', type=float,
+                        help='The probability that an action is a user quitting.',
+                        default=0.01)
+    parser.add_argument('--evict-pr', dest='evictPr', type=float,
+                        help='The probability that an action is a user timing out.',
+                        default=0.01)
+    parser.add_argument('--seed', dest='seed', type=int,
+                        help='The seed of the random actions.',
+                        default=1)
+    options = parser.parse_args()
+
+    results = [churn(driverClass, options.users, options.movies, options.steps,
+                     options.quitPr, options.evictPr, options.seed)
+               for driverClass in (UdpServerDriver, TcpServerDriver)]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
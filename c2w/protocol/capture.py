@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+import struct
+import mmap
+import time
+import logging
+
+moduleLogger = logging.getLogger('c2w.protocol.capture')
+
+"""
+Capture file: FILE_MAGIC and the transport of the server (one byte),
+followed by the records, each one made of RECORD_HEADER (Timestamp |
+Direction | Host length | Port | Data length), the host (utf-8) and the
+data: a datagram (UDP) or a chunk of the stream of a connection (TCP),
+which may hold several messages or a part of one.
+"""
+FILE_MAGIC = b'C2WCAP02'
+FILE_HEADER_SIZE = len(FILE_MAGIC) + 1
+RECORD_HEADER = struct.Struct('!dBBHI')
+
+# Directions
+RECEIVED = 0
+SENT = 1
+
+# Transports
+UDP = 0
+TCP = 1
+
+# Bytes buffered before being appended to the capture file
+FLUSH_SIZE = 64 * 1024
+# The capture file is grown (and mapped again) by steps of this size
+MAP_GROWTH = 4 * 1024 * 1024
+
+# The recorder used by the protocols, None while the capture is disabled
+recorder = None
+
+
+class PacketRecorder:
+    """
+    Appends the packets received and sent by a server to a memory-mapped
+    capture file.  The records are buffered and copied into the mapping
+    by batches of FLUSH_SIZE bytes (or when :py:meth:`flush` is called).
+    """
+
+    def __init__(self, path, transport=UDP):
+        self.path = path
+        self.file = open(path, 'w+b')
+        self.file.truncate(MAP_GROWTH)
+        self.map = mmap.mmap(self.file.fileno(), MAP_GROWTH)
+        self.map[0:FILE_HEADER_SIZE] = FILE_MAGIC + bytes([transport])
+        self.offset = FILE_HEADER_SIZE
+        self.buffer = bytearray()
+        self.records = 0
+
+    def record(self, direction, data, host_port):
+        host = str(host_port[0]).encode('utf-8')
+        self.buffer += RECORD_HEADER.pack(time.time(), direction, len(host), host_port[1], len(data))
+        self.buffer += host
+        self.buffer += data
+        self.records += 1
+
+        if len(self.buffer) >= FLUSH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self.map is None or not self.buffer:
+            return
+        end = self.offset + len(self.buffer)
+        if end > len(self.map):
+            # Grow the file and map it again
+            size = (end // MAP_GROWTH + 1) * MAP_GROWTH
+            self.map.close()
+            self.file.truncate(size)
+            self.map = mmap.mmap(self.file.fileno(), size)
+        self.map[self.offset:end] = self.buffer
+        self.offset = end
+        self.buffer.clear()
+
+    def close(self):
+        if self.map is None:
+            return
+        self.flush()
+        self.map.flush()
+        self.map.close()
+        self.map = None
+        # Drop the unused part of the last growth step
+        self.file.truncate(self.offset)
+        self.file.close()
+        moduleLogger.debug('%d packets captured in %s', self.records, self.path)
+
+
+def readTransport(path):
+    """
+    Returns the transport (UDP or TCP) of the server which wrote the
+    capture file ``path``.  Raises ValueError when it is not a capture
+    file of the current format.
+    """
+    with open(path, 'rb') as captureFile:
+        header = captureFile.read(FILE_HEADER_SIZE)
+    if len(header) < FILE_HEADER_SIZE or header[0:len(FILE_MAGIC)] != FILE_MAGIC:
+        raise ValueError('%s is not a c2w capture file (or an older format)' % path)
+    if header[-1] not in (UDP, TCP):
+        raise ValueError('%s has an unknown transport %d' % (path, header[-1]))
+    return header[-1]
+
+
+def readCapture(path):
+    """
+    Yields the (timestamp, direction, host_port, data) records of a
+    capture file.  A file left by a server which did not stop cleanly
+    ends with zeros, where the reading stops.
+    """
+    readTransport(path)
+    with open(path, 'rb') as captureFile:
+        with mmap.mmap(captureFile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            offset = FILE_HEADER_SIZE
+            while offset + RECORD_HEADER.size <= len(data):
+                timestamp, direction, hostLen, port, dataLen = RECORD_HEADER.unpack_from(data, offset)
+                if timestamp == 0:
+                    break
+                offset += RECORD_HEADER.size
+                host = data[offset:offset + hostLen].decode('utf-8')
+                offset += hostLen
+                yield timestamp, direction, (host, port), data[offset:offset + dataLen]
+                offset += dataLen
+
+
+def getRecorder():
+    return recorder
+
+
+def enable(path, transport=UDP, flushInterval=1):
+    """
+    Records every packet received and sent by the server protocols of
+    ``transport`` in the capture file ``path``.  The buffered records are also appended
+    every ``flushInterval`` seconds, and the file is closed when the
+    reactor stops.
+
+    Must be called before the protocols are instantiated.
+    """
+    global recorder
+    from twisted.internet import reactor, task
+
+    recorder = PacketRecorder(path, transport)
+    task.LoopingCall(recorder.flush).start(flushInterval, now=False)
+    reactor.addSystemEventTrigger('before', 'shutdown', recorder.close)
+    return recorder
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import c2w.protocol.constants as constants
+
+
+class ClientUpdateBatcher:
+    """
+    Buffers the chat messages and the user lists received by a client
+    protocol, and hands them to the client proxy at most once every
+    ``interval`` seconds: the chat messages in their order and the last
+    user list only, in a single setUserListONE call.  The first update
+    after a quiet period is handed on the next reactor iteration.
+
+    The protocols call :py:meth:`flush` before the calls which change
+    the room shown by the user interface, so that the buffered updates
+    are shown in the room they were received for.
+    """
+
+    def __init__(self, clientProxy, clock, interval=constants.CLIENT_FLUSH_INTERVAL):
+        self.clientProxy = clientProxy
+        self.clock = clock
+        self.interval = interval
+        self.chatMessages = []  # List of (userName, message)
+        self.userList = None
+        self.flushCall = None
+        self.lastFlush = None
+
+    def chatMessageReceived(self, userName, message):
+        self.chatMessages.append((userName, message))
+        self.schedule()
+
+    def userListReceived(self, userList):
+        # A list replaces the one still buffered
+        self.userList = userList
+        self.schedule()
+
+    def schedule(self):
+        if self.flushCall is not None:
+            return
+        delay = 0
+        if self.lastFlush is not None:
+            delay = max(0, self.lastFlush + self.interval - self.clock.seconds())
+        self.flushCall = self.clock.callLater(delay, self.flush)
+
+    def flush(self):
+        if self.flushCall is not None:
+            if self.flushCall.active():
+                self.flushCall.cancel()
+            self.flushCall = None
+        if self.userList is None and not self.chatMessages:
+            return
+        self.lastFlush = self.clock.seconds()
+
+        # The users are listed before their messages are shown
+        if self.userList is not None:
+            userList = self.userList
+            self.userList = None
+            self.clientProxy.setUserListONE(userList)
+        chatMessages = self.chatMessages
+        self.chatMessages = []
+        for userName, message in chatMessages:
+            self.clientProxy.chatMessageReceivedONE(userName, message)
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+import c2w.protocol.constants as constants
+import random
+
+
+class CongestionWindow:
+    """
+    Congestion state of the messages sent by the UDP server to one user.
+
+    The window bounds the messages sent and not acknowledged yet: it grows
+    by one message per window acknowledged, as long as the window is
+    full (the chat traffic rarely fills it, a window grown while idle
+    would be sent at once after a pause), and is halved on every
+    retransmission timeout (AIMD).  The timeout is estimated from the
+    round trip times as in RFC 6298 (the retransmitted messages are not
+    measured), doubled on every timeout until the next ack, and increased
+    by a random part so that the sessions hit by the same losses do not
+    resend at the same moment.
+    """
+
+    def __init__(self, maxSize=constants.SERVER_MAX_WINDOW):
+        self.maxSize = maxSize
+        self.window = 1.0
+        self.srtt = None
+        self.rttvar = None
+        self.rto = constants.RETRANSMIT_TIMEOUT
+        self.backoff = 1
+
+    def size(self):
+        # Number of messages which may wait for their ack
+        return int(self.window)
+
+    def acked(self, rtt=None, full=True):
+        """
+        A message was acknowledged, ``rtt`` is its round trip time or None
+        if it was retransmitted, ``full`` tells if the window was full.
+        """
+        if full:
+            self.window = min(self.maxSize, self.window + 1 / self.window)
+        self.backoff = 1
+        if rtt is None:
+            return
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        self.rto = min(constants.RETRANSMIT_MAX_TIMEOUT,
+                       max(constants.RETRANSMIT_MIN_TIMEOUT, self.srtt + 4 * self.rttvar))
+
+    def timedOut(self):
+        self.window = max(1.0, self.window / 2)
+        self.backoff *= 2
+
+    def timeout(self):
+        # Delay before the oldest message waiting for its ack is sent again
+        timeout = min(constants.RETRANSMIT_MAX_TIMEOUT, self.rto * self.backoff)
+        return timeout * (1 + random.random() * constants.RETRANSMIT_JITTER)
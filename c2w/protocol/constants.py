@@ -1,6 +1,32 @@
 # Server Class
 MAX_ATTEMPS_RESEND = 7
 
+"""
+Liveness of the UDP sessions (seconds)
+"""
+SESSION_SWEEP_INTERVAL = 5  # Period of the sweep over all the sessions
+KEEPALIVE_INTERVAL = 30  # Idle time after which a user is probed (with no sequence number)
+IDLE_TIMEOUT = 120  # Idle time after which a session is removed
+
+"""
+User interface of the clients (seconds)
+"""
+CLIENT_FLUSH_INTERVAL = 0.05  # Shortest time between two batches of chat messages and user lists
+
+"""
+Messages sent by a client and not acknowledged yet, at most
+"""
+CLIENT_SEND_WINDOW = 4
+
+"""
+Retransmissions of the UDP server (seconds)
+"""
+RETRANSMIT_TIMEOUT = 1  # Before a round trip time is measured
+RETRANSMIT_MIN_TIMEOUT = 0.2
+RETRANSMIT_MAX_TIMEOUT = 4
+RETRANSMIT_JITTER = 0.1  # Random part of the timeout, so that the sessions do not resend together
+SERVER_MAX_WINDOW = 16  # Messages sent to a user and not acknowledged yet, at most
+
 # MessageType Class
 """
 Types des messages
@@ -143,37 +143,44 @@ class FormatType:
 
     # Format Type 6 : Liste des utilisateurs
     def msg_liste_des_utilisateurs(self, utilisateurs, server, num_sequence):
-        info = self.entete(0, num_sequence, constants.LISTE_UTILISATEURS)
-        buffer = None
-        length_total_utilisateurs = 0
+        return self.msg_liste_des_utilisateurs_encodee(self.encode_utilisateurs(utilisateurs, server), num_sequence)
 
-        for utilisateur in utilisateurs:
-            length = 1 + 1 + len(utilisateur.userName)
-            length_total_utilisateurs += length
-            pseudo = utilisateur.userName
+    # Type 6 with a list already encoded by encode_utilisateurs (the same list is sent to a whole room)
+    def msg_liste_des_utilisateurs_encodee(self, buffer, num_sequence):
+        info = self.entete(len(buffer), num_sequence, constants.LISTE_UTILISATEURS)
+
+        longueur = info[0]
+        entete_info = int(info[1] + info[2], 2)
 
+        # Insert the entete in the firsts bytes of the final package
+        return struct.pack('>HH', longueur, entete_info) + buffer
+
+    # Body of the Type 6 message
+    def encode_utilisateurs(self, utilisateurs, server):
+        packs = []
+        movieIds = {}  # The movie ids are looked up once per room
+
+        for utilisateur in utilisateurs:
             # Main room -> Status 0
             if utilisateur.userChatRoom == c2w_constants.ROOM_IDS.MAIN_ROOM:
                 status = 0
             # Movie room -> Status Movie Id
             else:
-                status = server.getMovieByTitle(utilisateur.userChatRoom).movieId
+                if utilisateur.userChatRoom not in movieIds:
+                    movieIds[utilisateur.userChatRoom] = server.getMovieByTitle(utilisateur.userChatRoom).movieId
+                status = movieIds[utilisateur.userChatRoom]
 
-            pack = struct.pack('>BB' + str(len(pseudo)) + 's',
-                                          len(pseudo),
-                                          status,
-                                          pseudo.encode('utf-8'))
+            packs.append(self.encode_utilisateur(utilisateur.userName, status))
 
-            if buffer is None:
-                buffer = pack
-            else:
-                buffer += pack
+        return b''.join(packs)
 
-        longueur = info[0] + length_total_utilisateurs
-        entete_info = int(info[1] + info[2], 2)
-
-        # Insert the entete in the firsts bytes of the final package
-        return struct.pack('>HH', longueur, entete_info) + buffer
+    # Record of one user in the body of the Type 6 message
+    @staticmethod
+    def encode_utilisateur(pseudo, status):
+        return struct.pack('>BB' + str(len(pseudo)) + 's',
+                           len(pseudo),
+                           status,
+                           pseudo.encode('utf-8'))
 
     # Format Type 7 : Acceptation connexion
     def msg_acceptation_connexion(self, num_sequence):
@@ -5,3 +5,5 @@ class Message:
         self.data = data
         self.attempsCounter = 1
         self.type = type
+        # Time of the first emission, None once the message is retransmitted
+        self.sentAt = None
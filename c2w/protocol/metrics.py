@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+from bisect import bisect_left
+import signal
+import sys
+import logging
+
+moduleLogger = logging.getLogger('c2w.protocol.metrics')
+
+# Upper bounds (in seconds) of the buckets of the latency histograms
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+# The registry used by the protocols, None while the metrics are disabled
+registry = None
+
+
+class Histogram:
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    """
+    Counters, histograms and gauges rendered in the Prometheus text
+    exposition format.  Labels are given as tuples of (name, value)
+    pairs so that they can be used as dictionary keys.
+
+    Gauges are not stored: they are computed when the metrics are
+    rendered by the collectors, callables returning (name, labels, value)
+    tuples.  Values returned for the same name and labels by several
+    collectors are added.
+    """
+
+    def __init__(self):
+        self.counters = {}  # Dictionary (name, labels) -> value
+        self.histograms = {}  # Dictionary (name, labels) -> Histogram
+        self.collectors = {}  # Dictionary key -> collector
+
+    def inc(self, name, labels=(), value=1):
+        key = (name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=()):
+        key = (name, labels)
+        if key not in self.histograms:
+            self.histograms[key] = Histogram()
+        self.histograms[key].observe(value)
+
+    def setCollector(self, key, collector):
+        self.collectors[key] = collector
+
+    def removeCollector(self, key):
+        if key in self.collectors:
+            del self.collectors[key]
+
+    def collect(self):
+        gauges = {}
+        for collector in list(self.collectors.values()):
+            for name, labels, value in collector():
+                gauges[(name, labels)] = gauges.get((name, labels), 0) + value
+        return gauges
+
+    def render(self):
+        lines = []
+        self.renderValues(lines, self.counters, 'counter')
+        self.renderValues(lines, self.collect(), 'gauge')
+
+        declared = set()
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            if name not in declared:
+                lines.append('# TYPE %s histogram' % name)
+                declared.add(name)
+            cumulative = 0
+            for bound, count in zip(self.buckets(histogram), histogram.counts):
+                cumulative += count
+                lines.append('%s_bucket%s %d' % (name, formatLabels(labels + (('le', bound),)), cumulative))
+            lines.append('%s_sum%s %f' % (name, formatLabels(labels), histogram.sum))
+            lines.append('%s_count%s %d' % (name, formatLabels(labels), histogram.count))
+
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def buckets(histogram):
+        return [repr(bound) for bound in histogram.buckets] + ['+Inf']
+
+    @staticmethod
+    def renderValues(lines, values, metricType):
+        declared = set()
+        for (name, labels), value in sorted(values.items()):
+            if name not in declared:
+                lines.append('# TYPE %s %s' % (name, metricType))
+                declared.add(name)
+            lines.append('%s%s %s' % (name, formatLabels(labels), value))
+
+
+def formatLabels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join('%s="%s"' % (name, value) for name, value in labels) + '}'
+
+
+def packageType(pack):
+    # The type is stored in the 4 low bits of the header (Longueur | Numero Sequence | Type)
+    return pack[3] & 0xF
+
+
+def getRegistry():
+    return registry
+
+
+def enable(port=None, dumpSignal=False, dumpFile=None):
+    """
+    Enables the metrics of the server protocols.  They are served as
+    plain text on ``http://127.0.0.1:<port>/`` when ``port`` is given,
+    and written to ``dumpFile`` (or to the standard error) whenever the
+    process receives SIGUSR1 when ``dumpSignal`` is set.
+
+    Must be called before the protocols are instantiated.
+    """
+    global registry
+    from twisted.internet import reactor
+
+    if registry is None:
+        registry = MetricsRegistry()
+
+    if port is not None:
+        from twisted.web.resource import Resource
+        from twisted.web.server import Site
+
+        class MetricsResource(Resource):
+            isLeaf = True
+
+            def render_GET(self, request):
+                request.setHeader(b'content-type', b'text/plain; version=0.0.4')
+                return registry.render().encode('utf-8')
+
+        reactor.listenTCP(port, Site(MetricsResource()), interface='127.0.0.1')
+        moduleLogger.debug('metrics served on port %d', port)
+
+    if dumpSignal:
+        def dump():
+            if dumpFile is None:
+                sys.stderr.write(registry.render())
+            else:
+                with open(dumpFile, 'w') as output:
+                    output.write(registry.render())
+
+        signal.signal(signal.SIGUSR1, lambda signum, frame: reactor.callFromThread(dump))
+
+    return registry
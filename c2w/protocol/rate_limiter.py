@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+import time
+import logging
+
+moduleLogger = logging.getLogger('c2w.protocol.rate_limiter')
+
+# The limiter used by the protocols, None while the rate limiting is disabled
+limiter = None
+
+
+class RateLimiter:
+    """
+    Token bucket per source address: a source may send ``burst`` packets
+    at once, then ``rate`` packets per second.
+
+    The table maps each address to its [tokens, last packet time] and
+    only holds the recent sources: a bucket which has had the time to
+    fill up again behaves as a new one, so it is dropped by the sweep
+    made (at most once per refill time) when a new source shows up.
+    """
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.clock = clock
+        self.refillTime = self.burst / self.rate
+        self.buckets = {}  # Dictionary host -> [tokens, last packet time]
+        self.nextSweep = self.clock() + self.refillTime
+
+        self.allowed = 0
+        self.dropped = 0
+
+    def allow(self, host):
+        now = self.clock()
+        bucket = self.buckets.get(host)
+
+        if bucket is None:
+            if now >= self.nextSweep:
+                self.sweep(now)
+            self.buckets[host] = [self.burst - 1, now]
+            self.allowed += 1
+            return True
+
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens < 1:
+            bucket[0] = tokens
+            self.dropped += 1
+            return False
+        bucket[0] = tokens - 1
+        self.allowed += 1
+        return True
+
+    def sweep(self, now):
+        expired = [host for host, bucket in self.buckets.items() if now - bucket[1] >= self.refillTime]
+        for host in expired:
+            del self.buckets[host]
+        self.nextSweep = now + self.refillTime
+
+    def stats(self):
+        return {
+            'sources': len(self.buckets),
+            'allowed': self.allowed,
+            'dropped': self.dropped,
+        }
+
+
+def getLimiter():
+    return limiter
+
+
+def enable(rate, burst=None):
+    """
+    Limits the packets accepted by the UDP server protocols to ``rate``
+    per second and per source address, with bursts of ``burst`` packets
+    (twice the rate by default).  The other packets are dropped before
+    being decoded.
+
+    Must be called before the protocols are instantiated.
+    """
+    global limiter
+    limiter = RateLimiter(rate, burst if burst else 2 * rate)
+    moduleLogger.debug('rate limited to %s packets/s per source', rate)
+    return limiter
@@ -5,6 +5,8 @@ import c2w.protocol.constants as constants
 from twisted.internet import reactor
 from c2w.protocol.message import Message
 from c2w.protocol.format_type import FormatType
+from c2w.protocol.client_updates import ClientUpdateBatcher
+from collections import deque
 
 import logging
 
@@ -59,11 +61,13 @@ class c2wTcpChatClientProtocol(Protocol):
 
         self.format = FormatType()
 
-        # Dictionary of Type Message
+        # Messages sent and not acknowledged yet (Dictionary of Type Message)
         self.waitingMessages = {}
+        # Messages waiting for a place among them, in order: (num_sequence, Message)
+        self.outgoingMessages = deque()
+        # Number of messages sent and not acknowledged yet at most
+        self.sendWindow = constants.CLIENT_SEND_WINDOW
 
-        # Emission counter
-        self.emissionCounter = 0
         # Received counter
         self.receivedCounter = 0
         # Message number in the header of the messages
@@ -78,6 +82,11 @@ class c2wTcpChatClientProtocol(Protocol):
         self.firstLogin = True
         self.userName = None
 
+        # Used to schedule the retransmissions and the interface updates
+        self.clock = reactor
+        # Chat messages and user lists handed to the clientProxy at a bounded rate
+        self.updates = ClientUpdateBatcher(clientProxy, self.clock)
+
     def sendLoginRequestOIE(self, userName):
         """
         :param string userName: The user name that the user has typed.
@@ -150,110 +159,120 @@ class c2wTcpChatClientProtocol(Protocol):
         Twisted calls this method whenever new data is received on this
         connection.
         """
+        # One call may hold several messages, drain the buffer
         info = self.format.datagram_received_tcp(data)
-        if info is not None:
-            [longueur, num_sequence, type, message] = info
+        while info is not None:
+            self.format.messageComplete = False
+            self.messageReceived(*info)
+            info = self.format.datagram_received_tcp(b'')
 
+    def messageReceived(self, longueur, num_sequence, type, message):
         # Host - port
         host_port = (self.serverAddress, self.serverPort)
 
-        if self.format.isMessageComplete():
-            self.format.messageComplete = False
-            # If the client receives a different type than 0 -> Always send the ACK
-            if type != 0:
-                pack = self.format.msg_acquittemen(num_sequence)
-                self.transport.write(pack)
-
-            if type == 0:
-                if num_sequence == self.emissionCounter:
-                    # Set the message as sended
-                    self.waitingMessages[num_sequence].sended = True
-                    self.emissionCounter += 1
-
-                    # Format Type 2 : Quitter Application
-                    if self.waitingMessages[self.numMessage].type == 2:
-                        self.clientProxy.leaveSystemOKONE()
-
-                    # Format 3: Selection du Film
-                    if self.waitingMessages[self.numMessage].type == 3:
-                        self.clientProxy.joinRoomOKONE()
-                        self.mainRoom = False
-
-                    # Format 4 : Quitter salon Film
-                    if self.waitingMessages[self.numMessage].type == 4:
-                        self.clientProxy.joinRoomOKONE()
-                        self.mainRoom = True
-
-                    # Delete message if it was sent
-                    del self.waitingMessages[num_sequence]
-                    if bool(self.waitingMessages):
-                        self.controlPackages(self.emissionCounter)
-
-            if num_sequence == self.receivedCounter and type != 0:
-                self.receivedCounter += 1
-                # Format Type 7 : Acceptation connexion
-                if type == 7:
-                    self.room = c2w_constants.ROOM_IDS.MAIN_ROOM
-                    self.usersConnected[host_port] = []
-
-                # Type 5: liste des films
-                if type == 5:
-                    self.movies = self.format.get_movie_list(message)
-
-                # Type 6: liste Utilisateurs
-                if type == 6:
-                    self.usersConnected[host_port] = self.format.get_user_list(message)
-                    # I have the movies and users!
-
-                    if self.mainRoom:  # The user is in the main room
-                        self.clientProxy.setUserListONE([])
-                        if not self.firstLogin:
-                            self.clientProxy.setUserListONE(self.usersConnected[host_port])
-                        else:
-                            self.clientProxy.initCompleteONE(self.usersConnected[host_port], self.movies)
-                            self.firstLogin = False
-
-                    else:  # The user is in the movie room
-                        self.clientProxy.setUserListONE([])
-                        for user in self.usersConnected[host_port]:
-                            self.clientProxy.userUpdateReceivedONE(user[0], self.room)
-
-                # Format Type 8 : Refus de connexion
-                if type == 8:
-                    self.clientProxy.connectionRejectedONE("Un utilisateur avec ce nom existe déjà")
-
-                # Format 9 : Chat
-                if type == 9:
-                    self.clientProxy.chatMessageReceivedONE(message[0], message[1])
+        # If the client receives a different type than 0 -> Always send the ACK
+        if type != 0:
+            pack = self.format.msg_acquittemen(num_sequence)
+            self.transport.write(pack)
+
+        if type == 0:
+            # The acknowledged message (None for a duplicated ack)
+            acked = self.waitingMessages.pop(num_sequence, None)
+            if acked is not None:
+                # Set the message as sended
+                acked.sended = True
+
+                # Format Type 2 : Quitter Application
+                if acked.type == 2:
+                    self.updates.flush()
+                    self.clientProxy.leaveSystemOKONE()
+
+                # Format 3: Selection du Film
+                if acked.type == 3:
+                    self.updates.flush()
+                    self.clientProxy.joinRoomOKONE()
+                    self.mainRoom = False
+
+                # Format 4 : Quitter salon Film
+                if acked.type == 4:
+                    self.updates.flush()
+                    self.clientProxy.joinRoomOKONE()
+                    self.mainRoom = True
+
+                # A place is free for the next message
+                self.sendQueuedPackages()
+
+        if num_sequence == self.receivedCounter and type != 0:
+            self.receivedCounter += 1
+            # Format Type 7 : Acceptation connexion
+            if type == 7:
+                self.room = c2w_constants.ROOM_IDS.MAIN_ROOM
+                self.usersConnected[host_port] = []
+
+            # Type 5: liste des films
+            if type == 5:
+                self.movies = self.format.get_movie_list(message)
+
+            # Type 6: liste Utilisateurs
+            if type == 6:
+                self.usersConnected[host_port] = self.format.get_user_list(message)
+                # I have the movies and users!
+
+                if self.mainRoom:  # The user is in the main room
+                    if not self.firstLogin:
+                        self.updates.userListReceived(self.usersConnected[host_port])
+                    else:
+                        self.clientProxy.initCompleteONE(self.usersConnected[host_port], self.movies)
+                        self.firstLogin = False
+
+                else:  # The user is in the movie room, the whole list is set at once
+                    self.updates.userListReceived([(user[0], self.room) for user in self.usersConnected[host_port]])
+
+            # Format Type 8 : Refus de connexion
+            if type == 8:
+                self.clientProxy.connectionRejectedONE("Un utilisateur avec ce nom existe déjà")
+
+            # Format 9 : Chat
+            if type == 9:
+                self.updates.chatMessageReceived(message[0], message[1])
 
     def sendPackage(self, pack, type):
-        message = Message(pack, type)
-        self.waitingMessages[self.numMessage] = message
+        # Queued in order, sent as soon as fewer than sendWindow messages wait for their ack
+        self.outgoingMessages.append((self.numMessage, Message(pack, type)))
+        self.sendQueuedPackages()
 
-        self.controlPackages(self.numMessage)
+    def sendQueuedPackages(self):
+        while self.outgoingMessages and len(self.waitingMessages) < self.sendWindow:
+            num_sequence, message = self.outgoingMessages.popleft()
+            self.waitingMessages[num_sequence] = message
+            self.controlPackages(num_sequence)
 
     def controlPackages(self, num_sequence):
-        if num_sequence == self.emissionCounter:
-            # Send the message
-            self.transport.write(self.waitingMessages[num_sequence].data)
-            # Increase emission counter
-            self.waitingMessages[num_sequence].attempsCounter += 1
-            # Reemission message
-            reactor.callLater(1, self.resendPackage, num_sequence)
+        # Send the message
+        self.transport.write(self.waitingMessages[num_sequence].data)
+        # Increase emission counter
+        self.waitingMessages[num_sequence].attempsCounter += 1
+        # Reemission message
+        self.clock.callLater(1, self.resendPackage, num_sequence)
 
     def resendPackage(self, num_sequence):
         if num_sequence in self.waitingMessages:
             message = self.waitingMessages[num_sequence]
             # If the message is set as not sended
             if message.sended is False:
+                # The server handles the messages in order only: the oldest one is resent
+                # with the ones sent after it, the others wait to be the oldest
+                if num_sequence != next(iter(self.waitingMessages)):
+                    self.clock.callLater(1, self.resendPackage, num_sequence)
                 # If attemps counter <= 7
-                if message.attempsCounter <= constants.MAX_ATTEMPS_RESEND:
-                    self.transport.write(message.data)
+                elif message.attempsCounter <= constants.MAX_ATTEMPS_RESEND:
+                    for waiting in self.waitingMessages.values():
+                        self.transport.write(waiting.data)
                     # Increase attemps counter
                     message.attempsCounter += 1
 
                     # Call this method again
-                    reactor.callLater(1, self.resendPackage, num_sequence)
+                    self.clock.callLater(1, self.resendPackage, num_sequence)
                 else:
                     self.clientProxy.connectionRejectedONE("Connection rejected")
                     self.clientProxy.applicationQuit()
@@ -3,14 +3,46 @@ from twisted.internet.protocol import Protocol
 import c2w.main.constants as c2w_constants
 import c2w.protocol.constants as constants
 from c2w.protocol.user import User
+from c2w.protocol.user_index import UserIndex
 from c2w.protocol.format_type import FormatType
+import c2w.protocol.metrics as metrics
+import c2w.protocol.capture as capture
 from twisted.internet import reactor
 import logging
+import weakref
+import time
 
 logging.basicConfig()
 moduleLogger = logging.getLogger('c2w.protocol.tcp_chat_server_protocol')
 
 
+class TcpServerState:
+    """
+    State shared by all the connections of a server, one per server proxy.
+    """
+
+    def __init__(self, serverProxy):
+        # Rooms and encoded records of the users, instead of the server proxy lookups
+        self.index = UserIndex(serverProxy)
+        # Number of users in each movie room (Dictionary movie title -> count).
+        # A stream runs while its movie has viewers.
+        self.movieViewers = {}
+        # Users timed out during the current reactor tick (Dictionary userId -> protocol),
+        # removed together by flushEvictions
+        self.pendingEvictions = {}
+        self.evictionCall = None
+
+
+# Dictionary server proxy -> TcpServerState (dropped with its server proxy)
+serverStates = weakref.WeakKeyDictionary()
+
+
+def getServerState(serverProxy):
+    if serverProxy not in serverStates:
+        serverStates[serverProxy] = TcpServerState(serverProxy)
+    return serverStates[serverProxy]
+
+
 class c2wTcpChatServerProtocol(Protocol):
 
     def __init__(self, serverProxy, clientAddress, clientPort):
@@ -70,6 +102,28 @@ class c2wTcpChatServerProtocol(Protocol):
         # Connected users
         self.connectedUser = {}  # Dictionary of Type: Users
         self.refusedUsers = {}  # Dictionary of Type: Users
+        # Shared with the other connections of the server
+        self.state = getServerState(serverProxy)
+        self.index = self.state.index
+
+        # Metrics registry (None when the metrics are disabled)
+        self.metrics = metrics.getRegistry()
+        if self.metrics is not None:
+            # The rooms are shared by all the connections, a single collector is enough
+            self.metrics.setCollector('tcp_chat_server_rooms', self.collectRoomMetrics)
+            self.metrics.setCollector(('tcp_chat_server', clientAddress, clientPort), self.collectMetrics)
+        # Packet recorder (None when the capture is disabled)
+        self.recorder = capture.getRecorder()
+        # Used to schedule the retransmissions
+        self.clock = reactor
+
+    def connectionLost(self, reason):
+        if self.metrics is not None:
+            self.metrics.removeCollector(('tcp_chat_server', self.clientAddress, self.clientPort))
+        # The user of a closed connection is removed with the timed out ones (and leaves its movie room)
+        userId = str(self.clientAddress) + ':' + str(self.clientPort)
+        if userId in self.connectedUser:
+            self.evictUser(userId)
 
     def dataReceived(self, data):
         """
@@ -79,9 +133,20 @@ class c2wTcpChatServerProtocol(Protocol):
         Twisted calls this method whenever new data is received on this
         connection.
         """
+        if self.recorder is not None:
+            self.recorder.record(capture.RECEIVED, data, (self.clientAddress, self.clientPort))
+
+        # One call may hold several messages (the clients send a window of them), drain the buffer
         msg = self.format.datagram_received_tcp(data)
-        if msg is not None:
-            [longueur, num_sequence, type, info] = msg
+        while msg is not None:
+            self.format.messageComplete = False
+            self.messageReceived(*msg)
+            msg = self.format.datagram_received_tcp(b'')
+
+    def messageReceived(self, longueur, num_sequence, type, info):
+        if self.metrics is not None:
+            startTime = time.perf_counter()
+            self.metrics.inc('c2w_packets_received_total', (('type', type),))
 
         # Host - port
         host_port = (self.clientAddress, self.clientPort)
@@ -89,173 +154,189 @@ class c2wTcpChatServerProtocol(Protocol):
         # User id
         userId = str(host_port[0]) + ':' + str(host_port[1])
 
-        if self.format.isMessageComplete():
-            self.format.messageComplete = False
-
-            # If the server receives a different type than 0 -> Always send the ACK
-            if type != 0:
-                pack = self.format.msg_acquittemen(num_sequence)
-                self.transport.write(pack)
+        # If the server receives a different type than 0 -> Always send the ACK
+        if type != 0:
+            pack = self.format.msg_acquittemen(num_sequence)
+            self.writePackage(pack)
+
+        if type == 0:
+            # Get the User object
+            user = None
+            if userId in self.connectedUser:
+                user = self.connectedUser[userId]
+            elif userId in self.refusedUsers:
+                user = self.refusedUsers[userId]
+
+            if user is not None:
+                if num_sequence == user.emissionCounter:
+                    # Set message as sended to stop the resend
+                    user.waitingMessages[num_sequence].sendedStatus = True
+                    user.emissionCounter += 1
+                    if self.metrics is not None:
+                        self.metrics.inc('c2w_acks_total')
+
+                    # Delete message if it was sent
+                    user.deleteMessage(num_sequence)
+                    if len(user.waitingMessages) > 0:
+                        self.controlPackages(userId, user.emissionCounter)
+
+        if type != 0 and userId in self.connectedUser:
+            if num_sequence == self.connectedUser[userId].receptionCounter:
+                self.connectedUser[userId].receptionCounter += 1
+
+                # Format Type 2 : Quitter Application
+                if type == 2:
+                    userName = self.connectedUser[userId].username
+                    room = self.index.getRoom(userName)
+                    self.leaveMovie(room)
+                    self.serverProxy.removeUser(userName)
+                    self.index.removeUser(userName)
+                    del self.connectedUser[userId]
+                    self.sendRoomLists([room])
+
+                # Type 3: Choix d’un film
+                if type == 3:
+                    userName = self.connectedUser[userId].username
+                    previousRoom = self.index.getRoom(userName)
+                    self.serverProxy.updateUserChatroom(userName, info)
+                    self.index.moveUser(userName, info)
+                    if previousRoom != info:
+                        self.leaveMovie(previousRoom)
+                        self.joinMovie(info)
+
+                    # Update the user lists of the main room, of the movie room and of the room left
+                    self.sendRoomLists([info, previousRoom])
+
+                # Format 4 : Quitter salon Film
+                if type == 4:
+                    userName = self.connectedUser[userId].username
+                    movie = self.index.getRoom(userName)
+                    self.leaveMovie(movie)
+                    self.serverProxy.updateUserChatroom(userName, c2w_constants.ROOM_IDS.MAIN_ROOM)
+                    self.index.moveUser(userName, c2w_constants.ROOM_IDS.MAIN_ROOM)
+
+                    # Update the user lists of the main room and of the movie room
+                    self.sendRoomLists([movie])
+
+                # Format Type 9 : Chat
+                if type == 9:
+                    # Send the chat message to all users in the same room (but not at the sender user)
+                    room = self.index.getRoom(self.connectedUser[userId].username)
+
+                    self.updateUserChatInstance()
+                    for user in self.connectedUser:
+                        userRoom = self.index.getRoom(self.connectedUser[user].username)
+                        if room == userRoom and userId != user:
+                            pack = self.format.msg_chat(self.connectedUser[user].num_sequence,
+                                                        info[0], info[1])
+                            self.connectedUser[user].userChatInstance.sendPackage(user, pack)
+
+        # Connexion message (Type 1)
+        if type == 1:
+            # Message duplicated control
+            if userId not in self.connectedUser or host_port != self.refusedUsers[userId].host_port:
+                # Add user to connected users list
+                if not self.serverProxy.userExists(info):
+                    # Add user to the server users list
+                    if userId not in self.connectedUser:
+                        self.connectedUser[userId] = User(host_port, info)
 
-            if type == 0:
-                # Get the User object
-                user = None
-                if userId in self.connectedUser:
                     user = self.connectedUser[userId]
-                elif userId in self.refusedUsers:
-                    user = self.refusedUsers[userId]
-
-                if user is not None:
-                    if num_sequence == user.emissionCounter:
-                        # Set message as sended to stop the resend
-                        user.waitingMessages[num_sequence].sendedStatus = True
-                        user.emissionCounter += 1
-
-                        # Delete message if it was sent
-                        user.deleteMessage(num_sequence)
-                        if len(user.waitingMessages) > 0:
-                            self.controlPackages(userId, user.emissionCounter)
-
-            if type != 0 and userId in self.connectedUser:
-                if num_sequence == self.connectedUser[userId].receptionCounter:
+                    # Add user to the server system
+                    self.serverProxy.addUser(info, c2w_constants.ROOM_IDS.MAIN_ROOM, userChatInstance=self,
+                                             userAddress=host_port)
+                    self.index.addUser(info, c2w_constants.ROOM_IDS.MAIN_ROOM)
+                    self.connectedUser[userId].setUserChatInstance(self)
+
+                    # Send Type 7: Connexion OK
+                    pack = self.format.msg_acceptation_connexion(user.num_sequence)
+                    self.connectedUser[userId].addMessage(pack, user.num_sequence)
+                    self.sendPackage(userId, pack)
                     self.connectedUser[userId].receptionCounter += 1
 
-                    # Format Type 2 : Quitter Application
-                    if type == 2:
-                        self.serverProxy.removeUser(self.connectedUser[userId].username)
-                        del self.connectedUser[userId]
-                        self.sendUsersToRoom(c2w_constants.ROOM_IDS.MAIN_ROOM)
-
-                    # Type 3: Choix d’un film
-                    if type == 3:
-                        self.serverProxy.updateUserChatroom(self.connectedUser[userId].username, info)
-                        self.serverProxy.startStreamingMovie(info)
-
-                        userName = self.connectedUser[userId].username
-                        movie = self.serverProxy.getUserByName(userName).userChatRoom
-                        usersInRoom = self.getUsersInRoom(movie)
-
-                        self.updateUserChatInstance()
-                        for id in self.connectedUser:
-                            userRoom = self.serverProxy.getUserByName(self.connectedUser[id].username).userChatRoom
-
-                            # Update user list in main room
-                            if userRoom == c2w_constants.ROOM_IDS.MAIN_ROOM:
-                                self.connectedUser[id].userChatInstance.updateMainRoom(id)
-                            # Update movie room
-                            if userRoom == movie:
-                                self.connectedUser[id].userChatInstance.updateMovieRoom(id, usersInRoom)
-
-                    # Format 4 : Quitter salon Film
-                    if type == 4:
-                        userName = self.connectedUser[userId].username
-                        movie = self.serverProxy.getUserByName(userName).userChatRoom
-                        self.serverProxy.stopStreamingMovie(movie)
-                        self.serverProxy.updateUserChatroom(userName, c2w_constants.ROOM_IDS.MAIN_ROOM)
-                        usersInRoom = self.getUsersInRoom(movie)
-
-                        self.updateUserChatInstance()
-                        for id in self.connectedUser:
-                            userRoom = self.serverProxy.getUserByName(self.connectedUser[id].username).userChatRoom
-
-                            # Update user list in main room
-                            if userRoom == c2w_constants.ROOM_IDS.MAIN_ROOM:
-                                self.connectedUser[id].userChatInstance.updateMainRoom(id)
-                            # Update movie room
-                            if userRoom == movie:
-                                self.connectedUser[id].userChatInstance.updateMovieRoom(id, usersInRoom)
-
-                    # Format Type 9 : Chat
-                    if type == 9:
-                        # Send the chat message to all users in the same room (but not at the sender user)
-                        room = self.serverProxy.getUserByName(self.connectedUser[userId].username).userChatRoom
-
-                        self.updateUserChatInstance()
-                        for user in self.connectedUser:
-                            userRoom = self.serverProxy.getUserByName(self.connectedUser[user].username).userChatRoom
-                            if room == userRoom and userId != user:
-                                pack = self.format.msg_chat(self.connectedUser[user].num_sequence,
-                                                            info[0], info[1])
-                                self.connectedUser[user].userChatInstance.sendPackage(user, pack)
-
-            # Connexion message (Type 1)
-            if type == 1:
-                # Message duplicated control
-                if userId not in self.connectedUser or host_port != self.refusedUsers[userId].host_port:
-                    # Add user to connected users list
-                    if not self.serverProxy.userExists(info):
-                        # Add user to the server users list
-                        if userId not in self.connectedUser:
-                            self.connectedUser[userId] = User(host_port, info)
-
-                        user = self.connectedUser[userId]
-                        # Add user to the server system
-                        self.serverProxy.addUser(info, c2w_constants.ROOM_IDS.MAIN_ROOM, userChatInstance=self,
-                                                 userAddress=host_port)
-                        self.connectedUser[userId].setUserChatInstance(self)
-
-                        # Send Type 7: Connexion OK
-                        pack = self.format.msg_acceptation_connexion(user.num_sequence)
-                        self.connectedUser[userId].addMessage(pack, user.num_sequence)
-                        self.sendPackage(userId, pack)
-                        self.connectedUser[userId].receptionCounter += 1
-
-                        # Send Type 5: Movie list
-                        movies = self.serverProxy.getMovieList()
-                        pack = self.format.msg_liste_des_films(movies, user.num_sequence)
-                        self.sendPackage(userId, pack)
-
-                        # Send Type 6: liste Utilisateurs
-                        self.connectedUser[userId].userChatInstance.sendUsersToRoom(self.serverProxy.getUserByName(self.connectedUser[userId].username).userChatRoom)
-                    # Refuse connexion
-                    else:
-                        # Add user to the refused users list
-                        if userId not in self.refusedUsers:
-                            self.refusedUsers[userId] = User(host_port, info)
-
-                        pack = self.format.msg_refus_connexion(num_sequence)
-                        self.sendPackage(userId, pack)
+                    # Send Type 5: Movie list
+                    movies = self.serverProxy.getMovieList()
+                    pack = self.format.msg_liste_des_films(movies, user.num_sequence)
+                    self.sendPackage(userId, pack)
+
+                    # Send Type 6: liste Utilisateurs
+                    self.sendRoomLists([])
+                # Refuse connexion
+                else:
+                    # Add user to the refused users list
+                    if userId not in self.refusedUsers:
+                        self.refusedUsers[userId] = User(host_port, info)
+
+                    pack = self.format.msg_refus_connexion(num_sequence)
+                    self.sendPackage(userId, pack)
+
+        if self.metrics is not None:
+            self.metrics.observe('c2w_handler_seconds', time.perf_counter() - startTime, (('type', type),))
+
+    def writePackage(self, pack):
+        self.transport.write(pack)
+        if self.recorder is not None:
+            self.recorder.record(capture.SENT, pack, (self.clientAddress, self.clientPort))
+        if self.metrics is not None:
+            self.metrics.inc('c2w_packets_sent_total', (('type', metrics.packageType(pack)),))
+
+    def collectMetrics(self):
+        userId = str(self.clientAddress) + ':' + str(self.clientPort)
+        pending = 0
+        for users in (self.connectedUser, self.refusedUsers):
+            if userId in users:
+                pending += len(users[userId].waitingMessages)
+        yield 'c2w_pending_messages', (), pending
+
+    def collectRoomMetrics(self):
+        users = self.serverProxy.getUserList()
+        yield 'c2w_connected_users', (), len(users)
+        for user in users:
+            yield 'c2w_room_members', (('room', user.userChatRoom),), 1
 
     def updateUserChatInstance(self):
+        # Rebuilt from the server users, so that users removed by other connections disappear too
+        connectedUser = {}
         for user in self.serverProxy.getUserList():
             userId = str(user.userChatInstance.clientAddress) + ':' + str(user.userChatInstance.clientPort)
-            self.connectedUser.update({userId: user.userChatInstance.connectedUser[userId]})
-
-    def updateMainRoom(self, userId):
-        users = self.serverProxy.getUserList()
-        pack = self.format.msg_liste_des_utilisateurs(users, self.serverProxy, self.connectedUser[userId].num_sequence)
-
-        self.sendPackage(userId, pack)
-
-    def updateMovieRoom(self, userId, usersInMovieRoom):
-        pack = self.format.msg_liste_des_utilisateurs(usersInMovieRoom, self.serverProxy, self.connectedUser[userId].num_sequence)
-
-        self.sendPackage(userId, pack)
-
-    def getUsersInRoom(self, room):
-        users = self.serverProxy.getUserList()
-        usersInRoom = []
-
-        for user in users:
-            if user.userChatRoom == room:
-                usersInRoom.append(user)
-
-        return usersInRoom
-
-    def sendUsersToRoom(self, room):
-        users = self.serverProxy.getUserList()
-
-        # Send the usernames to all users in the same room
-        usersIdsInThisRoom = []
+            connectedUser[userId] = user.userChatInstance.connectedUser[userId]
+        self.connectedUser = connectedUser
+
+    def joinMovie(self, movie):
+        # The stream is started by the first viewer only
+        viewers = self.state.movieViewers.get(movie, 0)
+        self.state.movieViewers[movie] = viewers + 1
+        if viewers == 0:
+            self.serverProxy.startStreamingMovie(movie)
+
+    def leaveMovie(self, room):
+        # The stream is stopped when its last viewer leaves (nothing to do for the main room)
+        viewers = self.state.movieViewers.get(room, 0)
+        if viewers == 1:
+            del self.state.movieViewers[room]
+            self.serverProxy.stopStreamingMovie(room)
+        elif viewers > 1:
+            self.state.movieViewers[room] = viewers - 1
+
+    def sendRoomLists(self, rooms):
+        """
+        Sends their user list to the users of the main room, which shows
+        every user and is thus always updated, and of the given rooms.
+        Each list is encoded once and sent to all the members of its room,
+        through the protocol of their connection.
+        """
+        lists = {c2w_constants.ROOM_IDS.MAIN_ROOM: None}
+        for room in rooms:
+            lists[room] = None
         self.updateUserChatInstance()
-        for userId in self.connectedUser:
-            userRoom = self.serverProxy.getUserByName(self.connectedUser[userId].username).userChatRoom
-            if room == userRoom:
-                usersIdsInThisRoom.append(userId)
-
-        for id in usersIdsInThisRoom:
-            pack = self.format.msg_liste_des_utilisateurs(users, self.serverProxy, self.connectedUser[id].num_sequence)
-            self.connectedUser[id].userChatInstance.sendPackage(id, pack)
+        for id in self.connectedUser:
+            userRoom = self.index.getRoom(self.connectedUser[id].username)
+            if userRoom in lists:
+                if lists[userRoom] is None:
+                    lists[userRoom] = self.index.encodeRoom(userRoom)
+                pack = self.format.msg_liste_des_utilisateurs_encodee(lists[userRoom],
+                                                                      self.connectedUser[id].num_sequence)
+                self.connectedUser[id].userChatInstance.sendPackage(id, pack)
 
     def sendPackage(self, userId, pack):
         user = None
@@ -279,9 +360,9 @@ class c2wTcpChatServerProtocol(Protocol):
         if user is not None:
             if num_sequence == user.emissionCounter:
                 if num_sequence in user.waitingMessages:
-                    self.transport.write(user.waitingMessages[num_sequence].data)
+                    self.writePackage(user.waitingMessages[num_sequence].data)
                     user.waitingMessages[num_sequence].attempsCounter += 1
-                    reactor.callLater(1, self.resendPackage, userId, num_sequence)
+                    self.clock.callLater(1, self.resendPackage, userId, num_sequence)
 
     def resendPackage(self, userId, num_sequence):
         user = None
@@ -297,26 +378,40 @@ class c2wTcpChatServerProtocol(Protocol):
                 if message.sended is False:
                     # If attemps counter <= 7
                     if message.attempsCounter <= constants.MAX_ATTEMPS_RESEND:
-                        self.transport.write(message.data)
+                        self.writePackage(message.data)
+                        if self.metrics is not None:
+                            self.metrics.inc('c2w_retransmissions_total')
                         # Increase attemps counter
                         message.attempsCounter += 1
                         # Call this method again
-                        reactor.callLater(1, self.resendPackage, userId, num_sequence)
+                        self.clock.callLater(1, self.resendPackage, userId, num_sequence)
                     elif message.attempsCounter > constants.MAX_ATTEMPS_RESEND and userId in self.connectedUser:
-                        movie = self.serverProxy.getUserByName(self.connectedUser[userId].username).userChatRoom
-                        usersInRoom = self.getUsersInRoom(movie)
-                        self.serverProxy.removeUser(self.connectedUser[userId].username)
-                        #: Delete user of the dictionary of users
-                        del self.connectedUser[userId]
-
-                        # Update the users lists without this user
-                        for id in self.connectedUser:
-                            userRoom = self.serverProxy.getUserByName(self.connectedUser[id].username).userChatRoom
-
-                            # Update user list in main room
-                            if userRoom == c2w_constants.ROOM_IDS.MAIN_ROOM:
-                                self.updateMainRoom(id)
-                            # Update movie room
-                            if userRoom == movie:
-                                self.updateMovieRoom(id, usersInRoom)
-
+                        self.evictUser(userId)
+
+    def evictUser(self, userId):
+        self.state.pendingEvictions[userId] = self
+        if self.state.evictionCall is None:
+            self.state.evictionCall = self.clock.callLater(0, self.flushEvictions)
+
+    def flushEvictions(self):
+        evicted = self.state.pendingEvictions
+        self.state.pendingEvictions = {}
+        self.state.evictionCall = None
+
+        # Remove all the timed out users before sending any list
+        rooms = set()
+        for userId, protocol in evicted.items():
+            if userId in protocol.connectedUser:
+                userName = protocol.connectedUser[userId].username
+                room = self.index.getRoom(userName)
+                rooms.add(room)
+                self.leaveMovie(room)
+                self.serverProxy.removeUser(userName)
+                self.index.removeUser(userName)
+                #: Delete user of the dictionary of users
+                del protocol.connectedUser[userId]
+                if self.metrics is not None:
+                    self.metrics.inc('c2w_evictions_total')
+
+        if rooms:
+            self.sendRoomLists(rooms)
@@ -5,8 +5,13 @@ import c2w.main.constants as c2w_constants
 from c2w.main.lossy_transport import LossyTransport
 from c2w.protocol.format_type import FormatType
 from c2w.protocol.user import User
-from twisted.internet import reactor
+from c2w.protocol.user_index import UserIndex
+import c2w.protocol.metrics as metrics
+import c2w.protocol.capture as capture
+import c2w.protocol.rate_limiter as rate_limiter
+from twisted.internet import reactor, task
 import logging
+import time
 
 logging.basicConfig()
 moduleLogger = logging.getLogger('c2w.protocol.udp_chat_server_protocol')
@@ -54,6 +59,29 @@ class c2wUdpChatServerProtocol(DatagramProtocol):
         # Connected users
         self.connectedUser = {}  # Dictionary of Type: Users
         self.refusedUsers = {}  # Dictionary of Type: Users
+        # Rooms and encoded records of the users, instead of the server proxy lookups
+        self.index = UserIndex(serverProxy)
+
+        # Metrics registry (None when the metrics are disabled)
+        self.metrics = metrics.getRegistry()
+        if self.metrics is not None:
+            self.metrics.setCollector('udp_chat_server', self.collectMetrics)
+        # Packet recorder (None when the capture is disabled)
+        self.recorder = capture.getRecorder()
+        # Rate limiter of the sources (None when the rate limiting is disabled)
+        self.limiter = rate_limiter.getLimiter()
+        # Used to schedule the retransmissions (replaced by a fake clock on replay)
+        self.clock = reactor
+
+        # Number of users in each movie room (Dictionary movie title -> count).
+        # A stream runs while its movie has viewers.
+        self.movieViewers = {}
+
+        # Users timed out during the current reactor tick, removed together by flushEvictions
+        self.pendingEvictions = set()
+        self.evictionCall = None
+        # Periodic sweep over the sessions (started with the first packet)
+        self.sweepLoop = None
 
     def startProtocol(self):
         """
@@ -75,15 +103,40 @@ class c2wUdpChatServerProtocol(DatagramProtocol):
         packet.  You cannot change the signature of this method.
         """
 
+        # Packets over the rate of their source are dropped before anything is allocated
+        if self.limiter is not None and not self.limiter.allow(host_port[0]):
+            if self.metrics is not None:
+                self.metrics.inc('c2w_packets_dropped_total')
+            return
+
+        if self.metrics is not None:
+            startTime = time.perf_counter()
+        if self.recorder is not None:
+            self.recorder.record(capture.RECEIVED, datagram, host_port)
+
         [longueur, num_sequence, type, info] = self.format.datagram_received(datagram)
 
+        if self.metrics is not None:
+            self.metrics.inc('c2w_packets_received_total', (('type', type),))
+
         # User id
         userId = str(host_port[0]) + ':' + str(host_port[1])
 
-        # If the server receives a different type than 0 -> Always send the ACK
-        if type != 0:
+        # Any packet proves that the client is still alive
+        if self.sweepLoop is None:
+            self.startSessionSweep()
+        if userId in self.connectedUser:
+            self.connectedUser[userId].lastSeen = self.clock.seconds()
+        elif userId in self.refusedUsers:
+            self.refusedUsers[userId].lastSeen = self.clock.seconds()
+
+        # If the server receives a different type than 0 -> send the ACK, but not for the
+        # packets of a user received ahead of a lost one: handled in order only, the client
+        # sends them again with its window of unacknowledged messages
+        if type != 0 and (userId not in self.connectedUser
+                          or num_sequence <= self.connectedUser[userId].receptionCounter):
             pack = self.format.msg_acquittemen(num_sequence)
-            self.transport.write(pack, host_port)
+            self.writePackage(pack, host_port)
 
         if type == 0:
             # Get the User object
@@ -93,16 +146,25 @@ class c2wUdpChatServerProtocol(DatagramProtocol):
             elif userId in self.refusedUsers:
                 user = self.refusedUsers[userId]
 
-            if user is not None:
-                if num_sequence == user.emissionCounter:
+            if user is not None and user.emissionCounter <= num_sequence < user.transmissionCounter:
+                message = user.getMessage(num_sequence)
+                if not message.sended:
                     # Set message as sended to stop the resend
-                    user.waitingMessages[num_sequence].sendedStatus = True
-                    user.emissionCounter += 1
-
-                    # Delete message if it was sent
-                    user.deleteMessage(num_sequence)
-                    if len(user.waitingMessages) > 0:
-                        self.controlPackages(userId, user.emissionCounter)
+                    message.sended = True
+                    full = user.transmissionCounter - user.emissionCounter >= user.congestion.size()
+                    sentAt = message.sentAt
+                    user.congestion.acked(None if sentAt is None else self.clock.seconds() - sentAt, full)
+                    if self.metrics is not None:
+                        self.metrics.inc('c2w_acks_total')
+
+                    # Delete the messages acknowledged, up to the oldest one waiting for its ack
+                    if num_sequence == user.emissionCounter:
+                        while (user.emissionCounter < user.transmissionCounter
+                               and user.getMessage(user.emissionCounter).sended):
+                            user.deleteMessage(user.emissionCounter)
+                            user.emissionCounter += 1
+                        self.restartResend(userId, user)
+                    self.controlPackages(userId)
 
         if type != 0 and userId in self.connectedUser:
             if num_sequence == self.connectedUser[userId].receptionCounter:
@@ -110,70 +172,63 @@ class c2wUdpChatServerProtocol(DatagramProtocol):
 
                 # Format Type 2 : Quitter Application
                 if type == 2:
-                    self.serverProxy.removeUser(self.connectedUser[userId].username)
+                    userName = self.connectedUser[userId].username
+                    room = self.index.getRoom(userName)
+                    self.leaveMovie(room)
+                    self.serverProxy.removeUser(userName)
+                    self.index.removeUser(userName)
                     del self.connectedUser[userId]
-                    self.sendUsersToRoom(c2w_constants.ROOM_IDS.MAIN_ROOM)
+                    self.sendRoomLists([room])
 
                 # Type 3: Choix d’un film
                 if type == 3:
-                    self.serverProxy.updateUserChatroom(self.connectedUser[userId].username, info)
-                    self.serverProxy.startStreamingMovie(info)
-
                     userName = self.connectedUser[userId].username
-                    movie = self.serverProxy.getUserByName(userName).userChatRoom
-                    usersInRoom = self.getUsersInRoom(movie)
-
-                    for id in self.connectedUser:
-                        userRoom = self.serverProxy.getUserByName(self.connectedUser[id].username).userChatRoom
+                    previousRoom = self.index.getRoom(userName)
+                    self.serverProxy.updateUserChatroom(userName, info)
+                    self.index.moveUser(userName, info)
+                    if previousRoom != info:
+                        self.leaveMovie(previousRoom)
+                        self.joinMovie(info)
 
-                        # Update user list in main room
-                        if userRoom == c2w_constants.ROOM_IDS.MAIN_ROOM:
-                            self.updateMainRoom(id)
-                        # Update movie room
-                        if userRoom == movie:
-                            self.updateMovieRoom(id, usersInRoom)
+                    # Update the user lists of the main room, of the movie room and of the room left
+                    self.sendRoomLists([info, previousRoom])
 
                 # Format 4 : Quitter salon Film
                 if type == 4:
                     userName = self.connectedUser[userId].username
-                    movie = self.serverProxy.getUserByName(userName).userChatRoom
-                    self.serverProxy.stopStreamingMovie(movie)
+                    movie = self.index.getRoom(userName)
+                    self.leaveMovie(movie)
                     self.serverProxy.updateUserChatroom(userName, c2w_constants.ROOM_IDS.MAIN_ROOM)
-                    usersInRoom = self.getUsersInRoom(movie)
+                    self.index.moveUser(userName, c2w_constants.ROOM_IDS.MAIN_ROOM)
 
-                    for id in self.connectedUser:
-                        userRoom = self.serverProxy.getUserByName(self.connectedUser[id].username).userChatRoom
-
-                        # Update user list in main room
-                        if userRoom == c2w_constants.ROOM_IDS.MAIN_ROOM:
-                            self.updateMainRoom(id)
-                        # Update movie room
-                        if userRoom == movie:
-                            self.updateMovieRoom(id, usersInRoom)
+                    # Update the user lists of the main room and of the movie room
+                    self.sendRoomLists([movie])
 
                 # Format Type 9 : Chat
                 if type == 9:
                     # Send the chat message to all users in the same room (but not at the sender user)
-                    room = self.serverProxy.getUserByName(self.connectedUser[userId].username).userChatRoom
+                    room = self.index.getRoom(self.connectedUser[userId].username)
 
                     for user in self.connectedUser:
-                        userRoom = self.serverProxy.getUserByName(self.connectedUser[user].username).userChatRoom
+                        userRoom = self.index.getRoom(self.connectedUser[user].username)
                         if room == userRoom and userId != user:
                             pack = self.format.msg_chat(self.connectedUser[user].num_sequence,
                                                         info[0], info[1])
                             self.sendPackage(user, pack)
 
-        # Connexion message (Type 1)
-        if type == 1:
+        # Connexion message (Type 1), only acknowledged when the login was accepted already
+        if type == 1 and userId not in self.connectedUser:
             # Add user to connected users list
             if not self.serverProxy.userExists(info):
                 # Add user to the server users list
                 if userId not in self.connectedUser:
                     self.connectedUser[userId] = User(host_port, info)
+                    self.connectedUser[userId].lastSeen = self.clock.seconds()
 
                 user = self.connectedUser[userId]
                 # Add user to the server system
                 self.serverProxy.addUser(info, c2w_constants.ROOM_IDS.MAIN_ROOM, userChatInstance=None, userAddress=host_port)
+                self.index.addUser(info, c2w_constants.ROOM_IDS.MAIN_ROOM)
 
                 # Send Type 7: Connexion OK
                 pack = self.format.msg_acceptation_connexion(user.num_sequence)
@@ -187,50 +242,120 @@ class c2wUdpChatServerProtocol(DatagramProtocol):
                 self.sendPackage(userId, pack)
 
                 # Send Type 6: liste Utilisateurs
-                self.sendUsersToRoom(self.serverProxy.getUserByName(self.connectedUser[userId].username).userChatRoom)
+                self.sendRoomLists([])
             # Refuse connexion
             else:
                 # Add user to the refused users list
                 if userId not in self.refusedUsers:
                     self.refusedUsers[userId] = User(host_port, info)
+                    self.refusedUsers[userId].lastSeen = self.clock.seconds()
 
                 pack = self.format.msg_refus_connexion(num_sequence)
                 self.sendPackage(userId, pack)
 
-    def updateMainRoom(self, userId):
-        users = self.serverProxy.getUserList()
-        pack = self.format.msg_liste_des_utilisateurs(users, self.serverProxy, self.connectedUser[userId].num_sequence)
-
-        self.sendPackage(userId, pack)
-
-    def updateMovieRoom(self, userId, usersInMovieRoom):
-        pack = self.format.msg_liste_des_utilisateurs(usersInMovieRoom, self.serverProxy, self.connectedUser[userId].num_sequence)
-
-        self.sendPackage(userId, pack)
-
-    def getUsersInRoom(self, room):
-        users = self.serverProxy.getUserList()
-        usersInRoom = []
-
-        for user in users:
-            if user.userChatRoom == room:
-                usersInRoom.append(user)
-
-        return usersInRoom
-
-    def sendUsersToRoom(self, room):
-        users = self.serverProxy.getUserList()
-
-        # Send the usernames to all users in the same room
-        usersIdsInThisRoom = []
-        for userId in self.connectedUser:
-            userRoom = self.serverProxy.getUserByName(self.connectedUser[userId].username).userChatRoom
-            if room == userRoom:
-                usersIdsInThisRoom.append(userId)
-
-        for id in usersIdsInThisRoom:
-            pack = self.format.msg_liste_des_utilisateurs(users, self.serverProxy, self.connectedUser[id].num_sequence)
-            self.sendPackage(id, pack)
+        if self.metrics is not None:
+            self.metrics.observe('c2w_handler_seconds', time.perf_counter() - startTime, (('type', type),))
+
+    def writePackage(self, pack, host_port):
+        self.transport.write(pack, host_port)
+        if self.recorder is not None:
+            self.recorder.record(capture.SENT, pack, host_port)
+        if self.metrics is not None:
+            self.metrics.inc('c2w_packets_sent_total', (('type', metrics.packageType(pack)),))
+
+    def collectMetrics(self):
+        pending = 0
+        for user in list(self.connectedUser.values()) + list(self.refusedUsers.values()):
+            pending += len(user.waitingMessages)
+        yield 'c2w_pending_messages', (), pending
+        yield 'c2w_connected_users', (), len(self.connectedUser)
+        if self.limiter is not None:
+            yield 'c2w_rate_limited_sources', (), len(self.limiter.buckets)
+
+        for user in self.serverProxy.getUserList():
+            yield 'c2w_room_members', (('room', user.userChatRoom),), 1
+
+    def startSessionSweep(self):
+        self.sweepLoop = task.LoopingCall(self.sweepSessions)
+        self.sweepLoop.clock = self.clock
+        self.sweepLoop.start(constants.SESSION_SWEEP_INTERVAL, now=False).addErrback(self.sweepFailed)
+
+    def sweepFailed(self, failure):
+        # Started again by the next packet
+        moduleLogger.error('session sweep stopped: %s', failure.getErrorMessage())
+        self.sweepLoop = None
+
+    def stopProtocol(self):
+        if self.sweepLoop is not None and self.sweepLoop.running:
+            self.sweepLoop.stop()
+        self.sweepLoop = None
+
+    def sweepSessions(self):
+        """
+        Single periodic pass over all the sessions (no timer per user).
+        Users idle for KEEPALIVE_INTERVAL are probed with an empty message
+        numbered as the last one they acknowledged, so that no sequence
+        number is used: a live client acknowledges it again.  Sessions
+        idle for IDLE_TIMEOUT are removed.  A session which can not be
+        swept is logged and skipped.
+        """
+        now = self.clock.seconds()
+
+        for userId, user in list(self.connectedUser.items()):
+            try:
+                idle = now - user.lastSeen
+                if idle > constants.IDLE_TIMEOUT:
+                    self.evictUser(userId)
+                elif idle > constants.KEEPALIVE_INTERVAL and not user.waitingMessages and user.emissionCounter > 0:
+                    # The client acknowledges the messages it already handled, and ignores them
+                    self.writePackage(self.format.msg_acceptation_connexion(user.emissionCounter - 1), user.host_port)
+                    if self.metrics is not None:
+                        self.metrics.inc('c2w_keepalive_probes_total')
+            except Exception:
+                moduleLogger.exception('failed to sweep the session of %s', userId)
+
+        # Refused users are only kept to retransmit the refusal
+        for userId, user in list(self.refusedUsers.items()):
+            try:
+                idle = now - user.lastSeen
+                if idle > constants.IDLE_TIMEOUT or (idle > constants.KEEPALIVE_INTERVAL and not user.waitingMessages):
+                    del self.refusedUsers[userId]
+            except Exception:
+                moduleLogger.exception('failed to sweep the refused session of %s', userId)
+
+    def joinMovie(self, movie):
+        # The stream is started by the first viewer only
+        viewers = self.movieViewers.get(movie, 0)
+        self.movieViewers[movie] = viewers + 1
+        if viewers == 0:
+            self.serverProxy.startStreamingMovie(movie)
+
+    def leaveMovie(self, room):
+        # The stream is stopped when its last viewer leaves (nothing to do for the main room)
+        viewers = self.movieViewers.get(room, 0)
+        if viewers == 1:
+            del self.movieViewers[room]
+            self.serverProxy.stopStreamingMovie(room)
+        elif viewers > 1:
+            self.movieViewers[room] = viewers - 1
+
+    def sendRoomLists(self, rooms):
+        """
+        Sends their user list to the users of the main room, which shows
+        every user and is thus always updated, and of the given rooms.
+        Each list is encoded once and sent to all the members of its room.
+        """
+        lists = {c2w_constants.ROOM_IDS.MAIN_ROOM: None}
+        for room in rooms:
+            lists[room] = None
+        for id in self.connectedUser:
+            userRoom = self.index.getRoom(self.connectedUser[id].username)
+            if userRoom in lists:
+                if lists[userRoom] is None:
+                    lists[userRoom] = self.index.encodeRoom(userRoom)
+                pack = self.format.msg_liste_des_utilisateurs_encodee(lists[userRoom],
+                                                                      self.connectedUser[id].num_sequence)
+                self.sendPackage(id, pack)
 
     def sendPackage(self, userId, pack):
         user = None
@@ -241,10 +366,10 @@ class c2wUdpChatServerProtocol(DatagramProtocol):
 
         if user is not None:
             user.addMessage(pack, user.num_sequence)
-            self.controlPackages(userId, user.num_sequence)
             user.num_sequence += 1
+            self.controlPackages(userId)
 
-    def controlPackages(self, userId, num_sequence):
+    def controlPackages(self, userId):
         user = None
         if userId in self.connectedUser:
             user = self.connectedUser[userId]
@@ -252,11 +377,27 @@ class c2wUdpChatServerProtocol(DatagramProtocol):
             user = self.refusedUsers[userId]
 
         if user is not None:
-            if num_sequence == user.emissionCounter:
-                if num_sequence in user.waitingMessages:
-                    self.transport.write(user.waitingMessages[num_sequence].data, user.host_port)
-                    user.waitingMessages[num_sequence].attempsCounter += 1
-                    reactor.callLater(1, self.resendPackage, userId, num_sequence)
+            # Send the messages in order, as many as the congestion window of the user allows
+            idle = user.transmissionCounter == user.emissionCounter
+            now = self.clock.seconds()
+            while (user.transmissionCounter < user.num_sequence
+                   and user.transmissionCounter - user.emissionCounter < user.congestion.size()):
+                message = user.getMessage(user.transmissionCounter)
+                self.writePackage(message.data, user.host_port)
+                message.attempsCounter += 1
+                message.sentAt = now
+                user.transmissionCounter += 1
+            if idle:
+                self.restartResend(userId, user)
+
+    def restartResend(self, userId, user):
+        # A single timer per user, for the oldest message waiting for its ack
+        if user.resendCall is not None and user.resendCall.active():
+            user.resendCall.cancel()
+        user.resendCall = None
+        if user.emissionCounter < user.transmissionCounter:
+            user.resendCall = self.clock.callLater(user.congestion.timeout(), self.resendPackage,
+                                                   userId, user.emissionCounter)
 
     def resendPackage(self, userId, num_sequence):
         user = None
@@ -265,32 +406,57 @@ class c2wUdpChatServerProtocol(DatagramProtocol):
         elif userId in self.refusedUsers:
             user = self.refusedUsers[userId]
 
-        if user is not None:
-            if num_sequence in user.waitingMessages:
-                message = user.getMessage(num_sequence)
-                # If the message is set as not sended
-                if message.sended is False:
-                    # If attemps counter <= 7
-                    if message.attempsCounter <= constants.MAX_ATTEMPS_RESEND:
-                        self.transport.write(message.data, user.host_port)
-                        # Increase attemps counter
-                        message.attempsCounter += 1
-                        # Call this method again
-                        reactor.callLater(1, self.resendPackage, userId, num_sequence)
-                    elif message.attempsCounter > constants.MAX_ATTEMPS_RESEND and userId in self.connectedUser:
-                        movie = self.serverProxy.getUserByName(self.connectedUser[userId].username).userChatRoom
-                        usersInRoom = self.getUsersInRoom(movie)
-                        self.serverProxy.removeUser(self.connectedUser[userId].username)
-                        #: Delete user of the dictionary of users
-                        del self.connectedUser[userId]
-
-                        # Update the users lists without this user
-                        for id in self.connectedUser:
-                            userRoom = self.serverProxy.getUserByName(self.connectedUser[id].username).userChatRoom
-
-                            # Update user list in main room
-                            if userRoom == c2w_constants.ROOM_IDS.MAIN_ROOM:
-                                self.updateMainRoom(id)
-                            # Update movie room
-                            if userRoom == movie:
-                                self.updateMovieRoom(id, usersInRoom)
+        if user is not None and num_sequence == user.emissionCounter:
+            message = user.getMessage(num_sequence)
+            if message is not None:
+                # If attemps counter <= 7
+                if message.attempsCounter <= constants.MAX_ATTEMPS_RESEND:
+                    user.congestion.timedOut()
+                    # The client keeps the messages received after a lost one: the messages not
+                    # acknowledged are sent again, as many as the reduced window allows
+                    resent = 0
+                    for sequence in range(num_sequence, user.transmissionCounter):
+                        waiting = user.getMessage(sequence)
+                        if waiting.sended:
+                            continue
+                        self.writePackage(waiting.data, user.host_port)
+                        if self.metrics is not None:
+                            self.metrics.inc('c2w_retransmissions_total')
+                        # Not measured once retransmitted
+                        waiting.sentAt = None
+                        resent += 1
+                        if resent == user.congestion.size():
+                            break
+                    # Increase attemps counter (of the message which timed out only)
+                    message.attempsCounter += 1
+                    self.restartResend(userId, user)
+                elif userId in self.connectedUser:
+                    self.evictUser(userId)
+
+    def evictUser(self, userId):
+        self.pendingEvictions.add(userId)
+        if self.evictionCall is None:
+            self.evictionCall = self.clock.callLater(0, self.flushEvictions)
+
+    def flushEvictions(self):
+        self.evictionCall = None
+        evicted = self.pendingEvictions
+        self.pendingEvictions = set()
+
+        # Remove all the timed out users before sending any list
+        rooms = set()
+        for userId in evicted:
+            if userId in self.connectedUser:
+                userName = self.connectedUser[userId].username
+                room = self.index.getRoom(userName)
+                rooms.add(room)
+                self.leaveMovie(room)
+                self.serverProxy.removeUser(userName)
+                self.index.removeUser(userName)
+                #: Delete user of the dictionary of users
+                del self.connectedUser[userId]
+                if self.metrics is not None:
+                    self.metrics.inc('c2w_evictions_total')
+
+        if rooms:
+            self.sendRoomLists(rooms)
@@ -1,16 +1,23 @@
 from c2w.protocol.message import Message
+from c2w.protocol.congestion import CongestionWindow
 
 
 class User:
 
     def __init__(self, host_port, username):
         self.host_port = host_port
-        self.emissionCounter = 0
+        self.emissionCounter = 0  # Oldest message waiting for its ack
+        self.transmissionCounter = 0  # Next message to send, those in between wait for their ack
         self.receptionCounter = 0
         self.num_sequence = 0
         self.username = username
         self.waitingMessages = {}  # Dictionary of Type Message
         self.userChatInstance = None
+        # Time of the last packet received from this user
+        self.lastSeen = None
+        # Window of the messages sent to this user (UDP server)
+        self.congestion = CongestionWindow()
+        self.resendCall = None
 
     def getMessage(self, num_sequence):
         if num_sequence in self.waitingMessages:
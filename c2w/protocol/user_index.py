@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import c2w.main.constants as c2w_constants
+from c2w.protocol.format_type import FormatType
+
+
+class UserIndex:
+    """
+    Indexes kept by the server protocols beside the server proxy, whose
+    lookups (getUserByName, getMovieByTitle) scan its lists: the room of
+    each user, the members of each movie room, the movie ids by title and
+    the Type 6 record of each user, encoded once.  The protocols update
+    them whenever they add, remove or move a user in the server proxy.
+    """
+
+    def __init__(self, serverProxy):
+        self.serverProxy = serverProxy
+        self.format = FormatType()
+        self.movieIds = {}  # Dictionary movie title -> movie id
+        for movie in serverProxy.getMovieList():
+            self.movieIds[movie.movieTitle] = movie.movieId
+
+        self.rooms = {}  # Dictionary user name -> room
+        self.records = {}  # Dictionary user name -> Type 6 record, in the order the users were added
+        self.order = {}  # Dictionary user name -> rank of addition
+        self.members = {}  # Dictionary movie title -> set of user names
+        self.added = 0
+
+    def addUser(self, userName, room=c2w_constants.ROOM_IDS.MAIN_ROOM):
+        self.added += 1
+        self.order[userName] = self.added
+        self.setRoom(userName, room)
+
+    def removeUser(self, userName):
+        if userName in self.rooms:
+            self.leaveRoom(userName)
+            del self.rooms[userName]
+            del self.records[userName]
+            del self.order[userName]
+
+    def moveUser(self, userName, room):
+        if userName in self.rooms:
+            self.leaveRoom(userName)
+            self.setRoom(userName, room)
+
+    def setRoom(self, userName, room):
+        self.rooms[userName] = room
+        if room == c2w_constants.ROOM_IDS.MAIN_ROOM:
+            status = 0
+        else:
+            status = self.movieIds[room]
+            self.members.setdefault(room, set()).add(userName)
+        # Replacing the record keeps its place in the dictionary
+        self.records[userName] = self.format.encode_utilisateur(userName, status)
+
+    def leaveRoom(self, userName):
+        room = self.rooms[userName]
+        if room in self.members:
+            self.members[room].discard(userName)
+            if not self.members[room]:
+                del self.members[room]
+
+    def getRoom(self, userName):
+        return self.rooms.get(userName)
+
+    def getMembers(self, room):
+        # The users of a movie room, in the order of the server user list
+        return sorted(self.members.get(room, ()), key=self.order.__getitem__)
+
+    def encodeRoom(self, room):
+        """
+        Returns the body of the Type 6 message sent to the users of
+        ``room``: every user for the main room, the members of the movie
+        room otherwise.
+        """
+        if room == c2w_constants.ROOM_IDS.MAIN_ROOM:
+            return b''.join(self.records.values())
+        return b''.join(self.records[userName] for userName in self.getMembers(room))
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+
+parser = argparse.ArgumentParser(description='c2w load generator')
+parser.add_argument('-t', '--protocol', dest='protocol',
+                    choices=['UDP', 'TCP'],
+                    help='The protocol used by the server.',
+                    default='UDP')
+parser.add_argument('-m', '--machine', dest='host', type=str,
+                    help='The server name or IP address to connect to.',
+                    default='127.0.0.1')
+parser.add_argument('-p', '--port', dest='serverPort', type=int,
+                    help='The port number used by the server.',
+                    default=1950)
+parser.add_argument('-c', '--clients', dest='clients', type=int,
+                    help='The number of simulated clients.',
+                    default=1000)
+parser.add_argument('-d', '--duration', dest='duration', type=float,
+                    help='The duration of the run, in seconds.',
+                    default=30)
+parser.add_argument('--login-rate', dest='loginRate', type=float,
+                    help='The number of clients logging in per second.',
+                    default=200)
+parser.add_argument('--chat-rate', dest='chatRate', type=float,
+                    help='The number of chat messages sent per second ' +
+                    'by each client.',
+                    default=0.5)
+parser.add_argument('--hop-rate', dest='hopRate', type=float,
+                    help='The number of room changes per second ' +
+                    'by each client.',
+                    default=0.1)
+parser.add_argument('--server-pid', dest='serverPid', type=int,
+                    help='The pid of the server, to report its CPU usage.',
+                    default=None)
+parser.add_argument('-o', '--output', dest='outputFile',
+                    help='Write the JSON report to this file instead ' +
+                    'of the standard output.',
+                    default=None)
+parser.add_argument('-e', '--debug',
+                    dest='debugFlag',
+                    help='Raise the log level to debug',
+                    action="store_true",
+                    default=False)
+
+options = parser.parse_args()
+
+# Set path and import LoadStart once the arguments are parsed
+from set_path import set_path
+set_path(options.debugFlag)
+from c2w.bench.load_generator import LoadStart
+
+
+# Call start function
+LoadStart(options.protocol,
+          options.host,
+          options.serverPort,
+          options.clients,
+          options.duration,
+          options.loginRate,
+          options.chatRate,
+          options.hopRate,
+          options.serverPid,
+          options.outputFile,
+          options.debugFlag)
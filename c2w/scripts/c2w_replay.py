@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+
+parser = argparse.ArgumentParser(description='c2w capture replay')
+parser.add_argument('captureFile',
+                    help='The capture file written by a server started ' +
+                    'with --capture.')
+parser.add_argument('-r', '--repeat', dest='repeat', type=int,
+                    help='The number of times the capture is replayed.',
+                    default=1)
+parser.add_argument('-o', '--output', dest='outputFile',
+                    help='Write the JSON report to this file instead ' +
+                    'of the standard output.',
+                    default=None)
+parser.add_argument('-e', '--debug',
+                    dest='debugFlag',
+                    help='Raise the log level to debug',
+                    action="store_true",
+                    default=False)
+
+options = parser.parse_args()
+
+# Set path and import ReplayStart once the arguments are parsed
+from set_path import set_path
+set_path(options.debugFlag)
+from c2w.bench.replay import ReplayStart
+
+
+# Call start function
+ReplayStart(options.captureFile,
+            options.repeat,
+            options.outputFile,
+            options.debugFlag)
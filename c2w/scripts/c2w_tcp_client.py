@@ -5,11 +5,6 @@ import argparse
 import subprocess
 import os
 
-# Set path and import C2wStart
-from set_path import set_path
-set_path()
-from  c2w.main.c2w_client import C2wStart
-
 # Settings
 protocol = 'TCP'
 
@@ -22,6 +17,11 @@ parser.add_argument('-e', '--debug',
 
 options = parser.parse_args()
 
+# Set path and import C2wStart once the arguments are parsed
+from set_path import set_path
+set_path(options.debugFlag)
+from c2w.main.c2w_client import C2wStart
+
 # Call start function
 C2wStart(protocol,
          options.debugFlag, 
@@ -5,11 +5,6 @@ import argparse
 import subprocess
 import os
 
-# Set path and import C2wStart
-from set_path import set_path
-set_path()
-from  c2w.main.c2w_server import C2wStart
-
 # Settings
 protocol = 'TCP'
 
@@ -33,9 +28,38 @@ parser.add_argument('-e', '--debug',
                     help='Raise the log level to debug',
                     action="store_true",
                     default=False)
+parser.add_argument('--metrics-port', dest='metricsPort', type=int,
+                    help='Serve the protocol metrics on this local ' +
+                    'HTTP port.',
+                    default=None)
+parser.add_argument('--metrics-dump', dest='metricsDumpFlag',
+                    help='Dump the protocol metrics when the server ' +
+                    'receives SIGUSR1.',
+                    action="store_true", default=False)
+parser.add_argument('--metrics-file', dest='metricsFile',
+                    help='The file the metrics are dumped to (standard ' +
+                    'error by default).',
+                    default=None)
+parser.add_argument('--capture', dest='captureFile',
+                    help='Record every packet received and sent in ' +
+                    'this capture file.',
+                    default=None)
 
 options = parser.parse_args()
 
+# Set path and import C2wStart once the arguments are parsed
+from set_path import set_path
+set_path(options.debugFlag)
+from c2w.main.c2w_server import C2wStart
+import c2w.protocol.metrics as metrics
+import c2w.protocol.capture as capture
+
+if options.metricsPort is not None or options.metricsDumpFlag:
+    metrics.enable(options.metricsPort,
+                   options.metricsDumpFlag,
+                   options.metricsFile)
+if options.captureFile is not None:
+    capture.enable(options.captureFile, capture.TCP)
 
 # Call start function
 C2wStart(protocol,
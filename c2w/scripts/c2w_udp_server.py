@@ -5,11 +5,6 @@ import argparse
 import subprocess
 import os
 
-# Set path and import C2wStart
-from set_path import set_path
-set_path()
-from  c2w.main.c2w_server import C2wStart
-
 # Settings
 protocol = 'UDP'
 
@@ -36,9 +31,49 @@ parser.add_argument('-e', '--debug',
 parser.add_argument('-l', '--loss-pr', dest='lossPr',
                     help='The packet loss probability for outgoing ' +
                     'packets.', type=float, default=0)
+parser.add_argument('--metrics-port', dest='metricsPort', type=int,
+                    help='Serve the protocol metrics on this local ' +
+                    'HTTP port.',
+                    default=None)
+parser.add_argument('--metrics-dump', dest='metricsDumpFlag',
+                    help='Dump the protocol metrics when the server ' +
+                    'receives SIGUSR1.',
+                    action="store_true", default=False)
+parser.add_argument('--metrics-file', dest='metricsFile',
+                    help='The file the metrics are dumped to (standard ' +
+                    'error by default).',
+                    default=None)
+parser.add_argument('--capture', dest='captureFile',
+                    help='Record every packet received and sent in ' +
+                    'this capture file.',
+                    default=None)
+parser.add_argument('--rate-limit', dest='rateLimit', type=float,
+                    help='Drop the packets of a source address sending ' +
+                    'more than this number of packets per second.',
+                    default=None)
+parser.add_argument('--rate-burst', dest='rateBurst', type=float,
+                    help='The number of packets a source address may ' +
+                    'send at once (twice the rate limit by default).',
+                    default=None)
 
 options = parser.parse_args()
 
+# Set path and import C2wStart once the arguments are parsed
+from set_path import set_path
+set_path(options.debugFlag)
+from c2w.main.c2w_server import C2wStart
+import c2w.protocol.metrics as metrics
+import c2w.protocol.capture as capture
+import c2w.protocol.rate_limiter as rate_limiter
+
+if options.metricsPort is not None or options.metricsDumpFlag:
+    metrics.enable(options.metricsPort,
+                   options.metricsDumpFlag,
+                   options.metricsFile)
+if options.captureFile is not None:
+    capture.enable(options.captureFile, capture.UDP)
+if options.rateLimit:
+    rate_limiter.enable(options.rateLimit, options.rateBurst)
 
 # Call start function
 C2wStart(protocol,
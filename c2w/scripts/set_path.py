@@ -10,7 +10,9 @@ test_var_name = 'RESIMPLPATH'
 default_c2w_path = '~stockrsm/r209'
 stockrsm_twisted_path = "/usr/home/enstb2/projets/stockrsm/.local/lib/python3.4/site-packages"
 
-def set_path():
+def set_path(verbose=False):
+    # Twisted is imported by the launchers when they need it, and only
+    # reported in verbose mode
     c2w_path = os.getenv(env_var_name, default_c2w_path)
     script_path = dirname(dirname(dirname(os.path.abspath(__file__))))
     stock_rsm_path = os.path.expanduser(c2w_path)
@@ -28,8 +30,8 @@ def set_path():
     if (os.path.isdir(stockrsm_twisted_path)):
         sys.path.insert(0, stockrsm_twisted_path)
     
-    import twisted
-    print ("Twisted version in use: " + twisted.version.short())
-    
-    print (sys.path)
+    if verbose:
+        import twisted
+        print ("Twisted version in use: " + twisted.version.short())
+        print (sys.path)
     return test_path
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from twisted.trial import unittest
+import tempfile
+import shutil
+import os
+import c2w.protocol.capture as capture
+from c2w.protocol.format_type import FormatType
+from c2w.bench.replay import replay, DEFAULT_MOVIES
+
+
+class CaptureFileTestCase(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'capture')
+
+    def test_largeChunkRoundTrip(self):
+        # A TCP chunk may be longer than 65535 bytes
+        data = bytes(range(256)) * 300
+        recorder = capture.PacketRecorder(self.path, capture.TCP)
+        recorder.record(capture.RECEIVED, data, ('10.0.0.1', 5000))
+        recorder.close()
+        self.assertEqual(capture.readTransport(self.path), capture.TCP)
+        records = list(capture.readCapture(self.path))
+        self.assertEqual([(direction, host_port, data) for timestamp, direction, host_port, data in records],
+                         [(capture.RECEIVED, ('10.0.0.1', 5000), data)])
+
+    def test_olderFormatRefused(self):
+        with open(self.path, 'wb') as captureFile:
+            captureFile.write(b'C2WCAP01')
+        self.assertRaises(ValueError, capture.readTransport, self.path)
+        self.assertRaises(ValueError, list, capture.readCapture(self.path))
+
+    def test_tcpReplay(self):
+        # The stream of each client is cut anywhere, and several clients are interleaved
+        format = FormatType()
+        streams = {('10.0.0.1', 5000): format.msg_connexion(0, 'alice') + format.msg_chat(1, 'alice', 'hello'),
+                   ('10.0.0.2', 5001): format.msg_connexion(0, 'bob')}
+        records = []
+        for offset in range(0, 64, 3):
+            for host_port, stream in streams.items():
+                if offset < len(stream):
+                    records.append((1.0, capture.RECEIVED, host_port, stream[offset:offset + 3]))
+        result = replay(records, DEFAULT_MOVIES, capture.TCP)
+        self.assertEqual(result['connected_users'], 2)
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from twisted.trial import unittest
+from c2w.protocol.rate_limiter import RateLimiter
+
+
+class RateLimiterTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.limiter = RateLimiter(10, 5, clock=lambda: self.now)
+
+    def test_burstThenRate(self):
+        self.assertEqual([self.limiter.allow('10.0.0.1') for i in range(6)], [True] * 5 + [False])
+        # Other sources have their own bucket
+        self.assertTrue(self.limiter.allow('10.0.0.2'))
+        self.now += 0.1
+        self.assertEqual([self.limiter.allow('10.0.0.1') for i in range(2)], [True, False])
+        self.assertEqual(self.limiter.stats(), {'sources': 2, 'allowed': 7, 'dropped': 2})
+
+    def test_idleSourcesSwept(self):
+        self.limiter.allow('10.0.0.1')
+        self.now += self.limiter.refillTime
+        self.limiter.allow('10.0.0.2')
+        self.assertEqual(list(self.limiter.buckets), ['10.0.0.2'])
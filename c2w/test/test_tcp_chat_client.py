@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+from twisted.trial import unittest
+from c2w.protocol.tcp_chat_client import c2wTcpChatClientProtocol
+from c2w.protocol.format_type import FormatType
+import c2w.main.constants as c2w_constants
+from c2w.bench.fakes import FakeClock, FakeTransport, FakeServerProxy
+from c2w.test.test_tcp_chat_server import readFrames
+
+
+class FakeClientProxy:
+
+    def __init__(self):
+        self.userList = None
+
+    def initCompleteONE(self, userList, movieList):
+        self.userList = userList
+
+
+class PipelinedFramesTestCase(unittest.TestCase):
+
+    def test_acksAndMessagesInOneChunk(self):
+        clientProxy = FakeClientProxy()
+        protocol = c2wTcpChatClientProtocol(clientProxy, '127.0.0.1', 1950)
+        protocol.transport = FakeTransport(keep=True)
+        protocol.clock = FakeClock()
+        protocol.updates.clock = protocol.clock
+        protocol.sendLoginRequestOIE('alice')
+        protocol.sendChatMessageOIE('first')
+        protocol.sendChatMessageOIE('second')
+        self.assertEqual(len(protocol.waitingMessages), 3)
+
+        # The acks of the window and the answer to the login arrive together
+        serverProxy = FakeServerProxy([('Movie 1', '127.0.0.1', 1960)])
+        serverProxy.addUser('alice', c2w_constants.ROOM_IDS.MAIN_ROOM)
+        format = FormatType()
+        protocol.transport.written = []
+        protocol.dataReceived(format.msg_acquittemen(0) + format.msg_acquittemen(1) +
+                              format.msg_acquittemen(2) + format.msg_acceptation_connexion(0) +
+                              format.msg_liste_des_films(serverProxy.getMovieList(), 1) +
+                              format.msg_liste_des_utilisateurs(serverProxy.getUserList(), serverProxy, 2))
+
+        self.assertEqual(protocol.waitingMessages, {})
+        self.assertEqual(protocol.format.tcpData, b'')
+        self.assertEqual(readFrames(protocol.transport), [(0, 0), (1, 0), (2, 0)])
+        self.assertEqual(clientProxy.userList, [('alice', c2w_constants.ROOM_IDS.MAIN_ROOM)])
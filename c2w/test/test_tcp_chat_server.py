@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+from twisted.trial import unittest
+from c2w.protocol.tcp_chat_server import c2wTcpChatServerProtocol
+from c2w.protocol.format_type import FormatType
+from c2w.bench.fakes import FakeClock, FakeTransport, FakeServerProxy
+
+
+def readFrames(transport):
+    # Decodes the frames written by a protocol: (num_sequence, type)
+    format = FormatType()
+    frames = []
+    for data, host_port in transport.written:
+        info = format.datagram_received_tcp(data)
+        while info is not None:
+            frames.append((info[1], info[2]))
+            info = format.datagram_received_tcp(b'')
+    return frames
+
+
+class PipelinedFramesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.serverProxy = FakeServerProxy([('Movie 1', '127.0.0.1', 1960)])
+        self.protocol = c2wTcpChatServerProtocol(self.serverProxy, '10.0.0.1', 5000)
+        self.protocol.transport = FakeTransport(keep=True)
+        self.protocol.clock = FakeClock()
+        # The client sends up to a window of messages before the first ack
+        format = FormatType()
+        self.frames = [format.msg_connexion(0, 'alice'),
+                       format.msg_chat(1, 'alice', 'first'),
+                       format.msg_selection_film(2, 'Movie 1'),
+                       format.msg_quitter_salon(3)]
+
+    def assertAllHandled(self):
+        acks = [num_sequence for num_sequence, type in readFrames(self.protocol.transport) if type == 0]
+        self.assertEqual(acks, [0, 1, 2, 3])
+        self.assertEqual(self.protocol.format.tcpData, b'')
+        self.assertEqual(self.protocol.connectedUser['10.0.0.1:5000'].receptionCounter, 4)
+        # The movie room was joined and left
+        self.assertEqual(self.serverProxy.streamingStarted, 1)
+        self.assertEqual(self.serverProxy.streamingStopped, 1)
+
+    def test_framesInOneChunk(self):
+        self.protocol.dataReceived(b''.join(self.frames))
+        self.assertAllHandled()
+
+    def test_framesAcrossChunks(self):
+        data = b''.join(self.frames)
+        # Chunks cutting the frames at other places than their boundaries
+        for start in range(0, len(data), 3):
+            self.protocol.dataReceived(data[start:start + 3])
+        self.assertAllHandled()
+
+
+class MovieStreamingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.serverProxy = FakeServerProxy([('Movie 1', '127.0.0.1', 1960)])
+        self.clock = FakeClock()
+        self.format = FormatType()
+        self.protocols = {}
+        self.numMessages = {}
+
+    def send(self, userName, pack):
+        self.protocols[userName].dataReceived(pack)
+        self.numMessages[userName] += 1
+
+    def login(self, userName, serverProxy=None):
+        index = len(self.protocols) + 1
+        protocol = c2wTcpChatServerProtocol(serverProxy or self.serverProxy, '10.0.0.%d' % index, 5000)
+        protocol.transport = FakeTransport()
+        protocol.clock = self.clock
+        self.protocols[userName] = protocol
+        self.numMessages[userName] = 0
+        self.send(userName, self.format.msg_connexion(0, userName))
+
+    def joinMovie(self, userName):
+        self.send(userName, self.format.msg_selection_film(self.numMessages[userName], 'Movie 1'))
+
+    def assertStreaming(self, viewers):
+        self.assertEqual(self.serverProxy.streamingStarted - self.serverProxy.streamingStopped,
+                         1 if viewers else 0)
+        self.assertEqual(self.protocols['alice'].state.movieViewers, {'Movie 1': viewers} if viewers else {})
+
+    def test_lastViewerLeaves(self):
+        self.login('alice')
+        self.login('bob')
+        self.joinMovie('alice')
+        self.joinMovie('bob')
+        self.assertEqual(self.serverProxy.streamingStarted, 1)
+        self.assertStreaming(2)
+
+        self.send('alice', self.format.msg_quitter_salon(self.numMessages['alice']))
+        self.assertStreaming(1)
+        self.send('bob', self.format.msg_quitter_app(self.numMessages['bob']))
+        self.assertStreaming(0)
+        self.assertEqual(self.serverProxy.streamingStopped, 1)
+
+    def test_lastViewerDisconnects(self):
+        self.login('alice')
+        self.login('bob')
+        self.joinMovie('alice')
+        self.joinMovie('bob')
+
+        self.protocols['alice'].connectionLost(None)
+        self.clock.advance(0)
+        self.assertStreaming(1)
+        self.protocols['bob'].connectionLost(None)
+        self.clock.advance(0)
+        self.assertStreaming(0)
+        self.assertEqual(self.serverProxy.getUserList(), [])
+
+    def test_serversCountApart(self):
+        otherProxy = FakeServerProxy([('Movie 1', '127.0.0.1', 1960)])
+        self.login('alice')
+        self.login('bob', otherProxy)
+        self.joinMovie('alice')
+        self.joinMovie('bob')
+        self.assertEqual(otherProxy.streamingStarted, 1)
+
+        self.send('bob', self.format.msg_quitter_salon(self.numMessages['bob']))
+        self.assertEqual(otherProxy.streamingStopped, 1)
+        self.assertStreaming(1)
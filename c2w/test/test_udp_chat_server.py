@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+from twisted.trial import unittest
+import c2w.protocol.constants as constants
+from c2w.protocol.udp_chat_server import c2wUdpChatServerProtocol
+from c2w.protocol.format_type import FormatType
+from c2w.bench.fakes import FakeClock, FakeTransport, FakeServerProxy
+
+ALICE = ('10.0.0.1', 5000)
+BOB = ('10.0.0.2', 5000)
+
+
+class SessionSweepTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.format = FormatType()
+        self.protocol = c2wUdpChatServerProtocol(FakeServerProxy([('Movie 1', '127.0.0.1', 1960)]), 0)
+        self.protocol.transport = FakeTransport(keep=True)
+        self.protocol.clock = FakeClock()
+        for userName, host_port in (('alice', ALICE), ('bob', BOB)):
+            self.protocol.datagramReceived(self.format.msg_connexion(0, userName), host_port)
+        for host_port in (ALICE, BOB):
+            self.ackAll(host_port)
+
+    def ackAll(self, host_port):
+        # The congestion window sends the next messages as the first ones are acknowledged
+        user = self.protocol.connectedUser['%s:%d' % host_port]
+        while user.waitingMessages:
+            self.protocol.datagramReceived(self.format.msg_acquittemen(user.emissionCounter), host_port)
+
+    def probes(self, host_port):
+        return [self.format.datagram_received(data)[1] for data, destination in self.protocol.transport.written
+                if destination == host_port]
+
+    def test_keepaliveUsesNoSequenceNumber(self):
+        user = self.protocol.connectedUser['%s:%d' % ALICE]
+        sent = user.num_sequence
+        self.protocol.transport.written = []
+        # Far more probes than the 12 bit sequence numbers
+        for i in range(5000):
+            self.protocol.clock.advance(constants.KEEPALIVE_INTERVAL + constants.SESSION_SWEEP_INTERVAL)
+            for host_port in (ALICE, BOB):
+                for num_sequence in self.probes(host_port):
+                    self.protocol.datagramReceived(self.format.msg_acquittemen(num_sequence), host_port)
+            self.protocol.transport.written = []
+        self.assertEqual(user.num_sequence, sent)
+        self.assertEqual(user.waitingMessages, {})
+        self.assertEqual(len(self.protocol.connectedUser), 2)
+
+    def test_silentSessionRemoved(self):
+        self.protocol.transport.written = []
+        for i in range(constants.IDLE_TIMEOUT // constants.SESSION_SWEEP_INTERVAL + 2):
+            self.protocol.clock.advance(constants.SESSION_SWEEP_INTERVAL)
+        # Probed on every sweep, then removed
+        self.assertEqual(len(self.probes(ALICE)), (constants.IDLE_TIMEOUT - constants.KEEPALIVE_INTERVAL)
+                         // constants.SESSION_SWEEP_INTERVAL)
+        self.assertEqual(self.protocol.connectedUser, {})
+
+    def test_failedSessionSkipped(self):
+        self.protocol.connectedUser['%s:%d' % ALICE].lastSeen = 'broken'
+        self.protocol.transport.written = []
+        self.protocol.clock.advance(constants.KEEPALIVE_INTERVAL + constants.SESSION_SWEEP_INTERVAL)
+        # bob is still probed, and the sweep goes on
+        self.assertEqual(len(self.probes(BOB)), 1)
+        self.assertTrue(self.protocol.sweepLoop.running)
+
+    def test_stopProtocol(self):
+        sweepLoop = self.protocol.sweepLoop
+        self.protocol.stopProtocol()
+        self.assertFalse(sweepLoop.running)
+        self.assertIsNone(self.protocol.sweepLoop)
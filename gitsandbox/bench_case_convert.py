@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import tempfile
+import json
+import time
+import os
+from case_convert import UPPER_TABLE, convertFile, convertStream, convertText
+
+# Size of the sample converted with the former byte by byte loop (too slow for the whole file)
+LEGACY_SAMPLE = 256 * 1024
+# Non ASCII text replicated for the text mode, with a letter whose upper case is longer
+UNICODE_SAMPLE = 'Stra\u00dfe d\u00e9j\u00e0 vue, \u03bf\u03b4\u03bf\u03c2 \u043c\u0438\u0440 fa\u00e7ade.\n'
+
+
+def makeFile(path, size, source):
+    # Replicates the source file up to size bytes
+    with open(source, 'rb') as f:
+        block = f.read()
+    with open(path, 'wb') as f:
+        written = 0
+        block = block * max(1, (1024 * 1024) // len(block))
+        while written < size:
+            f.write(block[:size - written])
+            written += min(len(block), size - written)
+
+
+def convertLegacy(path):
+    with open(path, 'rb+') as f:
+        while 1:
+            c = f.read(1)
+            if not c:
+                break
+            f.seek(-1, 1)
+            f.write(c.upper())
+
+
+def measure(name, size, function):
+    startTime = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - startTime
+    return {'mode': name, 'bytes': size, 'seconds': elapsed, 'mb_per_second': size / elapsed / 1e6}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='upper/lower throughput benchmark')
+    parser.add_argument('-s', '--size', dest='size', type=int,
+                        help='size of the converted file in MB', default=256)
+    parser.add_argument('-j', '--jobs', dest='jobs', type=int,
+                        help='number of processes of the parallel mode', default=None)
+    parser.add_argument('-d', '--directory', dest='directory',
+                        help='directory of the temporary files', default=None)
+    options = parser.parse_args()
+
+    source = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'loremipsum.txt')
+    size = options.size * 1024 * 1024
+    results = []
+
+    with tempfile.TemporaryDirectory(dir=options.directory) as directory:
+        path = os.path.join(directory, 'replicas.txt')
+
+        makeFile(path, LEGACY_SAMPLE, source)
+        results.append(measure('legacy (byte by byte)', LEGACY_SAMPLE, lambda: convertLegacy(path)))
+
+        makeFile(path, size, source)
+        with open(path, 'rb') as f:
+            expected = f.read().translate(UPPER_TABLE)
+        for mode in ('chunks', 'mmap', 'parallel'):
+            makeFile(path, size, source)
+            results.append(measure(mode, size, lambda: convertFile(path, UPPER_TABLE, mode, options.jobs)))
+            with open(path, 'rb') as f:
+                assert f.read() == expected, mode
+
+        makeFile(path, size, source)
+        with open(path, 'rb') as source_, open(os.devnull, 'wb') as destination:
+            results.append(measure('stream', size, lambda: convertStream(source_, destination, UPPER_TABLE)))
+
+        makeFile(path, size, source)
+        results.append(measure('text (ascii)', size, lambda: convertText(path, str.upper)))
+        with open(path, 'rb') as f:
+            assert f.read() == expected, 'text'
+
+        unicodePath = os.path.join(directory, 'unicode.txt')
+        with open(unicodePath, 'wb') as f:
+            f.write(UNICODE_SAMPLE.encode('utf-8'))
+        makeFile(path, size, unicodePath)
+        with open(path, 'rb') as f:
+            # The replication may cut the last character
+            expected = f.read().decode('utf-8', 'surrogateescape').upper().encode('utf-8', 'surrogateescape')
+        results.append(measure('text (utf-8)', size,
+                               lambda: convertText(path, str.upper, errors='surrogateescape')))
+        with open(path, 'rb') as f:
+            assert f.read() == expected, 'text (utf-8)'
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import subprocess
+import argparse
+import tempfile
+import json
+import time
+import os
+from lines_count import countFile
+from bench_case_convert import makeFile
+
+
+def countLegacy(path):
+    # The former readline() loop
+    count = 0
+    with open(path, 'r') as f:
+        while 1:
+            ln = f.readline()
+            if not ln:
+                break
+            count += 1
+    return count
+
+
+def countWc(path):
+    return int(subprocess.check_output(['wc', '-l', path]).split()[0])
+
+
+def measure(name, size, function):
+    startTime = time.perf_counter()
+    count = function()
+    elapsed = time.perf_counter() - startTime
+    return {'counter': name, 'lines': count, 'seconds': elapsed, 'mb_per_second': size / elapsed / 1e6}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='lines_count.py benchmark against wc -l')
+    parser.add_argument('-s', '--size', dest='size', type=int,
+                        help='size of the counted file in MB', default=1024)
+    parser.add_argument('-j', '--jobs', dest='jobs', type=int,
+                        help='number of processes of the parallel count', default=os.cpu_count())
+    parser.add_argument('--no-legacy', dest='legacy', action='store_false',
+                        help='skip the former readline() loop', default=True)
+    parser.add_argument('-d', '--directory', dest='directory',
+                        help='directory of the temporary file', default=None)
+    options = parser.parse_args()
+
+    source = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'loremipsum.txt')
+    size = options.size * 1024 * 1024
+    results = []
+
+    with tempfile.TemporaryDirectory(dir=options.directory) as directory:
+        path = os.path.join(directory, 'replicas.txt')
+        makeFile(path, size, source)
+        # Read once, so that every counter finds the file in the page cache
+        countWc(path)
+
+        results.append(measure('wc -l', size, lambda: countWc(path)))
+        results.append(measure('lines_count.py', size, lambda: countFile(path)))
+        results.append(measure('lines_count.py -j %d' % options.jobs, size, lambda: countFile(path, options.jobs)))
+        if options.legacy:
+            results.append(measure('readline() loop', size, lambda: countLegacy(path)))
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
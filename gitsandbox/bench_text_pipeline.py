@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import subprocess
+import argparse
+import tempfile
+import shutil
+import json
+import time
+import os
+from lines_count import countFile
+from case_convert import UPPER_TABLE, convertRange
+from text_pipeline import runFile, runFiles
+from bench_case_convert import makeFile
+
+
+def separatePasses(path, copyPath):
+    # What the single tools need: a count, a copy and its conversion in place
+    lines = countFile(path)
+    words = int(subprocess.check_output(['wc', '-w', path]).split()[0])
+    shutil.copyfile(path, copyPath)
+    convertRange(copyPath, UPPER_TABLE)
+    return lines, words
+
+
+def measure(name, size, function):
+    startTime = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - startTime
+    return {'run': name, 'bytes': size, 'seconds': elapsed, 'mb_per_second': size / elapsed / 1e6}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='text_pipeline.py benchmark against separate passes')
+    parser.add_argument('-s', '--size', dest='size', type=int,
+                        help='size of each file in MB', default=256)
+    parser.add_argument('-n', '--files', dest='files', type=int,
+                        help='number of files of the concurrent runs', default=4)
+    parser.add_argument('-d', '--directory', dest='directory',
+                        help='directory of the temporary files', default=None)
+    options = parser.parse_args()
+
+    source = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'loremipsum.txt')
+    size = options.size * 1024 * 1024
+    stages = ['lines', 'words', 'bytes', 'upper']
+    results = []
+
+    with tempfile.TemporaryDirectory(dir=options.directory) as directory:
+        outputDirectory = os.path.join(directory, 'output')
+        os.mkdir(outputDirectory)
+        paths = [os.path.join(directory, 'replicas%d.txt' % i) for i in range(options.files)]
+        for path in paths:
+            makeFile(path, size, source)
+
+        copyPath = os.path.join(outputDirectory, 'copy.txt')
+        results.append(measure('separate passes', size, lambda: separatePasses(paths[0], copyPath)))
+        results.append(measure('pipeline', size, lambda: runFile(paths[0], stages, copyPath)))
+
+        total = size * len(paths)
+        results.append(measure('pipeline, %d files, -j 1' % len(paths), total,
+                               lambda: runFiles(paths, stages, outputDirectory, 1)))
+        results.append(measure('pipeline, %d files' % len(paths), total,
+                               lambda: runFiles(paths, stages, outputDirectory)))
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
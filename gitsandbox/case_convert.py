@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+Case conversion of the ASCII letters of a file, used by upper.py and
+lower.py.  The bytes are converted by blocks with bytes.translate:
+
+- chunks: in place, with positioned reads and writes, or from a
+  stream to another (pipes);
+- mmap: in place, through a memory map of the file;
+- parallel: in place, the file being split into ranges converted by
+  several processes;
+- text: all the letters of the encoding (str.upper or str.lower),
+  decoded incrementally and written to a temporary file which then
+  replaces the file (a named pipe is converted to the standard output).
+  The size of the text may change (\u00df gives SS).
+
+The chunks are faster than the memory map on Linux: the copies made
+by pread and pwrite cost less than the page faults of the mapping.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import functools
+import tempfile
+import codecs
+import shutil
+import string
+import mmap
+import stat
+import sys
+import os
+
+UPPER_TABLE = bytes.maketrans(string.ascii_lowercase.encode('ascii'), string.ascii_uppercase.encode('ascii'))
+LOWER_TABLE = bytes.maketrans(string.ascii_uppercase.encode('ascii'), string.ascii_lowercase.encode('ascii'))
+
+# Bytes converted at once
+CHUNK_SIZE = 16 * 1024 * 1024
+
+MODES = ('chunks', 'mmap', 'parallel', 'text')
+
+
+def convertRange(path, table, start=0, end=None, chunkSize=CHUNK_SIZE):
+    # Converts the bytes [start, end[ (up to the end without end) of the file in place
+    # with positioned reads and writes
+    fd = os.open(path, os.O_RDWR)
+    try:
+        offset = start
+        while end is None or offset < end:
+            chunk = os.pread(fd, chunkSize if end is None else min(chunkSize, end - offset), offset)
+            if not chunk:
+                break
+            os.pwrite(fd, chunk.translate(table), offset)
+            offset += len(chunk)
+    finally:
+        os.close(fd)
+    return offset - start
+
+
+def convertMapped(path, table, chunkSize=CHUNK_SIZE):
+    # Converts the file in place through a memory map
+    with open(path, 'r+b') as f:
+        with mmap.mmap(f.fileno(), 0) as data:
+            if hasattr(data, 'madvise'):
+                data.madvise(mmap.MADV_WILLNEED)
+            for offset in range(0, len(data), chunkSize):
+                data[offset:offset + chunkSize] = data[offset:offset + chunkSize].translate(table)
+            return len(data)
+
+
+def convertStream(source, destination, table, chunkSize=CHUNK_SIZE):
+    """
+    Converts the binary stream ``source`` into ``destination``, holding
+    one chunk at a time.
+    """
+    size = 0
+    while True:
+        chunk = source.read(chunkSize)
+        if not chunk:
+            break
+        destination.write(chunk.translate(table))
+        size += len(chunk)
+    destination.flush()
+    return size
+
+
+def convertParallel(path, table, jobs=None, chunkSize=CHUNK_SIZE):
+    # Converts the file in place, one range per process
+    size = os.path.getsize(path)
+    jobs = jobs or os.cpu_count() or 1
+    # The ranges are aligned on the page size, so that the processes never write the same page
+    rangeSize = -(-size // jobs // mmap.PAGESIZE) * mmap.PAGESIZE or mmap.PAGESIZE
+    ranges = [(start, min(start + rangeSize, size)) for start in range(0, size, rangeSize)]
+    if len(ranges) <= 1:
+        return convertRange(path, table, 0, size, chunkSize)
+
+    with ProcessPoolExecutor(len(ranges)) as executor:
+        futures = [executor.submit(convertRange, path, table, start, end, chunkSize) for start, end in ranges]
+        return sum(future.result() for future in futures)
+
+
+@functools.lru_cache(maxsize=None)
+def isBoundary(char):
+    # Neither cased nor case-ignorable (as str.lower sees them): a sigma is final before it
+    return ('A\u03a3' + char + 'A').lower()[1] == '\u03c2'
+
+
+def wordBoundary(text, start=0):
+    # Returns the position of the end of the last complete word of the text, 0 without one.
+    # text[:start] is known to hold no boundary
+    for i in range(len(text) - 1, start - 1, -1):
+        if isBoundary(text[i]):
+            return i + 1
+    return 0
+
+
+def convertTextStream(source, destination, method, encoding='utf-8', errors='strict', chunkSize=CHUNK_SIZE):
+    """
+    Converts the binary stream ``source`` into ``destination`` with the
+    str ``method`` (str.upper or str.lower), decoding and encoding one
+    chunk at a time.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors)
+    encoder = codecs.getincrementalencoder(encoding)(errors)
+    pending = ''
+    size = 0
+    while True:
+        chunk = source.read(chunkSize)
+        text = pending + decoder.decode(chunk, final=not chunk)
+        if chunk:
+            # The last word waits for the next chunk, however long: lower()
+            # maps a final sigma according to the letters which follow it
+            cut = wordBoundary(text, len(pending))
+            text, pending = text[:cut], text[cut:]
+        destination.write(encoder.encode(method(text), not chunk))
+        if not chunk:
+            break
+        size += len(chunk)
+    destination.flush()
+    return size
+
+
+def convertText(path, method, encoding='utf-8', errors='strict', chunkSize=CHUNK_SIZE):
+    # Converts the file through a temporary file of the same directory, renamed over it,
+    # and a named pipe to the standard output
+    if stat.S_ISFIFO(os.stat(path).st_mode):
+        with open(path, 'rb') as source:
+            return convertTextStream(source, sys.stdout.buffer, method, encoding, errors, chunkSize)
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, temporaryPath = tempfile.mkstemp(prefix='.' + name + '.', dir=directory)
+    try:
+        with open(path, 'rb') as source, os.fdopen(fd, 'wb') as destination:
+            size = convertTextStream(source, destination, method, encoding, errors, chunkSize)
+            os.fsync(destination.fileno())
+        shutil.copymode(path, temporaryPath)
+        os.replace(temporaryPath, path)
+    except BaseException:
+        os.unlink(temporaryPath)
+        raise
+    return size
+
+
+def convertFile(path, table, mode='chunks', jobs=None, chunkSize=CHUNK_SIZE):
+    """
+    Converts the file ``path`` in place and returns its size.  The files
+    which can not be mapped (empty files, devices) are converted by
+    chunks whatever the mode, and a named pipe is converted to the
+    standard output.
+    """
+    info = os.stat(path)
+    if stat.S_ISFIFO(info.st_mode):
+        with open(path, 'rb') as source:
+            return convertStream(source, sys.stdout.buffer, table, chunkSize)
+    if mode == 'mmap' and stat.S_ISREG(info.st_mode) and info.st_size > 0:
+        return convertMapped(path, table, chunkSize)
+    if mode == 'parallel' and stat.S_ISREG(info.st_mode):
+        return convertParallel(path, table, jobs, chunkSize)
+    return convertRange(path, table, chunkSize=chunkSize)
+
+
+def addArguments(parser):
+    # Options shared by upper.py and lower.py
+    parser.add_argument('-m', '--mode', dest='mode',
+                        choices=MODES,
+                        help='how the file is converted in place (chunks by default)',
+                        default='chunks')
+    parser.add_argument('-j', '--jobs', dest='jobs', type=int,
+                        help='number of processes of the parallel mode (one per CPU by default)',
+                        default=None)
+    parser.add_argument('--chunk-size', dest='chunkSize', type=int,
+                        help='number of bytes converted at once',
+                        default=CHUNK_SIZE)
+    parser.add_argument('--encoding', dest='encoding',
+                        help='encoding of the file in text mode (utf-8 by default)',
+                        default='utf-8')
+    parser.add_argument('--errors', dest='errors',
+                        choices=('strict', 'replace', 'surrogateescape'),
+                        help='handling of the undecodable bytes in text mode (strict by default)',
+                        default='strict')
+
+
+def run(options, table, method):
+    # Converts the file in place, or the standard input to the standard output without file
+    if options.mode == 'text':
+        if options.file is None:
+            convertTextStream(sys.stdin.buffer, sys.stdout.buffer, method, options.encoding, options.errors,
+                              options.chunkSize)
+        else:
+            convertText(options.file, method, options.encoding, options.errors, options.chunkSize)
+    elif options.file is None:
+        convertStream(sys.stdin.buffer, sys.stdout.buffer, table, options.chunkSize)
+    else:
+        convertFile(options.file, table, options.mode, options.jobs, options.chunkSize)
@@ -1,9 +1,16 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+from concurrent.futures import ProcessPoolExecutor
 import argparse
+import sys
 import os
 
+# Bytes read at once
+BLOCK_SIZE = 1024 * 1024
+# Smallest file split across processes
+PARALLEL_SIZE = 64 * 1024 * 1024
+
 # Credit: http://stackoverflow.com/questions/11540854/ \
 #  file-as-command-line-argument-for-argparse-error-message-if-argument-is-not-va
 
@@ -11,21 +18,88 @@ def is_valid_file(parser, arg):
     if not os.path.exists(arg):
         parser.error("The file %s does not exist!" % arg)
     else:
-        return open(arg, 'r')  # return an open file handle
-
-parser = argparse.ArgumentParser(description='words count utility')
-parser.add_argument('-f', '--file',
-                    dest='file',
-                    help='input file', metavar="FILE",
-                    type=lambda x: is_valid_file(parser, x))
-
-options = parser.parse_args()
-
-count = 0
-while 1:
-    ln = options.file.readline()
-    if not ln:
-        break
-    count+=1
-options.file.close()
-print (count)
\ No newline at end of file
+        return arg
+
+
+def countStream(stream, blockSize=BLOCK_SIZE):
+    # Counts the lines of a binary stream, the last one having a newline or not
+    buffer = bytearray(blockSize)
+    count = 0
+    last = b'\n'
+    while 1:
+        size = stream.readinto(buffer)
+        if not size:
+            break
+        count += buffer.count(b'\n', 0, size)
+        last = buffer[size - 1:size]
+    return count + (last != b'\n')
+
+
+def countRange(path, start, end, blockSize=BLOCK_SIZE):
+    # Counts the newlines of the bytes [start, end[ of a file
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        count = 0
+        offset = start
+        while offset < end:
+            block = os.pread(fd, min(blockSize, end - offset), offset)
+            if not block:
+                break
+            count += block.count(b'\n')
+            offset += len(block)
+        return count
+    finally:
+        os.close(fd)
+
+
+def countFile(path, jobs=1, blockSize=BLOCK_SIZE):
+    """
+    Counts the lines of a file as the former readline() loop did: the
+    newlines, plus the last line when it has no newline.  Regular files
+    of PARALLEL_SIZE bytes or more are split in ranges counted by
+    ``jobs`` processes.
+    """
+    size = os.path.getsize(path)
+    if jobs <= 1 or size < PARALLEL_SIZE or not os.path.isfile(path):
+        with open(path, 'rb') as f:
+            return countStream(f, blockSize)
+
+    rangeSize = -(-size // jobs)
+    with ProcessPoolExecutor(jobs) as executor:
+        futures = [executor.submit(countRange, path, start, min(start + rangeSize, size), blockSize)
+                   for start in range(0, size, rangeSize)]
+        count = sum(future.result() for future in futures)
+    with open(path, 'rb') as f:
+        f.seek(size - 1)
+        return count + (f.read(1) != b'\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='lines count utility')
+    parser.add_argument('-f', '--file',
+                        dest='files', action='append',
+                        help='input file (can be repeated, standard input by default)', metavar="FILE",
+                        type=lambda x: is_valid_file(parser, x))
+    parser.add_argument('-j', '--jobs', dest='jobs', type=int,
+                        help='number of processes counting a large file', default=1)
+    parser.add_argument('-b', '--block-size', dest='blockSize', type=int,
+                        help='number of bytes read at once', default=BLOCK_SIZE)
+
+    options = parser.parse_args()
+
+    if not options.files:
+        print (countStream(sys.stdin.buffer, options.blockSize))
+    elif len(options.files) == 1:
+        print (countFile(options.files[0], options.jobs, options.blockSize))
+    else:
+        # One line per file and the total, as wc -l does
+        total = 0
+        for path in options.files:
+            count = countFile(path, options.jobs, options.blockSize)
+            total += count
+            print ('%d %s' % (count, path))
+        print ('%d total' % total)
+
+
+if __name__ == '__main__':
+    main()
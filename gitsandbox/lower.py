@@ -3,6 +3,7 @@
 
 import argparse
 import os
+from case_convert import addArguments, run, LOWER_TABLE
 
 # Credit: http://stackoverflow.com/questions/11540854/ \
 #  file-as-command-line-argument-for-argparse-error-message-if-argument-is-not-va
@@ -11,21 +12,15 @@ def is_valid_file(parser, arg):
     if not os.path.exists(arg):
         parser.error("The file %s does not exist!" % arg)
     else:
-        return open(arg, 'rb+')  # return an open file handle
+        return arg  # converted in place
 
 parser = argparse.ArgumentParser(description='lower utility')
 parser.add_argument('-f', '--file',
                     dest='file',
-                    help='input file', metavar="FILE",
+                    help='input file (standard input to standard output by default)', metavar="FILE",
                     type=lambda x: is_valid_file(parser, x))
+addArguments(parser)
 
 options = parser.parse_args()
 
-while 1:
-    c = options.file.read(1)
-    if not c:
-        break
-    options.file.seek(-1,1)
-    options.file.write(c.lower())
-    
-options.file.close()
+run(options, LOWER_TABLE, str.lower)
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Streams files through a chain of stages in a single pass, by chunks:
+
+- lines, words, bytes: count what goes through (as wc -l, -w and -c);
+- upper, lower: convert the ASCII letters (as upper.py and lower.py).
+
+The counts are printed as a JSON summary, and the converted data is
+written to a copy of each file when a conversion stage is given.
+Several files are processed concurrently, one per process.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict
+from case_convert import UPPER_TABLE, LOWER_TABLE, CHUNK_SIZE
+import argparse
+import json
+import sys
+import os
+
+# Maps the whitespace bytes to a space and the others to 'x': the words
+# are then counted as the ' x' pairs, in C
+WORDS_TABLE = bytes(0x20 if bytes([byte]).isspace() else 0x78 for byte in range(256))
+
+STAGES = ('lines', 'words', 'bytes', 'upper', 'lower')
+
+
+def is_valid_file(parser, arg):
+    if not os.path.exists(arg):
+        parser.error("The file %s does not exist!" % arg)
+    else:
+        return arg
+
+
+class LinesStage:
+    # The newlines, plus the last line when it has no newline (as lines_count.py)
+    name = 'lines'
+
+    def __init__(self):
+        self.count = 0
+        self.last = b'\n'
+
+    def feed(self, chunk):
+        self.count += chunk.count(b'\n')
+        self.last = chunk[-1:]
+        return chunk
+
+    def result(self):
+        return self.count + (self.last != b'\n')
+
+
+class WordsStage:
+    name = 'words'
+
+    def __init__(self):
+        self.count = 0
+        self.inWord = False  # Whether the previous chunk ended inside a word
+
+    def feed(self, chunk):
+        classes = chunk.translate(WORDS_TABLE)
+        self.count += classes.count(b' x')
+        # A word starting the chunk is counted unless it goes on from the previous chunk
+        if classes[0] == 0x78 and not self.inWord:
+            self.count += 1
+        self.inWord = classes[-1] == 0x78
+        return chunk
+
+    def result(self):
+        return self.count
+
+
+class BytesStage:
+    name = 'bytes'
+
+    def __init__(self):
+        self.count = 0
+
+    def feed(self, chunk):
+        self.count += len(chunk)
+        return chunk
+
+    def result(self):
+        return self.count
+
+
+class TranslateStage:
+
+    def __init__(self, name, table):
+        self.name = name
+        self.table = table
+
+    def feed(self, chunk):
+        return chunk.translate(self.table)
+
+    def result(self):
+        return None
+
+
+def makeStage(name):
+    if name == 'upper':
+        return TranslateStage(name, UPPER_TABLE)
+    if name == 'lower':
+        return TranslateStage(name, LOWER_TABLE)
+    return {'lines': LinesStage, 'words': WordsStage, 'bytes': BytesStage}[name]()
+
+
+def runStream(source, stageNames, destination=None, chunkSize=CHUNK_SIZE):
+    """
+    Feeds the binary stream ``source`` to the stages, in order, one
+    chunk at a time, writing the output of the last one to
+    ``destination`` if any.  Returns the counts by stage name, a count
+    stage placed after a conversion counting the converted data.
+    """
+    stages = [makeStage(name) for name in stageNames]
+    while True:
+        chunk = source.read(chunkSize)
+        if not chunk:
+            break
+        for stage in stages:
+            chunk = stage.feed(chunk)
+        if destination is not None:
+            destination.write(chunk)
+    if destination is not None:
+        destination.flush()
+
+    counts = OrderedDict()
+    for stage in stages:
+        if stage.result() is not None:
+            counts[stage.name] = stage.result()
+    return counts
+
+
+def runFile(path, stageNames, outputPath=None, chunkSize=CHUNK_SIZE):
+    # Runs the stages over a file, the converted data going to outputPath
+    summary = OrderedDict([('file', path)])
+    with open(path, 'rb') as source:
+        if outputPath is None:
+            summary.update(runStream(source, stageNames, None, chunkSize))
+        else:
+            with open(outputPath, 'wb') as destination:
+                summary.update(runStream(source, stageNames, destination, chunkSize))
+            summary['output'] = outputPath
+    return summary
+
+
+def outputPaths(paths, outputDirectory):
+    """
+    Returns the paths of the converted copies of the files, in
+    ``outputDirectory`` under the names of the files.  Raises ValueError
+    when two files have the same name or when a copy would overwrite its
+    file (opening it for writing would empty it before it is read).
+    """
+    outputs = []
+    sources = {}  # Dictionary output path -> file written there
+    for path in paths:
+        outputPath = os.path.join(outputDirectory, os.path.basename(path))
+        key = os.path.normcase(os.path.abspath(outputPath))
+        if key in sources:
+            raise ValueError('%s and %s would both be written to %s' % (sources[key], path, outputPath))
+        sources[key] = path
+        if os.path.exists(outputPath) and os.path.samefile(path, outputPath):
+            raise ValueError('the converted copy of %s would overwrite it' % path)
+        outputs.append(outputPath)
+    return outputs
+
+
+def runFiles(paths, stageNames, outputDirectory=None, jobs=None, chunkSize=CHUNK_SIZE):
+    """
+    Runs the stages over the files, ``jobs`` of them at a time in
+    separate processes (one per CPU by default).  The converted copies
+    are written to ``outputDirectory`` under the names of the files
+    (see :py:func:`outputPaths`).  Returns the summaries in the order of
+    the files.
+    """
+    outputs = [None] * len(paths) if outputDirectory is None else outputPaths(paths, outputDirectory)
+    jobs = min(len(paths), jobs or os.cpu_count() or 1)
+    if jobs <= 1:
+        return [runFile(path, stageNames, outputPath, chunkSize) for path, outputPath in zip(paths, outputs)]
+
+    with ProcessPoolExecutor(jobs) as executor:
+        futures = [executor.submit(runFile, path, stageNames, outputPath, chunkSize)
+                   for path, outputPath in zip(paths, outputs)]
+        return [future.result() for future in futures]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='single pass text pipeline')
+    parser.add_argument('stages', nargs='+', choices=STAGES, metavar='STAGE',
+                        help='stages applied in order: %s' % ', '.join(STAGES))
+    parser.add_argument('-f', '--file',
+                        dest='files', action='append',
+                        help='input file (can be repeated, standard input by default)', metavar="FILE",
+                        type=lambda x: is_valid_file(parser, x))
+    parser.add_argument('-o', '--output-directory', dest='outputDirectory',
+                        help='directory of the converted copies of the files', metavar="DIRECTORY",
+                        default=None)
+    parser.add_argument('-s', '--summary', dest='summary',
+                        help='file of the JSON summary (standard output by default)', metavar="FILE",
+                        default=None)
+    parser.add_argument('-j', '--jobs', dest='jobs', type=int,
+                        help='number of files processed at once (one per CPU by default)', default=None)
+    parser.add_argument('--chunk-size', dest='chunkSize', type=int,
+                        help='number of bytes read at once', default=CHUNK_SIZE)
+
+    options = parser.parse_args()
+    converts = any(stage in ('upper', 'lower') for stage in options.stages)
+    if options.files and converts and options.outputDirectory is None:
+        parser.error('the conversion stages need an output directory for the files')
+    if options.outputDirectory is not None:
+        os.makedirs(options.outputDirectory, exist_ok=True)
+        if options.files:
+            try:
+                outputPaths(options.files, options.outputDirectory)
+            except ValueError as e:
+                parser.error(str(e))
+
+    if options.files:
+        summary = runFiles(options.files, options.stages, options.outputDirectory, options.jobs, options.chunkSize)
+        summaryStream = sys.stdout
+    else:
+        # The converted standard input goes to the standard output, and the summary to the error output
+        destination = sys.stdout.buffer if converts else None
+        summary = [runStream(sys.stdin.buffer, options.stages, destination, options.chunkSize)]
+        summaryStream = sys.stderr if converts else sys.stdout
+
+    text = json.dumps(summary, indent=2)
+    if options.summary is None:
+        summaryStream.write(text + '\n')
+    else:
+        with open(options.summary, 'w') as f:
+            f.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
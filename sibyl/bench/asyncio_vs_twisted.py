@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+Runs each server flavour with Twisted and with asyncio (and uvloop when
+it is installed) in a separate process, under the same load: asyncio
+clients in this process keeping a number of questions outstanding.
+"""
+from sibyl.bench.fakes import FakeSibylServerProxy, FakeSibylClientProxy
+import sibyl.protocol.sibyl_asyncio_protocols as sibyl_asyncio_protocols
+import argparse
+import asyncio
+import importlib.util
+import signal
+import json
+import sys
+import time
+
+FLAVOURS = ('udp_text', 'udp_bin', 'tcp_bin')
+
+
+def reportCpu(signum, frame):
+    # Written by the server process when it receives SIGUSR1
+    sys.stdout.write(json.dumps({'cpu': time.process_time()}) + '\n')
+    sys.stdout.flush()
+
+
+def serveTwisted(flavour):
+    from twisted.internet import reactor
+    from twisted.internet.protocol import Factory
+    from sibyl.protocol.sibyl_server_udp_text_protocol import SibylServerUdpTextProtocol
+    from sibyl.protocol.sibyl_server_udp_bin_protocol import SibylServerUdpBinProtocol
+    from sibyl.protocol.sibyl_server_tcp_bin_protocol import SibylServerTcpBinProtocol
+
+    proxy = FakeSibylServerProxy()
+    if flavour == 'tcp_bin':
+        factory = Factory()
+        factory.buildProtocol = lambda addr: SibylServerTcpBinProtocol(proxy)
+        port = reactor.listenTCP(0, factory, interface='127.0.0.1')
+    else:
+        serverClass = SibylServerUdpTextProtocol if flavour == 'udp_text' else SibylServerUdpBinProtocol
+        port = reactor.listenUDP(0, serverClass(proxy), interface='127.0.0.1')
+
+    print(port.getHost().port, flush=True)
+    reactor.run(installSignalHandlers=False)
+
+
+def serveAsyncio(flavour):
+    async def serve():
+        server = await sibyl_asyncio_protocols.createServer(flavour, FakeSibylServerProxy(), '127.0.0.1', 0)
+        if flavour == 'tcp_bin':
+            port = server.sockets[0].getsockname()[1]
+        else:
+            port = server.get_extra_info('sockname')[1]
+        print(port, flush=True)
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+async def run(mode, flavour, options):
+    args = [sys.executable, '-m', 'sibyl.bench.asyncio_vs_twisted', '--serve', mode, '--flavour', flavour]
+    process = await asyncio.create_subprocess_exec(*args, stdout=asyncio.subprocess.PIPE)
+    port = int(await process.stdout.readline())
+
+    async def serverCpu():
+        process.send_signal(signal.SIGUSR1)
+        return json.loads(await process.stdout.readline())['cpu']
+
+    total = options.clients * options.requests
+    answered = 0
+    done = asyncio.get_event_loop().create_future()
+    clients = []
+
+    def onResponse(response, ask):
+        nonlocal answered
+        answered += 1
+        if answered == total:
+            if not done.done():
+                done.set_result(None)
+        else:
+            ask()
+
+    for i in range(options.clients):
+        sent = [0]
+        holder = []
+
+        def ask(sent=sent, holder=holder):
+            if sent[0] < options.requests:
+                holder[0].sendRequest('What is the question number %d?' % sent[0])
+                sent[0] += 1
+
+        clientProxy = FakeSibylClientProxy(lambda response, ask=ask: onResponse(response, ask))
+        holder.append(await sibyl_asyncio_protocols.createClient(flavour, clientProxy, '127.0.0.1', port))
+        clients.append(ask)
+
+    cpuBefore = await serverCpu()
+    startTime = time.perf_counter()
+    for ask in clients:
+        for i in range(options.depth):
+            ask()
+    try:
+        await asyncio.wait_for(asyncio.shield(done), options.timeout)
+    except asyncio.TimeoutError:
+        pass
+    elapsed = time.perf_counter() - startTime
+    cpu = await serverCpu() - cpuBefore
+
+    process.terminate()
+    await process.wait()
+    return {
+        'server': mode,
+        'flavour': flavour,
+        'clients': options.clients,
+        'depth': options.depth,
+        'answered': answered,
+        'elapsed': elapsed,
+        'requests_per_second': answered / elapsed,
+        'server_cpu_microseconds_per_request': cpu / answered * 1e6 if answered else None,
+    }
+
+
+async def runBenchmark(options):
+    modes = ['twisted', 'asyncio']
+    if importlib.util.find_spec('uvloop') is not None:
+        modes.append('uvloop')
+
+    results = []
+    for flavour in options.flavours.split(','):
+        for mode in modes:
+            results.append(await run(mode, flavour, options))
+    print(json.dumps(results, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sibyl servers: Twisted vs asyncio')
+    parser.add_argument('-c', '--clients', dest='clients', type=int,
+                        help='The number of clients.',
+                        default=4)
+    parser.add_argument('-n', '--requests', dest='requests', type=int,
+                        help='The number of questions asked by each client.',
+                        default=10000)
+    parser.add_argument('-d', '--depth', dest='depth', type=int,
+                        help='The number of questions outstanding per client.',
+                        default=16)
+    parser.add_argument('-f', '--flavours', dest='flavours',
+                        help='The comma separated server flavours.',
+                        default=','.join(FLAVOURS))
+    parser.add_argument('-t', '--timeout', dest='timeout', type=float,
+                        help='Stop waiting for the responses after this number of seconds (lost datagrams).',
+                        default=60)
+    parser.add_argument('--serve', dest='serve', choices=('twisted', 'asyncio', 'uvloop'),
+                        help=argparse.SUPPRESS,
+                        default=None)
+    parser.add_argument('--flavour', dest='flavour', choices=FLAVOURS,
+                        help=argparse.SUPPRESS,
+                        default=None)
+    options = parser.parse_args()
+
+    if options.serve is None:
+        asyncio.run(runBenchmark(options))
+        return
+
+    signal.signal(signal.SIGUSR1, reportCpu)
+    if options.serve == 'twisted':
+        serveTwisted(options.flavour)
+    else:
+        if options.serve == 'uvloop':
+            sibyl_asyncio_protocols.installUvloop()
+        serveAsyncio(options.flavour)
+
+
+if __name__ == '__main__':
+    main()
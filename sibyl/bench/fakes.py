@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+import time
+
+
+class FakeSibylServerProxy:
+    """
+    Stand-in for the SibylServerProxy of the benchmarks.  ``cost`` gives
+    the time (in seconds) spent generating a response, either as a
+    constant or as a function of the question.
+    """
+
+    def __init__(self, cost=0):
+        self.cost = cost
+        self.calls = 0
+
+    def generateResponse(self, request):
+        self.calls += 1
+        cost = self.cost(request) if callable(self.cost) else self.cost
+        if cost:
+            time.sleep(cost)
+        return 'The Sibyl answers: ' + bytes(request[-32:]).decode('utf-8', 'replace')
+
+
+class FakeSibylClientProxy:
+
+    def __init__(self, onResponse=None):
+        self.onResponse = onResponse
+        self.responses = 0
+
+    def connectionSuccess(self):
+        pass
+
+    def responseReceived(self, response):
+        self.responses += 1
+        if self.onResponse is not None:
+            self.onResponse(response)
+
+
+class FakeDatagramTransport:
+
+    def __init__(self):
+        self.packets = 0
+        self.bytes = 0
+
+    def write(self, data, host_port=None):
+        self.packets += 1
+        self.bytes += len(data)
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+from twisted.internet.protocol import Factory, ClientCreator
+from twisted.internet import defer, task
+from sibyl.protocol.sibyl_server_udp_bin_protocol import SibylServerUdpBinProtocol
+from sibyl.protocol.sibyl_server_tcp_bin_protocol import SibylServerTcpBinProtocol
+from sibyl.protocol.sibyl_client_udp_bin_protocol import SibylClientUdpBinProtocol
+from sibyl.protocol.sibyl_client_tcp_bin_protocol import SibylClientTcpBinProtocol
+from sibyl.protocol.sibyl_pending_requests import TIMEOUT_RESPONSE
+from sibyl.bench.fakes import FakeSibylServerProxy, FakeSibylClientProxy
+import argparse
+import random
+import json
+import time
+
+
+class LossyServerUdpBinProtocol(SibylServerUdpBinProtocol):
+    # Drops a ratio of the questions, to make the client send them again
+
+    def __init__(self, sibylServerProxy, loss, seed=0):
+        SibylServerUdpBinProtocol.__init__(self, sibylServerProxy)
+        self.loss = loss
+        self.random = random.Random(seed)
+
+    def datagramReceived(self, datagram, host_port):
+        if self.random.random() >= self.loss:
+            SibylServerUdpBinProtocol.datagramReceived(self, datagram, host_port)
+
+
+class DepthDriver:
+    """
+    Keeps ``depth`` questions outstanding on a client protocol until
+    ``requests`` responses have been received, and fires ``done``.
+    """
+
+    def __init__(self, requests, depth):
+        self.requests = requests
+        self.depth = depth
+        self.sent = 0
+        self.received = 0
+        self.expired = 0
+        self.done = defer.Deferred()
+        self.clientProxy = FakeSibylClientProxy(self.onResponse)
+        self.client = None
+
+    def start(self, client):
+        self.client = client
+        self.startTime = time.perf_counter()
+        for i in range(min(self.depth, self.requests)):
+            self.ask()
+
+    def ask(self):
+        self.client.sendRequest('What is the question number %d?' % self.sent)
+        self.sent += 1
+
+    def onResponse(self, response):
+        self.received += 1
+        if response.endswith(TIMEOUT_RESPONSE):
+            self.expired += 1
+        if self.received == self.requests:
+            self.done.callback(time.perf_counter() - self.startTime)
+        elif self.sent < self.requests:
+            self.ask()
+
+
+@defer.inlineCallbacks
+def runUdp(reactor, port, requests, depth, timeout):
+    driver = DepthDriver(requests, depth)
+    client = SibylClientUdpBinProtocol(driver.clientProxy, port, '127.0.0.1')
+    client.pending.timeout = timeout
+    clientPort = reactor.listenUDP(0, client, interface='127.0.0.1')
+    driver.start(client)
+    elapsed = yield driver.done
+    yield clientPort.stopListening()
+    return driver, elapsed
+
+
+@defer.inlineCallbacks
+def runTcp(reactor, port, requests, depth, timeout):
+    driver = DepthDriver(requests, depth)
+    client = yield ClientCreator(reactor, SibylClientTcpBinProtocol, driver.clientProxy).connectTCP(
+        '127.0.0.1', port)
+    driver.start(client)
+    elapsed = yield driver.done
+    client.transport.loseConnection()
+    return driver, elapsed
+
+
+@defer.inlineCallbacks
+def runBenchmark(reactor, options):
+    udpServer = reactor.listenUDP(0, LossyServerUdpBinProtocol(FakeSibylServerProxy(), options.loss),
+                                  interface='127.0.0.1')
+    factory = Factory()
+    factory.buildProtocol = lambda addr: SibylServerTcpBinProtocol(FakeSibylServerProxy())
+    tcpServer = reactor.listenTCP(0, factory, interface='127.0.0.1')
+
+    results = []
+    for transport, runner, server in (('udp', runUdp, udpServer), ('tcp', runTcp, tcpServer)):
+        for depth in [int(depth) for depth in options.depths.split(',')]:
+            driver, elapsed = yield runner(reactor, server.getHost().port, options.requests,
+                                           depth, options.timeout)
+            results.append({
+                'transport': transport,
+                'depth': depth,
+                'requests': options.requests,
+                'expired': driver.expired,
+                'elapsed': elapsed,
+                'requests_per_second': options.requests / elapsed,
+            })
+
+    yield udpServer.stopListening()
+    yield tcpServer.stopListening()
+    print(json.dumps(results, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sibyl in-flight requests benchmark')
+    parser.add_argument('-n', '--requests', dest='requests', type=int,
+                        help='The number of questions asked for each depth.',
+                        default=20000)
+    parser.add_argument('-d', '--depths', dest='depths',
+                        help='The comma separated numbers of outstanding questions.',
+                        default='1,4,16,64,256')
+    parser.add_argument('-l', '--loss', dest='loss', type=float,
+                        help='The ratio of UDP questions dropped by the server.',
+                        default=0)
+    parser.add_argument('-t', '--timeout', dest='timeout', type=float,
+                        help='The UDP retransmission timeout (in seconds).',
+                        default=0.05)
+    options = parser.parse_args()
+
+    task.react(runBenchmark, [options])
+
+
+if __name__ == '__main__':
+    main()
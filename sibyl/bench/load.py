@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+from twisted.internet.protocol import DatagramProtocol, Protocol, ClientCreator
+from twisted.internet import defer, task
+from sibyl.protocol.sibyl_bin_codec import HEADER, BATCH_MARKER, SibylBinDeframer, FramingError, isBatch, \
+    packQuestions, packTcpMessage, unpackBatch
+from sibyl.protocol.sibyl_text_codec import formatTextRequest
+from collections import OrderedDict
+import itertools
+import socket
+import json
+import time
+import logging
+
+logging.basicConfig()
+moduleLogger = logging.getLogger('sibyl.bench.load')
+
+FLAVOURS = ('udp_text', 'udp_bin', 'tcp_bin')
+
+# Seconds between two checks of the questions left unanswered
+TIMEOUT_CHECK_INTERVAL = 0.1
+# Seconds between two batches of questions of the open loop
+OPEN_LOOP_TICK = 0.01
+
+
+def percentile(values, pr):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pr / 100.0 * (len(values) - 1))))]
+
+
+class LoadStatistics:
+
+    def __init__(self):
+        self.sent = 0
+        self.received = 0
+        self.receivedInTime = 0  # Responses received before the end of the run
+        self.dropped = 0  # Questions unanswered after the timeout
+        self.framingErrors = 0
+        self.latencies = []
+
+    def report(self, elapsed):
+        latencies = [latency * 1000 for latency in self.latencies]
+        return {
+            'sent': self.sent,
+            'received': self.received,
+            'dropped': self.dropped,
+            'framing_errors': self.framingErrors,
+            'elapsed': elapsed,
+            'requests_per_second': self.receivedInTime / elapsed if elapsed > 0 else None,
+            'latency_ms': {
+                'p50': percentile(latencies, 50),
+                'p90': percentile(latencies, 90),
+                'p99': percentile(latencies, 99),
+                'max': max(latencies) if latencies else None,
+            },
+        }
+
+
+class SyntheticClient:
+    """
+    Asks questions and matches the responses with them: by id for the
+    binary flavours, in order for the text one, whose responses carry
+    no id.  A question left ``timeout`` seconds without response is
+    counted as dropped.
+    """
+    correlated = True
+
+    def __init__(self, index, statistics, timeout):
+        self.index = index
+        self.statistics = statistics
+        self.timeout = timeout
+        self.pending = OrderedDict()  # Dictionary id -> time sent, oldest first
+        self.ids = itertools.count(index << 20)
+        self.onAnswered = None  # Called with the number of questions answered or dropped
+
+    def ask(self):
+        requestId = next(self.ids) & 0xFFFFFFFF
+        if requestId == BATCH_MARKER:
+            requestId = next(self.ids) & 0xFFFFFFFF
+        self.pending[requestId] = time.perf_counter()
+        self.statistics.sent += 1
+        self.sendQuestion(requestId, b'Question %d of client %d, what is the answer?' % (requestId, self.index))
+
+    def answered(self, requestId):
+        if self.correlated:
+            sentTime = self.pending.pop(requestId, None)
+        elif self.pending:
+            sentTime = self.pending.popitem(last=False)[1]
+        else:
+            sentTime = None
+        if sentTime is None:
+            return
+        self.statistics.received += 1
+        self.statistics.latencies.append(time.perf_counter() - sentTime)
+        if self.onAnswered is not None:
+            self.onAnswered(1)
+
+    def expire(self):
+        limit = time.perf_counter() - self.timeout
+        expired = 0
+        while self.pending and next(iter(self.pending.values())) < limit:
+            self.pending.popitem(last=False)
+            expired += 1
+        if expired:
+            self.statistics.dropped += expired
+            if self.onAnswered is not None:
+                self.onAnswered(expired)
+
+
+class UdpTextClient(SyntheticClient, DatagramProtocol):
+    correlated = False
+
+    def __init__(self, index, statistics, timeout, host, port):
+        SyntheticClient.__init__(self, index, statistics, timeout)
+        self.host = host
+        self.port = port
+
+    def startProtocol(self):
+        self.transport.connect(self.host, self.port)
+
+    def sendQuestion(self, requestId, question):
+        self.transport.write(formatTextRequest(question.decode('ascii')))
+
+    def datagramReceived(self, datagram, host_port):
+        self.answered(None)
+
+    def connectionRefused(self):
+        pass
+
+
+class UdpBinClient(UdpTextClient):
+    correlated = True
+
+    def sendQuestion(self, requestId, question):
+        self.transport.write(packQuestions([(requestId, question)])[0])
+
+    def datagramReceived(self, datagram, host_port):
+        if not isBatch(datagram):
+            # Single response, the server echoes the id of the question in its header
+            if len(datagram) < HEADER.size:
+                self.statistics.framingErrors += 1
+            else:
+                self.answered(HEADER.unpack_from(datagram)[0])
+            return
+        try:
+            records = unpackBatch(datagram)
+        except FramingError:
+            self.statistics.framingErrors += 1
+            return
+        for requestId, response in records:
+            self.answered(requestId)
+
+
+class TcpBinClient(SyntheticClient, Protocol):
+
+    def __init__(self, index, statistics, timeout):
+        SyntheticClient.__init__(self, index, statistics, timeout)
+        self.deframer = SibylBinDeframer()
+
+    def sendQuestion(self, requestId, question):
+        self.transport.write(packTcpMessage(requestId, question))
+
+    def dataReceived(self, data):
+        try:
+            messages = self.deframer.feed(data)
+        except FramingError:
+            self.statistics.framingErrors += 1
+            self.transport.loseConnection()
+            return
+        for requestId, response in messages:
+            self.answered(requestId)
+
+
+class SibylLoad:
+    """
+    Drives ``clients`` synthetic clients against a server, either in
+    closed loop (each client keeps ``depth`` questions outstanding) or
+    in open loop (``rate`` questions per second in total, spread over
+    the clients, whatever the responses).
+    """
+
+    def __init__(self, reactor, flavour, host, port, clients, duration, mode, rate, depth, timeout):
+        self.reactor = reactor
+        self.flavour = flavour
+        self.host = host
+        self.port = port
+        self.clientCount = clients
+        self.duration = duration
+        self.mode = mode
+        self.rate = rate
+        self.depth = depth
+        self.timeout = timeout
+        self.statistics = LoadStatistics()
+        self.clients = []
+        self.running = False
+
+    @defer.inlineCallbacks
+    def connect(self):
+        host = socket.gethostbyname(self.host)
+        for index in range(self.clientCount):
+            if self.flavour == 'tcp_bin':
+                client = yield ClientCreator(self.reactor, TcpBinClient, index, self.statistics,
+                                             self.timeout).connectTCP(host, self.port)
+            else:
+                clientClass = UdpTextClient if self.flavour == 'udp_text' else UdpBinClient
+                client = clientClass(index, self.statistics, self.timeout, host, self.port)
+                self.reactor.listenUDP(0, client)
+            self.clients.append(client)
+
+    @defer.inlineCallbacks
+    def run(self):
+        yield self.connect()
+        self.running = True
+        expiry = task.LoopingCall(self.expire)
+        expiry.start(TIMEOUT_CHECK_INTERVAL, now=False)
+
+        startTime = time.perf_counter()
+        if self.mode == 'closed':
+            for client in self.clients:
+                client.onAnswered = lambda count, client=client: self.refill(client, count)
+                for i in range(self.depth):
+                    client.ask()
+        else:
+            self.openLoop = task.LoopingCall(self.openLoopTick, startTime, itertools.cycle(self.clients))
+            self.openLoop.start(OPEN_LOOP_TICK)
+
+        yield task.deferLater(self.reactor, self.duration, lambda: None)
+        self.running = False
+        elapsed = time.perf_counter() - startTime
+        self.statistics.receivedInTime = self.statistics.received
+        if self.mode == 'open':
+            self.openLoop.stop()
+
+        # The last responses are waited for, but not counted in the throughput
+        yield task.deferLater(self.reactor, min(self.timeout, 1), lambda: None)
+        expiry.stop()
+        for client in self.clients:
+            self.statistics.dropped += len(client.pending)
+            client.pending.clear()
+            if self.flavour == 'tcp_bin':
+                client.transport.loseConnection()
+            else:
+                client.transport.stopListening()
+        return self.statistics.report(elapsed)
+
+    def refill(self, client, count):
+        if self.running:
+            for i in range(count):
+                client.ask()
+
+    def openLoopTick(self, startTime, clients):
+        due = int((time.perf_counter() - startTime) * self.rate) - self.statistics.sent
+        for i in range(due):
+            next(clients).ask()
+
+    def expire(self):
+        for client in self.clients:
+            client.expire()
+
+
+def SibylBenchStart(flavour, host, port, clients, duration, mode, rate, depth, timeout, outputFile, debugFlag):
+    if debugFlag:
+        moduleLogger.setLevel(logging.DEBUG)
+
+    @defer.inlineCallbacks
+    def main(reactor):
+        load = SibylLoad(reactor, flavour, host, port, clients, duration, mode, rate, depth, timeout)
+        result = yield load.run()
+        report = {
+            'flavour': flavour,
+            'server': '%s:%d' % (host, port),
+            'clients': clients,
+            'mode': mode,
+            'rate': rate if mode == 'open' else None,
+            'depth': depth if mode == 'closed' else None,
+            'duration': duration,
+        }
+        report.update(result)
+
+        text = json.dumps(report, indent=2, sort_keys=True)
+        if outputFile is None:
+            print(text)
+        else:
+            with open(outputFile, 'w') as output:
+                output.write(text + '\n')
+        moduleLogger.debug('%d questions sent, %d answered', report['sent'], report['received'])
+
+    task.react(main)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+from sibyl.protocol.sibyl_response_cache import SibylResponseCache
+from sibyl.bench.fakes import FakeSibylServerProxy
+from itertools import accumulate
+import argparse
+import random
+import json
+import time
+
+
+def zipfQuestions(distinct, exponent, count, seed=0):
+    # Question i is asked with a probability proportional to 1 / i ** exponent
+    questions = [b'Question number %d, what is the answer?' % i for i in range(1, distinct + 1)]
+    weights = accumulate(1.0 / i ** exponent for i in range(1, distinct + 1))
+    return random.Random(seed).choices(questions, cum_weights=list(weights), k=count)
+
+
+def run(questions, cost, cacheSize, ttl):
+    proxy = FakeSibylServerProxy(cost)
+    cache = SibylResponseCache(cacheSize, ttl) if cacheSize else None
+
+    startTime = time.perf_counter()
+    for question in questions:
+        if cache is None:
+            proxy.generateResponse(question)
+        else:
+            cache.getResponse(proxy, question, question)
+    elapsed = time.perf_counter() - startTime
+
+    result = {
+        'cache_size': cacheSize,
+        'requests': len(questions),
+        'generated': proxy.calls,
+        'elapsed': elapsed,
+        'requests_per_second': len(questions) / elapsed,
+    }
+    if cache is not None:
+        result.update(cache.stats())
+        result['hit_ratio'] = cache.hits / len(questions)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sibyl response cache benchmark (Zipf question mix)')
+    parser.add_argument('-n', '--requests', dest='requests', type=int,
+                        help='The number of questions asked.',
+                        default=100000)
+    parser.add_argument('-q', '--distinct', dest='distinct', type=int,
+                        help='The number of distinct questions.',
+                        default=10000)
+    parser.add_argument('-s', '--exponent', dest='exponent', type=float,
+                        help='The exponent of the Zipf distribution.',
+                        default=1.1)
+    parser.add_argument('-c', '--cost', dest='cost', type=float,
+                        help='The time (in seconds) spent generating a response.',
+                        default=0.0001)
+    parser.add_argument('--sizes', dest='sizes',
+                        help='The comma separated cache sizes (0: no cache).',
+                        default='0,100,1000,10000')
+    parser.add_argument('--ttl', dest='ttl', type=float,
+                        help='The time to live of the cached responses.',
+                        default=60)
+    options = parser.parse_args()
+
+    questions = zipfQuestions(options.distinct, options.exponent, options.requests)
+    results = [run(questions, options.cost, int(size), options.ttl) for size in options.sizes.split(',')]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
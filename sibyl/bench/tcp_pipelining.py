@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+from twisted.internet.protocol import Protocol, Factory, ClientCreator
+from twisted.internet import defer, task
+from sibyl.protocol.sibyl_server_tcp_bin_protocol import SibylServerTcpBinProtocol
+from sibyl.protocol.sibyl_bin_codec import SibylBinDeframer, packTcpMessage
+from sibyl.bench.fakes import FakeSibylServerProxy
+import argparse
+import json
+import time
+
+
+class PipeliningClient(Protocol):
+    """
+    Sends ``requests`` questions on one connection, keeping ``depth`` of
+    them outstanding, and fires ``done`` with the elapsed time once all
+    the responses have been received.
+    """
+
+    def __init__(self, requests, depth):
+        self.requests = requests
+        self.depth = depth
+        self.sent = 0
+        self.received = 0
+        self.deframer = SibylBinDeframer()
+        self.done = defer.Deferred()
+
+    def connectionMade(self):
+        self.startTime = time.perf_counter()
+        self.sendQuestions(min(self.depth, self.requests))
+
+    def sendQuestions(self, count):
+        messages = []
+        for i in range(count):
+            messages.append(packTcpMessage(self.sent, b'What is the question number %d?' % self.sent))
+            self.sent += 1
+        self.transport.writeSequence(messages)
+
+    def dataReceived(self, data):
+        answered = len(self.deframer.feed(data))
+        self.received += answered
+        if self.received == self.requests:
+            self.transport.loseConnection()
+            self.done.callback(time.perf_counter() - self.startTime)
+        elif self.sent < self.requests:
+            self.sendQuestions(min(answered, self.requests - self.sent))
+
+
+@defer.inlineCallbacks
+def runBenchmark(reactor, requests, depths):
+    factory = Factory()
+    factory.buildProtocol = lambda addr: SibylServerTcpBinProtocol(FakeSibylServerProxy())
+    port = reactor.listenTCP(0, factory, interface='127.0.0.1')
+
+    results = []
+    for depth in depths:
+        client = yield ClientCreator(reactor, PipeliningClient, requests, depth).connectTCP(
+            '127.0.0.1', port.getHost().port)
+        elapsed = yield client.done
+        results.append({
+            'depth': depth,
+            'requests': requests,
+            'elapsed': elapsed,
+            'requests_per_second': requests / elapsed,
+        })
+
+    yield port.stopListening()
+    print(json.dumps(results, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sibyl TCP binary pipelining benchmark')
+    parser.add_argument('-n', '--requests', dest='requests', type=int,
+                        help='The number of questions sent for each depth.',
+                        default=20000)
+    parser.add_argument('-d', '--depths', dest='depths',
+                        help='The comma separated numbers of outstanding questions.',
+                        default='1,10,100,1000')
+    options = parser.parse_args()
+
+    depths = [int(depth) for depth in options.depths.split(',')]
+    task.react(runBenchmark, (options.requests, depths))
+
+
+if __name__ == '__main__':
+    main()
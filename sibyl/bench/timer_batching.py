@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+from twisted.internet import defer, task, stdio
+from twisted.internet.protocol import ProcessProtocol
+from twisted.protocols.basic import LineReceiver
+from sibyl.protocol.sibyl_server_udp_bin_protocol import SibylServerUdpBinProtocol
+from sibyl.protocol.sibyl_server_timer_udp_bin_protocol import SibylServerTimerUdpBinProtocol
+import sibyl.protocol.sibyl_server_timer_udp_bin_protocol as sibyl_server_timer_udp_bin_protocol
+from sibyl.protocol.sibyl_client_udp_bin_protocol import SibylClientUdpBinProtocol
+from sibyl.bench.inflight import DepthDriver
+from sibyl.bench.fakes import FakeSibylServerProxy
+import argparse
+import json
+import sys
+import time
+
+
+class CountingServerMixin:
+    # Counts the datagrams written by the server
+
+    def makeConnection(self, transport):
+        self.datagramsSent = 0
+        write = transport.write
+
+        def countingWrite(data, addr=None):
+            self.datagramsSent += 1
+            write(data, addr)
+
+        transport.write = countingWrite
+        return super().makeConnection(transport)
+
+
+class CountingServerUdpBinProtocol(CountingServerMixin, SibylServerUdpBinProtocol):
+    pass
+
+
+class CountingServerTimerUdpBinProtocol(CountingServerMixin, SibylServerTimerUdpBinProtocol):
+    pass
+
+
+SERVER_CLASSES = {
+    'packet': CountingServerUdpBinProtocol,
+    'timer': CountingServerTimerUdpBinProtocol,
+}
+
+
+class ServerControl(LineReceiver):
+    """
+    Runs in the server process: writes the port of the server, then its
+    CPU time and number of datagrams sent whenever it reads a line.
+    """
+    delimiter = b'\n'
+
+    def __init__(self, serverProtocol, port):
+        self.serverProtocol = serverProtocol
+        self.port = port
+
+    def connectionMade(self):
+        self.sendLine(b'%d' % self.port)
+
+    def lineReceived(self, line):
+        self.sendLine(json.dumps({
+            'cpu': time.process_time(),
+            'datagrams_sent': self.serverProtocol.datagramsSent,
+        }).encode('utf-8'))
+
+
+def serve(reactor, mode):
+    serverProtocol = SERVER_CLASSES[mode](FakeSibylServerProxy())
+    server = reactor.listenUDP(0, serverProtocol, interface='127.0.0.1')
+    stdio.StandardIO(ServerControl(serverProtocol, server.getHost().port))
+    return defer.Deferred()
+
+
+class ServerProcess(ProcessProtocol):
+
+    def __init__(self):
+        self.lines = defer.DeferredQueue()
+        self.buffer = b''
+
+    def outReceived(self, data):
+        self.buffer += data
+        while b'\n' in self.buffer:
+            line, self.buffer = self.buffer.split(b'\n', 1)
+            self.lines.put(line)
+
+    def errReceived(self, data):
+        sys.stderr.write(data.decode('utf-8', 'replace'))
+
+
+@defer.inlineCallbacks
+def run(reactor, mode, clients, requests, depth, options):
+    """
+    Starts a server process and lets ``clients`` clients keep ``depth``
+    questions outstanding each until ``requests`` of their questions have
+    been answered.  The CPU time of the server is measured, so that the
+    load of the clients (in this process) does not blur the comparison.
+    """
+    serverProcess = ServerProcess()
+    args = [sys.executable, '-m', 'sibyl.bench.timer_batching', '--serve', mode,
+            '--tick', str(options.tick), '--max-batch', str(options.maxBatch)]
+    reactor.spawnProcess(serverProcess, sys.executable, args, env=None)
+    port = int((yield serverProcess.lines.get()))
+
+    serverProcess.transport.write(b'stats\n')
+    before = json.loads((yield serverProcess.lines.get()))
+
+    drivers = []
+    clientPorts = []
+    for i in range(clients):
+        driver = DepthDriver(requests, depth)
+        client = SibylClientUdpBinProtocol(driver.clientProxy, port, '127.0.0.1')
+        client.pending.timeout = 1
+        clientPorts.append(reactor.listenUDP(0, client, interface='127.0.0.1'))
+        driver.start(client)
+        drivers.append(driver)
+
+    elapsed = yield defer.gatherResults([driver.done for driver in drivers])
+    serverProcess.transport.write(b'stats\n')
+    after = json.loads((yield serverProcess.lines.get()))
+    serverProcess.transport.signalProcess('TERM')
+    for clientPort in clientPorts:
+        yield clientPort.stopListening()
+
+    answered = sum(driver.received - driver.expired for driver in drivers)
+    cpu = after['cpu'] - before['cpu']
+    return {
+        'server': mode,
+        'clients': clients,
+        'depth': depth,
+        'answered': answered,
+        'expired': sum(driver.expired for driver in drivers),
+        'elapsed': max(elapsed),
+        'requests_per_second': answered / max(elapsed),
+        'server_datagrams_sent': after['datagrams_sent'] - before['datagrams_sent'],
+        'server_cpu_microseconds_per_request': cpu / answered * 1e6 if answered else None,
+    }
+
+
+@defer.inlineCallbacks
+def runBenchmark(reactor, options):
+    results = []
+    for mode in ('packet', 'timer'):
+        for depth in [int(depth) for depth in options.depths.split(',')]:
+            result = yield run(reactor, mode, options.clients, options.requests, depth, options)
+            results.append(result)
+    print(json.dumps(results, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sibyl UDP binary per-packet vs tick-batched benchmark')
+    parser.add_argument('-c', '--clients', dest='clients', type=int,
+                        help='The number of clients.',
+                        default=4)
+    parser.add_argument('-n', '--requests', dest='requests', type=int,
+                        help='The number of questions asked by each client.',
+                        default=10000)
+    parser.add_argument('-d', '--depths', dest='depths',
+                        help='The comma separated numbers of outstanding questions per client.',
+                        default='1,16,64')
+    parser.add_argument('--tick', dest='tick', type=float,
+                        help='The tick of the timer server (in milliseconds).',
+                        default=sibyl_server_timer_udp_bin_protocol.DEFAULT_TICK * 1000)
+    parser.add_argument('--max-batch', dest='maxBatch', type=int,
+                        help='The datagrams answered per tick by the timer server.',
+                        default=sibyl_server_timer_udp_bin_protocol.DEFAULT_MAX_BATCH)
+    parser.add_argument('--serve', dest='serve', choices=sorted(SERVER_CLASSES),
+                        help=argparse.SUPPRESS,
+                        default=None)
+    options = parser.parse_args()
+
+    sibyl_server_timer_udp_bin_protocol.configure(options.tick / 1000.0, options.maxBatch)
+    if options.serve is not None:
+        task.react(serve, [options.serve])
+    else:
+        task.react(runBenchmark, [options])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+from twisted.internet import defer, task
+from sibyl.protocol.sibyl_server_udp_bin_protocol import SibylServerUdpBinProtocol
+from sibyl.protocol.sibyl_client_udp_bin_protocol import SibylClientUdpBinProtocol
+from sibyl.bench.fakes import FakeSibylServerProxy, FakeSibylClientProxy
+import argparse
+import json
+import time
+
+
+@defer.inlineCallbacks
+def run(reactor, port, requests, window, batched, timeout):
+    """
+    Asks ``requests`` questions, ``window`` at a time, either one per
+    datagram or in batches, and returns the number of questions answered
+    per second.
+    """
+    done = defer.Deferred()
+    state = {'sent': 0, 'received': 0}
+
+    def sendWindow():
+        lines = ['What is the question number %d?' % (state['sent'] + i)
+                 for i in range(min(window, requests - state['sent']))]
+        state['sent'] += len(lines)
+        if batched:
+            client.sendRequests(lines)
+        else:
+            for line in lines:
+                client.sendRequest(line)
+
+    def onResponse(response):
+        state['received'] += 1
+        if state['received'] == requests:
+            done.callback(None)
+        elif state['received'] == state['sent']:
+            sendWindow()
+
+    client = SibylClientUdpBinProtocol(FakeSibylClientProxy(onResponse), port, '127.0.0.1')
+    clientPort = reactor.listenUDP(0, client, interface='127.0.0.1')
+
+    timeoutCall = reactor.callLater(timeout, lambda: done.called or done.callback(None))
+    startTime = time.perf_counter()
+    sendWindow()
+    yield done
+    elapsed = time.perf_counter() - startTime
+    if timeoutCall.active():
+        timeoutCall.cancel()
+    yield clientPort.stopListening()
+
+    return {
+        'batched': batched,
+        'window': window,
+        'requests': requests,
+        'answered': state['received'],
+        'elapsed': elapsed,
+        'requests_per_second': state['received'] / elapsed,
+    }
+
+
+@defer.inlineCallbacks
+def runBenchmark(reactor, options):
+    server = reactor.listenUDP(0, SibylServerUdpBinProtocol(FakeSibylServerProxy()), interface='127.0.0.1')
+    port = server.getHost().port
+
+    results = []
+    for window in [int(window) for window in options.windows.split(',')]:
+        for batched in (False, True):
+            result = yield run(reactor, port, options.requests, window, batched, options.timeout)
+            results.append(result)
+
+    yield server.stopListening()
+    print(json.dumps(results, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sibyl UDP binary batching benchmark')
+    parser.add_argument('-n', '--requests', dest='requests', type=int,
+                        help='The number of questions asked for each configuration.',
+                        default=20000)
+    parser.add_argument('-w', '--windows', dest='windows',
+                        help='The comma separated numbers of questions sent at once.',
+                        default='1,10,40')
+    parser.add_argument('-t', '--timeout', dest='timeout', type=float,
+                        help='Give up a configuration after this number of seconds (lost datagrams).',
+                        default=30)
+    options = parser.parse_args()
+
+    task.react(runBenchmark, [options])
+
+
+if __name__ == '__main__':
+    main()
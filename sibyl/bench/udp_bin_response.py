@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+from sibyl.protocol.sibyl_server_udp_bin_protocol import SibylServerUdpBinProtocol
+from sibyl.protocol.sibyl_bin_codec import HEADER
+from sibyl.bench.fakes import FakeSibylServerProxy, FakeDatagramTransport
+from time import gmtime, mktime
+import argparse
+import json
+import time
+
+
+class LegacyServerUdpBinProtocol(SibylServerUdpBinProtocol):
+    # The text response of the previous implementation, for comparison
+
+    def sendResponse(self, timestamp, rsp, host_port):
+        time = str(mktime(gmtime()))
+        rsp_server = time + ': ' + str(rsp) + '\r\n'
+
+        text = rsp_server.encode('utf-8')
+        hex_text = text.hex()
+        bytes_text = bytes.fromhex(hex_text)
+
+        self.transport.write(bytes_text, host_port)
+
+
+def run(protocolClass, packets):
+    """
+    Returns the CPU time spent per packet answering ``packets`` questions.
+    """
+    serverProtocol = protocolClass(FakeSibylServerProxy())
+    serverProtocol.transport = FakeDatagramTransport()
+    question = b'What is the answer to life, the universe and everything?'
+    datagram = HEADER.pack(int(time.time()), len(question)) + question
+    host_port = ('127.0.0.1', 4242)
+
+    startCpu = time.process_time()
+    for i in range(packets):
+        serverProtocol.datagramReceived(datagram, host_port)
+    cpu = time.process_time() - startCpu
+
+    return {
+        'implementation': protocolClass.__name__,
+        'packets': packets,
+        'cpu': cpu,
+        'microseconds_per_packet': cpu / packets * 1e6,
+        'bytes_per_response': serverProtocol.transport.bytes / packets,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sibyl UDP binary response CPU benchmark')
+    parser.add_argument('-n', '--packets', dest='packets', type=int,
+                        help='The number of questions answered by each implementation.',
+                        default=200000)
+    options = parser.parse_args()
+
+    results = [run(protocolClass, options.packets)
+               for protocolClass in (LegacyServerUdpBinProtocol, SibylServerUdpBinProtocol)]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
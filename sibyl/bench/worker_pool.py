@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+from twisted.internet import defer, task
+from sibyl.protocol.sibyl_server_udp_text_protocol import SibylServerUdpTextProtocol
+import sibyl.protocol.sibyl_response_pool as sibyl_response_pool
+from sibyl.bench.fakes import FakeSibylServerProxy
+import argparse
+import random
+import json
+import time
+
+
+def percentile(values, pr):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pr / 100.0 * (len(values) - 1))))]
+
+
+class RecordingTransport:
+    """
+    Records the time each response is written.  The request number is
+    passed as the port of the client, so that the busy responses can be
+    matched too.
+    """
+
+    def __init__(self):
+        self.replies = {}  # Dictionary request number -> (time, response)
+        self.complete = None
+        self.expected = 0
+
+    def write(self, data, host_port=None):
+        self.replies[host_port[1]] = (time.perf_counter(), data)
+        if self.complete is not None and len(self.replies) == self.expected:
+            self.complete.callback(None)
+
+
+@defer.inlineCallbacks
+def run(reactor, workers, maxPending, requests, rate, slowRatio, slowCost, fastCost, seed):
+    """
+    Sends ``requests`` questions at a constant ``rate`` (open loop) to a
+    SibylServerUdpTextProtocol, a ``slowRatio`` of them taking
+    ``slowCost`` seconds and the others ``fastCost`` seconds to answer.
+    The latency is measured from the time the question was due, so that
+    the time it waits for a blocked reactor is counted.
+    """
+    sibyl_response_pool.pool = None
+    if workers:
+        sibyl_response_pool.enable(workers, maxPending)
+
+    rng = random.Random(seed)
+    slow = [rng.random() < slowRatio for i in range(requests)]
+    proxy = FakeSibylServerProxy(lambda request: slowCost if b'slow' in request else fastCost)
+    transport = RecordingTransport()
+    transport.expected = requests
+    transport.complete = defer.Deferred()
+    serverProtocol = SibylServerUdpTextProtocol(proxy)
+    serverProtocol.transport = transport
+
+    startTime = time.perf_counter() + 0.1
+    due = [startTime + i / rate for i in range(requests)]
+
+    def ask(i):
+        kind = b'slow' if slow[i] else b'fast'
+        serverProtocol.datagramReceived(b'%d: %s question %d\r\n' % (int(time.time()), kind, i), ('127.0.0.1', i))
+
+    for i in range(requests):
+        reactor.callLater(due[i] - time.perf_counter(), ask, i)
+    yield transport.complete
+
+    latencies = {True: [], False: []}
+    shed = 0
+    for i, (replyTime, data) in transport.replies.items():
+        if sibyl_response_pool.BUSY_RESPONSE.encode('utf-8') in data:
+            shed += 1
+        else:
+            latencies[slow[i]].append(replyTime - due[i])
+
+    def summary(values):
+        return {
+            'count': len(values),
+            'p50': percentile(values, 50),
+            'p99': percentile(values, 99),
+            'max': max(values) if values else None,
+        }
+
+    return {
+        'workers': workers,
+        'max_pending': maxPending if workers else None,
+        'requests': requests,
+        'rate': rate,
+        'shed': shed,
+        'fast': summary(latencies[False]),
+        'slow': summary(latencies[True]),
+    }
+
+
+@defer.inlineCallbacks
+def runBenchmark(reactor, options):
+    results = []
+    for workers in [int(workers) for workers in options.workers.split(',')]:
+        result = yield run(reactor, workers, options.maxPending, options.requests, options.rate,
+                           options.slowRatio, options.slowCost, options.fastCost, options.seed)
+        results.append(result)
+    print(json.dumps(results, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sibyl worker pool benchmark (mixed-cost questions)')
+    parser.add_argument('-n', '--requests', dest='requests', type=int,
+                        help='The number of questions sent for each configuration.',
+                        default=2000)
+    parser.add_argument('-r', '--rate', dest='rate', type=float,
+                        help='The number of questions sent per second.',
+                        default=500)
+    parser.add_argument('-w', '--workers', dest='workers',
+                        help='The comma separated numbers of workers (0: in the reactor thread).',
+                        default='0,4,16')
+    parser.add_argument('--max-pending', dest='maxPending', type=int,
+                        help='The maximum number of responses being generated.',
+                        default=256)
+    parser.add_argument('--slow-ratio', dest='slowRatio', type=float,
+                        help='The ratio of slow questions.',
+                        default=0.05)
+    parser.add_argument('--slow-cost', dest='slowCost', type=float,
+                        help='The time (in seconds) spent answering a slow question.',
+                        default=0.02)
+    parser.add_argument('--fast-cost', dest='fastCost', type=float,
+                        help='The time (in seconds) spent answering a fast question.',
+                        default=0.0002)
+    parser.add_argument('--seed', dest='seed', type=int,
+                        help='The seed of the question mix.',
+                        default=0)
+    options = parser.parse_args()
+
+    task.react(runBenchmark, [options])
+
+
+if __name__ == '__main__':
+    main()
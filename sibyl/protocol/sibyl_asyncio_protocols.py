@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+"""
+asyncio versions of the Sibyl server and client protocols, for the
+services running an asyncio event loop.  They speak the same messages
+as the Twisted ones (through the shared codecs) and use the same
+response cache and rate limiter when they are enabled.
+"""
+import asyncio
+import logging
+from sibyl.protocol.sibyl_bin_codec import HEADER, SibylBinDeframer, FramingError, BatchAnswer, \
+    isBatch, packDatagram, packQuestions, packTcpMessage, unpackBatch
+from sibyl.protocol.sibyl_text_codec import formatTextRequest, parseTextRequest, formatTextResponse, \
+    parseTextResponse
+from sibyl.protocol.sibyl_pending_requests import PendingRequests, REQUEST_TIMEOUT, MAX_ATTEMPTS, \
+    TIMEOUT_RESPONSE
+from sibyl.protocol.sibyl_response_pool import BUSY_RESPONSE
+import sibyl.protocol.sibyl_response_cache as sibyl_response_cache
+import sibyl.protocol.sibyl_rate_limiter as sibyl_rate_limiter
+
+logging.basicConfig()
+moduleLogger = logging.getLogger('sibyl.protocol.sibyl_asyncio_protocols')
+
+
+def installUvloop():
+    """
+    Makes asyncio create uvloop event loops when uvloop is installed.
+    Returns whether it is used.
+    """
+    try:
+        import uvloop
+    except ImportError:
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True
+
+
+class AsyncioDelayedCall:
+
+    def __init__(self, loop, delay, func, args):
+        self.called = False
+        self.func = func
+        self.args = args
+        self.handle = loop.call_later(delay, self.fire)
+
+    def fire(self):
+        self.called = True
+        self.func(*self.args)
+
+    def active(self):
+        return not (self.called or self.handle.cancelled())
+
+    def cancel(self):
+        self.handle.cancel()
+
+
+class AsyncioClock:
+    # The part of the reactor interface used by PendingRequests
+
+    def __init__(self, loop):
+        self.loop = loop
+
+    def seconds(self):
+        return self.loop.time()
+
+    def callLater(self, delay, func, *args):
+        return AsyncioDelayedCall(self.loop, delay, func, args)
+
+
+class SibylAsyncioResponder:
+    """
+    Answers the questions of the asyncio servers, from the shared cache
+    when it is enabled.  With an ``executor``, the responses are
+    generated outside of the event loop, at most ``maxPending`` at a
+    time; the other questions get BUSY_RESPONSE.
+    """
+
+    def __init__(self, sibylServerProxy, executor=None, maxPending=64):
+        self.sibylServerProxy = sibylServerProxy
+        self.executor = executor
+        self.maxPending = maxPending
+        self.pending = 0
+        self.shed = 0
+
+    def respond(self, request, question, reply):
+        if self.executor is None:
+            reply(sibyl_response_cache.generateResponse(self.sibylServerProxy, request, question))
+            return
+
+        cache = sibyl_response_cache.getCache()
+        key = None
+        if cache is not None:
+            key = sibyl_response_cache.normalizeQuestion(question)
+            response = cache.get(key)
+            if response is not None:
+                reply(response)
+                return
+
+        if self.pending >= self.maxPending:
+            self.shed += 1
+            reply(BUSY_RESPONSE)
+            return
+        self.pending += 1
+        future = asyncio.get_event_loop().run_in_executor(self.executor, self.sibylServerProxy.generateResponse,
+                                                          request)
+        future.add_done_callback(lambda future: self.generated(future, cache, key, reply))
+
+    def generated(self, future, cache, key, reply):
+        self.pending -= 1
+        # A failed generation is answered as well, the client (or its batch) would wait for it otherwise
+        if future.cancelled():
+            reply(BUSY_RESPONSE)
+            return
+        if future.exception() is not None:
+            moduleLogger.error('response generation failed: %r', future.exception())
+            reply(BUSY_RESPONSE)
+            return
+        if cache is not None:
+            cache.put(key, future.result())
+        reply(future.result())
+
+
+class SibylAsyncioServerBase:
+
+    def __init__(self, sibylServerProxy, responder=None):
+        self.sibylServerProxy = sibylServerProxy
+        self.responder = responder if responder is not None else SibylAsyncioResponder(sibylServerProxy)
+        self.limiter = sibyl_rate_limiter.getLimiter()
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+
+class SibylAsyncioUdpTextServer(SibylAsyncioServerBase, asyncio.DatagramProtocol):
+
+    def datagram_received(self, datagram, host_port):
+        # Datagrams over the rate of their source are dropped undecoded
+        if self.limiter is not None and not self.limiter.allow(host_port[0]):
+            return
+        self.responder.respond(datagram, parseTextRequest(datagram),
+                               lambda rsp: self.transport.sendto(formatTextResponse(rsp), host_port))
+
+
+class SibylAsyncioUdpBinServer(SibylAsyncioServerBase, asyncio.DatagramProtocol):
+
+    def datagram_received(self, datagram, host_port):
+        # Datagrams over the rate of their source are dropped undecoded
+        if self.limiter is not None and not self.limiter.allow(host_port[0]):
+            return
+
+        if not isBatch(datagram):
+            if len(datagram) < HEADER.size:
+                return
+            # The timestamp field of the question (the request id of the clients) is sent back
+            timestamp = HEADER.unpack_from(datagram)[0]
+            self.responder.respond(datagram, datagram[HEADER.size:],
+                                   lambda rsp: self.sendResponse(timestamp, rsp, host_port))
+            return
+
+        try:
+            records = unpackBatch(datagram)
+        except FramingError:
+            return
+        answer = BatchAnswer(records, lambda batches: self.sendBatches(batches, host_port))
+        for index, (recordId, question) in enumerate(records):
+            self.responder.respond(question, question,
+                                   lambda rsp, index=index, recordId=recordId: answer.reply(index, recordId, rsp))
+
+    def sendResponse(self, timestamp, rsp, host_port):
+        self.transport.sendto(packDatagram(timestamp, str(rsp).encode('utf-8')), host_port)
+
+    def sendBatches(self, batches, host_port):
+        for batch in batches:
+            self.transport.sendto(batch, host_port)
+
+
+class SibylAsyncioTcpBinServer(SibylAsyncioServerBase, asyncio.Protocol):
+
+    def __init__(self, sibylServerProxy, responder=None):
+        SibylAsyncioServerBase.__init__(self, sibylServerProxy, responder)
+        self.deframer = SibylBinDeframer()
+
+    def data_received(self, data):
+        try:
+            messages = self.deframer.feed(data)
+        except FramingError:
+            # The stream can not be resynchronised
+            self.transport.close()
+            return
+
+        for timestamp, question in messages:
+            # The request is the whole frame (header included), as received
+            self.responder.respond(packTcpMessage(timestamp, question), question,
+                                   lambda rsp, timestamp=timestamp: self.sendResponse(timestamp, rsp))
+
+    def sendResponse(self, timestamp, rsp):
+        if not self.transport.is_closing():
+            self.transport.write(packTcpMessage(timestamp, str(rsp).encode('utf-8')))
+
+
+class SibylAsyncioUdpTextClient(asyncio.DatagramProtocol):
+    """
+    The clients take the object whose ``responseReceived`` gets the
+    responses (the SibylClientProxy of the Twisted clients), and must be
+    created with a remote address (see :py:func:`createClient`).
+    """
+
+    def __init__(self, sibylClientProxy):
+        self.clientProxy = sibylClientProxy
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def sendRequest(self, line):
+        self.transport.sendto(formatTextRequest(line))
+
+    def datagram_received(self, datagram, host_port):
+        self.clientProxy.responseReceived(parseTextResponse(datagram))
+
+
+class SibylAsyncioUdpBinClient(asyncio.DatagramProtocol):
+
+    def __init__(self, sibylClientProxy):
+        self.clientProxy = sibylClientProxy
+        self.transport = None
+        self.pending = PendingRequests(AsyncioClock(asyncio.get_event_loop()), self.requestExpired,
+                                       self.resendRequest)
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def connection_lost(self, exc):
+        self.pending.clear()
+
+    def sendRequest(self, line):
+        self.sendRequests([line])
+
+    def sendRequests(self, lines):
+        records = []
+        for line in lines:
+            payload = line.encode('utf-8')
+            records.append((self.pending.add(payload), payload))
+        for datagram in packQuestions(records):
+            self.transport.sendto(datagram)
+
+    def resendRequest(self, requestId, payload):
+        self.transport.sendto(packDatagram(requestId, payload))
+
+    def requestExpired(self, requestId):
+        self.clientProxy.responseReceived(str(requestId) + TIMEOUT_RESPONSE)
+
+    def datagram_received(self, datagram, host_port):
+        if not isBatch(datagram):
+            if len(datagram) >= HEADER.size:
+                # The timestamp field carries the request id, sent back by the server
+                requestId, length = HEADER.unpack_from(datagram)
+                if self.pending.pop(requestId) is not None:
+                    response = datagram[HEADER.size:HEADER.size + length]
+                    self.clientProxy.responseReceived(str(requestId) + response.decode('utf-8', 'replace'))
+            return
+
+        try:
+            records = unpackBatch(datagram)
+        except FramingError:
+            return
+        for recordId, response in records:
+            # Responses to unknown ids (duplicates) are dropped
+            if self.pending.pop(recordId) is not None:
+                self.clientProxy.responseReceived(str(recordId) + response.decode('utf-8', 'replace'))
+
+
+class SibylAsyncioTcpBinClient(asyncio.Protocol):
+
+    def __init__(self, sibylClientProxy):
+        self.clientProxy = sibylClientProxy
+        self.transport = None
+        self.deframer = SibylBinDeframer()
+        # Nothing is sent again over TCP, a question is given up when the
+        # UDP client would have given it up
+        self.pending = PendingRequests(AsyncioClock(asyncio.get_event_loop()), self.requestExpired,
+                                       timeout=REQUEST_TIMEOUT * MAX_ATTEMPTS)
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.clientProxy.connectionSuccess()
+
+    def connection_lost(self, exc):
+        self.pending.clear()
+
+    def sendRequest(self, line):
+        line = line.encode('utf-8')
+        # The timestamp field carries the request id, sent back by the server
+        self.transport.write(packTcpMessage(self.pending.add(line), line))
+
+    def requestExpired(self, requestId):
+        self.clientProxy.responseReceived(str(requestId) + TIMEOUT_RESPONSE)
+
+    def data_received(self, data):
+        try:
+            messages = self.deframer.feed(data)
+        except FramingError:
+            self.transport.close()
+            return
+
+        for requestId, response in messages:
+            if self.pending.pop(requestId) is not None:
+                self.clientProxy.responseReceived(str(requestId) + response.decode('utf-8', 'replace'))
+
+
+SERVERS = {
+    'udp_text': SibylAsyncioUdpTextServer,
+    'udp_bin': SibylAsyncioUdpBinServer,
+    'tcp_bin': SibylAsyncioTcpBinServer,
+}
+
+CLIENTS = {
+    'udp_text': SibylAsyncioUdpTextClient,
+    'udp_bin': SibylAsyncioUdpBinClient,
+    'tcp_bin': SibylAsyncioTcpBinClient,
+}
+
+
+async def createServer(flavour, sibylServerProxy, host='0.0.0.0', port=1800, responder=None):
+    """
+    Starts a ``flavour`` server ('udp_text', 'udp_bin' or 'tcp_bin') on
+    the running loop.  Returns the datagram transport of the UDP servers
+    and the :py:class:`asyncio.Server` of the TCP one.
+    """
+    loop = asyncio.get_event_loop()
+    serverClass = SERVERS[flavour]
+    if responder is None:
+        responder = SibylAsyncioResponder(sibylServerProxy)
+
+    if flavour == 'tcp_bin':
+        return await loop.create_server(lambda: serverClass(sibylServerProxy, responder), host, port)
+    transport, serverProtocol = await loop.create_datagram_endpoint(
+        lambda: serverClass(sibylServerProxy, responder), local_addr=(host, port))
+    return transport
+
+
+async def createClient(flavour, sibylClientProxy, host, port):
+    """
+    Connects a ``flavour`` client to a server.  Returns the client
+    protocol, whose ``sendRequest`` sends a question.
+    """
+    loop = asyncio.get_event_loop()
+    clientClass = CLIENTS[flavour]
+
+    if flavour == 'tcp_bin':
+        transport, clientProtocol = await loop.create_connection(lambda: clientClass(sibylClientProxy), host, port)
+    else:
+        transport, clientProtocol = await loop.create_datagram_endpoint(
+            lambda: clientClass(sibylClientProxy), remote_addr=(host, port))
+    return clientProtocol
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+import struct
+
+# Header of the binary messages: Timestamp | Length
+HEADER = struct.Struct('!IH')
+
+"""
+Batched UDP messages: BATCH_HEADER (Marker | Length | Count), Length
+being the size of the whole datagram, followed by Count records, each
+one made of HEADER (Id | Length of the question or response) and the
+question or response.  The responses to a batch are sent as batches, a
+response record carrying the Id of its question.
+"""
+BATCH_MARKER = 0xFFFFFFFF
+BATCH_HEADER = struct.Struct('!IHH')
+
+# Largest batch sent, so that the datagrams are not fragmented
+DEFAULT_MTU = 1400
+# Largest batch the Length field can describe
+MAX_BATCH_SIZE = 0xFFFF
+
+
+class FramingError(Exception):
+    pass
+
+
+class SibylBinDeframer:
+    """
+    Incremental deframer for the TCP binary messages, whose length field
+    counts the whole message (header included).  The bytes of an
+    incomplete message are kept until the next call of :py:meth:`feed`,
+    and one call may return any number of messages.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        """
+        Returns the list of (timestamp, payload) of the messages completed
+        by ``data``.  Raises :py:class:`FramingError` when a length field
+        is smaller than the header.
+        """
+        buffer = self.buffer
+        buffer += data
+        messages = []
+        offset = 0
+
+        while len(buffer) - offset >= HEADER.size:
+            timestamp, length = HEADER.unpack_from(buffer, offset)
+            if length < HEADER.size:
+                raise FramingError('invalid message length %d' % length)
+            if len(buffer) - offset < length:
+                break
+            messages.append((timestamp, bytes(buffer[offset + HEADER.size:offset + length])))
+            offset += length
+
+        if offset:
+            del buffer[:offset]
+        return messages
+
+
+def packTcpMessage(timestamp, payload):
+    return HEADER.pack(timestamp, len(payload) + HEADER.size) + payload
+
+
+def packDatagram(timestamp, payload):
+    return HEADER.pack(timestamp, len(payload)) + payload
+
+
+def packQuestions(records, mtu=DEFAULT_MTU):
+    """
+    Returns the datagrams carrying the (id, question) ``records``: a lone
+    question in the plain format, its id in the timestamp field (sent
+    back by the servers), several ones in batches.
+    """
+    if len(records) == 1:
+        return [packDatagram(*records[0])]
+    return packBatches(records, mtu)
+
+
+def isBatch(datagram):
+    return len(datagram) >= BATCH_HEADER.size and datagram[:4] == b'\xff\xff\xff\xff'
+
+
+def packBatches(records, mtu=DEFAULT_MTU):
+    """
+    Returns the datagrams carrying the (id, payload) ``records``, as few
+    as possible of at most ``mtu`` bytes.  A record too large for the
+    MTU is sent alone; raises ValueError when it is too large for a
+    batch at all (MAX_BATCH_SIZE).
+    """
+    mtu = min(mtu, MAX_BATCH_SIZE)
+    datagrams = []
+    parts = []
+    size = BATCH_HEADER.size
+
+    for recordId, payload in records:
+        recordSize = HEADER.size + len(payload)
+        if BATCH_HEADER.size + recordSize > MAX_BATCH_SIZE:
+            raise ValueError('record %d of %d bytes too large for a batch' % (recordId, len(payload)))
+        if parts and size + recordSize > mtu:
+            datagrams.append(BATCH_HEADER.pack(BATCH_MARKER, size, len(parts) // 2) + b''.join(parts))
+            parts = []
+            size = BATCH_HEADER.size
+        parts.append(HEADER.pack(recordId, len(payload)))
+        parts.append(payload)
+        size += recordSize
+
+    if parts:
+        datagrams.append(BATCH_HEADER.pack(BATCH_MARKER, size, len(parts) // 2) + b''.join(parts))
+    return datagrams
+
+
+def unpackBatch(datagram):
+    """
+    Returns the list of (id, payload) records of a batch.  Raises
+    :py:class:`FramingError` when the datagram is truncated or its
+    lengths are inconsistent.
+    """
+    marker, length, count = BATCH_HEADER.unpack_from(datagram)
+    if length != len(datagram):
+        raise FramingError('batch length %d for a datagram of %d bytes' % (length, len(datagram)))
+
+    records = []
+    offset = BATCH_HEADER.size
+    for i in range(count):
+        if offset + HEADER.size > length:
+            raise FramingError('truncated batch')
+        recordId, recordLength = HEADER.unpack_from(datagram, offset)
+        offset += HEADER.size
+        if offset + recordLength > length:
+            raise FramingError('truncated batch')
+        records.append((recordId, bytes(datagram[offset:offset + recordLength])))
+        offset += recordLength
+    return records
+
+
+class BatchAnswer:
+    """
+    Collects the responses to the (id, question) records of a batch, in
+    any order, and passes the datagrams of the response batches to
+    ``send`` once all of them are known.
+    """
+
+    def __init__(self, records, send):
+        self.responses = [None] * len(records)
+        self.remaining = len(records)
+        self.send = send
+
+    def reply(self, index, recordId, rsp):
+        self.responses[index] = (recordId, str(rsp).encode('utf-8'))
+        self.remaining -= 1
+        if self.remaining == 0:
+            self.send(packBatches(self.responses))
@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
 from twisted.internet.protocol import Protocol
-import struct
-from time import time
+from twisted.internet import reactor
+from sibyl.protocol.sibyl_bin_codec import SibylBinDeframer, FramingError, packTcpMessage
+from sibyl.protocol.sibyl_pending_requests import PendingRequests, REQUEST_TIMEOUT, MAX_ATTEMPTS, TIMEOUT_RESPONSE
 
 class SibylClientTcpBinProtocol(Protocol):
     """
@@ -43,6 +44,12 @@ class SibylClientTcpBinProtocol(Protocol):
                         interface;
         """
         self.clientProxy = sibylProxy
+        self.deframer = SibylBinDeframer()
+        self.clock = reactor
+        # Nothing is sent again over TCP, a question is given up when the
+        # UDP client would have given it up
+        self.pending = PendingRequests(self.clock, self.requestExpired,
+                                       timeout=REQUEST_TIMEOUT * MAX_ATTEMPTS)
 
     def connectionMade(self):
         """
@@ -68,11 +75,14 @@ class SibylClientTcpBinProtocol(Protocol):
 
         """        
         line = line.encode('utf-8')
-        t = int(time.time())
-        c = str(len(line))
-        b = '!IH' + c + 's'
-        buf = struct.pack(b, t, len(line) + 6, line)
-        self.transport.write(buf)
+        # The timestamp field carries the request id, sent back by the server
+        self.transport.write(packTcpMessage(self.pending.add(line), line))
+
+    def requestExpired(self, requestId):
+        self.clientProxy.responseReceived(str(requestId) + TIMEOUT_RESPONSE)
+
+    def connectionLost(self, reason):
+        self.pending.clear()
 
     def dataReceived(self, line):
         """Called by Twisted whenever a data is received
@@ -89,10 +99,12 @@ class SibylClientTcpBinProtocol(Protocol):
             as Twisted calls it.
 
         """
-        buffer_len = int.from_bytes(line[4:5], byteorder='little')  
-        b = '!IH' + str(buffer_len) + 's'
-        msg_rcv = struct.unpack_from(b, line)
-        
-        msg = str(msg_rcv[0]) + str(msg_rcv[2])
-        self.clientProxy.responseReceived(msg)
-    
\ No newline at end of file
+        try:
+            messages = self.deframer.feed(line)
+        except FramingError:
+            self.transport.loseConnection()
+            return
+
+        for requestId, response in messages:
+            if self.pending.pop(requestId) is not None:
+                self.clientProxy.responseReceived(str(requestId) + response.decode('utf-8', 'replace'))
@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
 from twisted.internet.protocol import DatagramProtocol
-import time
-import struct
+from twisted.internet import reactor
+from sibyl.protocol.sibyl_bin_codec import HEADER, FramingError, isBatch, packDatagram, packQuestions, unpackBatch
+from sibyl.protocol.sibyl_pending_requests import PendingRequests, TIMEOUT_RESPONSE
 
 class SibylClientUdpBinProtocol(DatagramProtocol):
     """
@@ -55,6 +56,12 @@ class SibylClientUdpBinProtocol(DatagramProtocol):
         self.serverAddress = host
         self.serverPort = port
         self.clientProxy = sibylClientProxy
+        self.clock = reactor
+        self.pending = PendingRequests(self.clock, self.requestExpired, self.resendRequest)
+
+    def startProtocol(self):
+        # The socket is connected once, for all the requests
+        self.transport.connect(self.serverAddress, self.serverPort)
 
     def sendRequest(self, line):
         """Called by the controller to send the request
@@ -70,12 +77,30 @@ class SibylClientUdpBinProtocol(DatagramProtocol):
             as the controller calls it.
 
         """
-        self.transport.connect(self.serverAddress, self.serverPort)
-        
-        c = str(len(line))
-        b = '!IH' + c + 's'
-        buf = struct.pack(b, int(time.time()), len(line), line.encode('utf-8'))
-        self.transport.write(buf)
+        self.sendRequests([line])
+
+    def sendRequests(self, lines):
+        """Sends the questions ``lines``, alone in a datagram or in as few
+        batched datagrams as possible.  Each one gets an id, sent back
+        with its response, and is sent again when its response does not
+        come in time.
+        """
+        records = []
+        for line in lines:
+            payload = line.encode('utf-8')
+            records.append((self.pending.add(payload), payload))
+
+        for datagram in packQuestions(records):
+            self.transport.write(datagram)
+
+    def resendRequest(self, requestId, payload):
+        self.transport.write(packDatagram(requestId, payload))
+
+    def requestExpired(self, requestId):
+        self.clientProxy.responseReceived(str(requestId) + TIMEOUT_RESPONSE)
+
+    def stopProtocol(self):
+        self.pending.clear()
 
     def datagramReceived(self, datagram, host):
         """Called by Twisted whenever a datagram is received
@@ -91,11 +116,25 @@ class SibylClientUdpBinProtocol(DatagramProtocol):
             as Twisted calls it.
 
         """
-    
-        buffer_len = int.from_bytes(datagram[4:5], byteorder='little')  
-        b = '!IH' + str(buffer_len) + 's'
-        msg_rcv = struct.unpack_from(b, datagram)
-        
-        msg = str(msg_rcv[0]) + str(msg_rcv[2]) 
-        self.clientProxy.responseReceived(msg)
-    
+        if isBatch(datagram):
+            self.batchReceived(datagram)
+            return
+        if len(datagram) < HEADER.size:
+            return
+
+        # The timestamp field carries the request id, sent back by the server
+        requestId, length = HEADER.unpack_from(datagram)
+        if self.pending.pop(requestId) is not None:
+            response = datagram[HEADER.size:HEADER.size + length]
+            self.clientProxy.responseReceived(str(requestId) + response.decode('utf-8', 'replace'))
+
+    def batchReceived(self, datagram):
+        try:
+            records = unpackBatch(datagram)
+        except FramingError:
+            return
+
+        for recordId, response in records:
+            # Responses to unknown ids (duplicates) are dropped
+            if self.pending.pop(recordId) is not None:
+                self.clientProxy.responseReceived(str(recordId) + response.decode('utf-8', 'replace'))
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 from twisted.internet.protocol import DatagramProtocol
-import time
+from sibyl.protocol.sibyl_text_codec import formatTextRequest, parseTextResponse
 
 class SibylClientUdpTextProtocol(DatagramProtocol):
     """
@@ -56,6 +56,10 @@ class SibylClientUdpTextProtocol(DatagramProtocol):
         self.serverPort = port
         self.clientProxy = sibylClientProxy
 
+    def startProtocol(self):
+        # The socket is connected once, for all the requests
+        self.transport.connect(self.serverAddress, self.serverPort)
+
     def sendRequest(self, line):
         """Called by the controller to send the request
 
@@ -70,16 +74,8 @@ class SibylClientUdpTextProtocol(DatagramProtocol):
             as the controller calls it.
 
         """
-     
-        t = str(time.time())
-        rsp = str(line)
-        rsp_client = t + ': ' + rsp + '\r\n'
-        self.transport.connect(self.serverAddress, self.serverPort)
-        self.transport.write(rsp_client.encode('utf-8'))
-        
-
+        self.transport.write(formatTextRequest(line))
 
-        
     def datagramReceived(self, datagram, host_port):
         """Called by Twisted whenever a datagram is received
 
@@ -94,4 +90,4 @@ class SibylClientUdpTextProtocol(DatagramProtocol):
             as Twisted calls it.
 
         """
-        self.clientProxy.responseReceived(str(datagram.decode('utf-8')))
+        self.clientProxy.responseReceived(parseTextResponse(datagram))
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import time
+from sibyl.protocol.sibyl_bin_codec import BATCH_MARKER
+
+# Seconds waited for a response before sending the question again
+REQUEST_TIMEOUT = 1.0
+# Number of times a question is sent before giving up
+MAX_ATTEMPTS = 4
+# Response reported to the user when a question is given up
+TIMEOUT_RESPONSE = 'No response from the Sibyl'
+
+
+class PendingRequests:
+    """
+    The questions of a client waiting for their response, by request id.
+    The ids are taken from a 32 bit counter seeded with the current time,
+    so that a server echoing the header field keeps working, skipping
+    BATCH_MARKER which would make a plain datagram look like a batch.
+
+    A question left unanswered ``timeout`` seconds is passed to
+    ``resend(requestId, payload)`` until it has been sent ``maxAttempts``
+    times, then to ``expire(requestId)``.  Without ``resend`` (TCP) the
+    question expires after its first timeout.
+    """
+
+    def __init__(self, clock, expire, resend=None, timeout=REQUEST_TIMEOUT, maxAttempts=MAX_ATTEMPTS):
+        self.clock = clock
+        self.expire = expire
+        self.resend = resend
+        self.timeout = timeout
+        self.maxAttempts = maxAttempts if resend is not None else 1
+        self.nextId = int(time.time())
+        self.requests = {}  # Dictionary id -> [payload, attempts, timeout call]
+
+    def add(self, payload):
+        requestId = self.nextId & 0xFFFFFFFF
+        if requestId == BATCH_MARKER:
+            self.nextId += 1
+            requestId = self.nextId & 0xFFFFFFFF
+        self.nextId += 1
+        self.requests[requestId] = [payload, 1, self.clock.callLater(self.timeout, self.timedOut, requestId)]
+        return requestId
+
+    def pop(self, requestId):
+        """
+        Returns the payload of the question ``requestId``, or None when no
+        response is expected for it (duplicate or given up).
+        """
+        request = self.requests.pop(requestId, None)
+        if request is None:
+            return None
+        if request[2].active():
+            request[2].cancel()
+        return request[0]
+
+    def timedOut(self, requestId):
+        request = self.requests[requestId]
+        if request[1] >= self.maxAttempts:
+            del self.requests[requestId]
+            self.expire(requestId)
+            return
+        request[1] += 1
+        request[2] = self.clock.callLater(self.timeout, self.timedOut, requestId)
+        self.resend(requestId, request[0])
+
+    def clear(self):
+        for request in self.requests.values():
+            if request[2].active():
+                request[2].cancel()
+        self.requests.clear()
+
+    def __len__(self):
+        return len(self.requests)
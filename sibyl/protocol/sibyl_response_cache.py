@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+from collections import OrderedDict
+import time
+import logging
+
+logging.basicConfig()
+moduleLogger = logging.getLogger('sibyl.protocol.sibyl_response_cache')
+
+# The cache shared by the server protocols, None while it is disabled
+cache = None
+
+
+def normalizeQuestion(question):
+    # Questions differing only by case or spacing get the same response
+    return b' '.join(bytes(question).lower().split())
+
+
+class SibylResponseCache:
+    """
+    LRU cache of the responses of the SibylServerProxy, keyed by the
+    normalized question.  It holds at most ``maxSize`` responses, each
+    one for ``ttl`` seconds.
+    """
+
+    def __init__(self, maxSize=1024, ttl=60, clock=time.monotonic):
+        self.maxSize = maxSize
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()  # Dictionary question -> (expiry, response)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            if entry[0] > self.clock():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self.entries[key]
+            self.expirations += 1
+        self.misses += 1
+        return None
+
+    def put(self, key, response):
+        self.entries[key] = (self.clock() + self.ttl, response)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxSize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def getResponse(self, sibylServerProxy, request, question):
+        key = normalizeQuestion(question)
+        response = self.get(key)
+        if response is None:
+            response = sibylServerProxy.generateResponse(request)
+            self.put(key, response)
+        return response
+
+    def stats(self):
+        return {
+            'size': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+def generateResponse(sibylServerProxy, request, question):
+    """
+    Returns the response of ``sibylServerProxy`` to ``request``, from the
+    shared cache when it is enabled.  ``question`` is the part of the
+    request holding the question (without header nor timestamp).
+    """
+    if cache is None:
+        return sibylServerProxy.generateResponse(request)
+    return cache.getResponse(sibylServerProxy, request, question)
+
+
+def getCache():
+    return cache
+
+
+def enable(maxSize, ttl, statsInterval=None):
+    """
+    Enables the response cache shared by the server protocols.  Its
+    counters are logged (at the INFO level) every ``statsInterval``
+    seconds when given.
+    """
+    global cache
+    cache = SibylResponseCache(maxSize, ttl)
+
+    if statsInterval:
+        from twisted.internet import task
+        task.LoopingCall(lambda: moduleLogger.info('response cache: %s', cache.stats())).start(statsInterval, now=False)
+    return cache
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+from twisted.internet import defer, reactor
+from twisted.internet.threads import deferToThreadPool
+from twisted.python.threadpool import ThreadPool
+import sibyl.protocol.sibyl_response_cache as sibyl_response_cache
+import logging
+
+logging.basicConfig()
+moduleLogger = logging.getLogger('sibyl.protocol.sibyl_response_pool')
+
+# Sent instead of the response when too many responses are being generated
+BUSY_RESPONSE = 'The Sibyl is busy, please ask again later.'
+
+# The pool shared by the server protocols, None while the responses are
+# generated in the reactor thread
+pool = None
+
+
+class SibylResponsePool:
+    """
+    Generates the responses outside of the reactor thread, either in a
+    dedicated thread pool of ``workers`` threads or with ``executor``
+    (any :py:class:`concurrent.futures.Executor`; with a process pool
+    the SibylServerProxy must be picklable).
+
+    At most ``maxPending`` responses are generated or queued at the same
+    time, :py:meth:`submit` refuses the others.
+    """
+
+    def __init__(self, workers=4, maxPending=64, executor=None):
+        self.maxPending = maxPending
+        self.executor = executor
+        self.pending = 0
+        self.completed = 0
+        self.shed = 0
+
+        self.threadPool = None
+        if executor is None:
+            self.threadPool = ThreadPool(minthreads=workers, maxthreads=workers, name='sibyl-responses')
+            reactor.callWhenRunning(self.threadPool.start)
+            reactor.addSystemEventTrigger('during', 'shutdown', self.threadPool.stop)
+
+    def submit(self, func, *args):
+        """
+        Returns a Deferred firing with ``func(*args)``, or None when the
+        pool is saturated.
+        """
+        if self.pending >= self.maxPending:
+            self.shed += 1
+            return None
+        self.pending += 1
+
+        if self.executor is None:
+            d = deferToThreadPool(reactor, self.threadPool, func, *args)
+        else:
+            d = defer.Deferred()
+            future = self.executor.submit(func, *args)
+            future.add_done_callback(lambda future: reactor.callFromThread(self.futureDone, d, future))
+        d.addBoth(self.done)
+        return d
+
+    @staticmethod
+    def futureDone(d, future):
+        try:
+            d.callback(future.result())
+        except Exception:
+            d.errback()
+
+    def done(self, result):
+        self.pending -= 1
+        self.completed += 1
+        return result
+
+    def stats(self):
+        return {
+            'pending': self.pending,
+            'completed': self.completed,
+            'shed': self.shed,
+        }
+
+
+def respond(sibylServerProxy, request, question, reply):
+    """
+    Calls ``reply`` with the response to ``request``: at once when the
+    response is cached or when the pool is disabled, from the reactor
+    thread once a worker has generated it otherwise.  ``reply`` gets
+    BUSY_RESPONSE when the pool is saturated or the generation failed.
+    """
+    if pool is None:
+        reply(sibyl_response_cache.generateResponse(sibylServerProxy, request, question))
+        return
+
+    cache = sibyl_response_cache.getCache()
+    if cache is not None:
+        key = sibyl_response_cache.normalizeQuestion(question)
+        response = cache.get(key)
+        if response is not None:
+            reply(response)
+            return
+
+    d = pool.submit(sibylServerProxy.generateResponse, request)
+    if d is None:
+        reply(BUSY_RESPONSE)
+        return
+    if cache is not None:
+        d.addCallback(cacheResponse, cache, key)
+    # A failed generation is answered as well, the client (or its batch) would wait for it otherwise
+    d.addCallbacks(reply, generationFailed, errbackArgs=(reply,))
+
+
+def generationFailed(failure, reply):
+    moduleLogger.error('response generation failed: %s', failure.getTraceback())
+    reply(BUSY_RESPONSE)
+
+
+def cacheResponse(response, cache, key):
+    cache.put(key, response)
+    return response
+
+
+def getPool():
+    return pool
+
+
+def enable(workers, maxPending, executor=None):
+    """
+    Enables the generation of the responses outside of the reactor
+    thread for all the server protocols.
+    """
+    global pool
+    pool = SibylResponsePool(workers, maxPending, executor)
+    return pool
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 from twisted.internet.protocol import Protocol
-import time
-import struct
+from sibyl.protocol.sibyl_bin_codec import SibylBinDeframer, FramingError, packTcpMessage
+import sibyl.protocol.sibyl_response_pool as sibyl_response_pool
 
 class SibylServerTcpBinProtocol(Protocol):
     """The class implementing the Sibyl TCP binary server protocol.
@@ -39,6 +39,7 @@ class SibylServerTcpBinProtocol(Protocol):
             sibylServerProxy: the instance of the server proxy.
         """
         self.sibylServerProxy = sibylServerProxy
+        self.deframer = SibylBinDeframer()
 
     def dataReceived(self, line):
         """Called by Twisted whenever a data is received
@@ -56,17 +57,19 @@ class SibylServerTcpBinProtocol(Protocol):
 
         """
 
-        buffer_len = int.from_bytes(line[4:5], byteorder='little')  
-        b = '!IH' + str(buffer_len) + 's'
-        msg_rcv = struct.unpack_from(b, line)
-        
-        rsp = str(self.sibylServerProxy.generateResponse(line))
-        
-        rsp = rsp.encode('utf-8')
-        t = msg_rcv[0]
-        c = str(len(rsp))
-        b = '!IH' + c + 's'
-        buf = struct.pack(b, t, len(rsp) + 6, rsp)
-        self.transport.write(buf)
-
-    
\ No newline at end of file
+        try:
+            messages = self.deframer.feed(line)
+        except FramingError:
+            # The stream can not be resynchronised
+            self.transport.loseConnection()
+            return
+
+        for timestamp, question in messages:
+            # The request is the whole frame (header included), as received
+            sibyl_response_pool.respond(self.sibylServerProxy, packTcpMessage(timestamp, question), question,
+                                        lambda rsp, timestamp=timestamp: self.sendResponse(timestamp, rsp))
+
+    def sendResponse(self, timestamp, rsp):
+        # The responses generated by the workers may be sent out of order,
+        # the timestamp of the question is sent back with them
+        self.transport.write(packTcpMessage(timestamp, str(rsp).encode('utf-8')))
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+from collections import deque
+from sibyl.protocol.sibyl_server_udp_bin_protocol import SibylServerUdpBinProtocol
+from sibyl.protocol.sibyl_bin_codec import FramingError, isBatch, unpackBatch
+import logging
+
+logging.basicConfig()
+moduleLogger = logging.getLogger('sibyl.protocol.sibyl_server_timer_udp_bin_protocol')
+
+# Seconds between two flushes of the received questions
+DEFAULT_TICK = 0.005
+# Datagrams answered by one flush, the others wait for the next one
+DEFAULT_MAX_BATCH = 256
+# Datagrams waiting for a flush, the others are dropped
+DEFAULT_MAX_QUEUE = 65536
+
+# Settings of the protocols instantiated by the server
+tick = DEFAULT_TICK
+maxBatch = DEFAULT_MAX_BATCH
+maxQueue = DEFAULT_MAX_QUEUE
+
+
+class SibylServerTimerUdpBinProtocol(SibylServerUdpBinProtocol):
+    """
+    The Sibyl UDP binary server answering in ticks: the datagrams are
+    queued when received and answered every ``tick`` seconds, at most
+    ``maxBatch`` of them at a time.  The batched questions received from
+    the same address during a tick are answered together, in as few
+    datagrams as possible.
+
+    A flush leaving datagrams in the queue is followed by another one
+    at the next reactor iteration.
+    """
+
+    def __init__(self, sibylServerProxy):
+        SibylServerUdpBinProtocol.__init__(self, sibylServerProxy)
+        self.tick = tick
+        self.maxBatch = maxBatch
+        self.maxQueue = maxQueue
+        self.queue = deque()  # Of (datagram, host_port)
+        self.flushCall = None
+        self.dropped = 0
+
+    def datagramReceived(self, datagram, host_port):
+        # Datagrams over the rate of their source are dropped undecoded
+        if self.limiter is not None and not self.limiter.allow(host_port[0]):
+            return
+
+        if len(self.queue) >= self.maxQueue:
+            self.dropped += 1
+            return
+        self.queue.append((datagram, host_port))
+        if self.flushCall is None:
+            self.flushCall = self.clock.callLater(self.tick, self.flush)
+
+    def flush(self):
+        self.flushCall = None
+        records = {}  # Dictionary host_port -> batched questions
+
+        for i in range(min(self.maxBatch, len(self.queue))):
+            datagram, host_port = self.queue.popleft()
+            if not isBatch(datagram):
+                self.questionReceived(datagram, host_port)
+                continue
+            try:
+                records.setdefault(host_port, []).extend(unpackBatch(datagram))
+            except FramingError:
+                pass
+
+        for host_port, hostRecords in records.items():
+            if hostRecords:
+                self.answerRecords(hostRecords, host_port)
+
+        if self.queue:
+            self.flushCall = self.clock.callLater(0, self.flush)
+
+    def stopProtocol(self):
+        if self.flushCall is not None and self.flushCall.active():
+            self.flushCall.cancel()
+        self.flushCall = None
+
+
+def configure(tickSeconds=None, maxBatchSize=None, maxQueueSize=None):
+    """
+    Sets the tick and batch sizes of the protocols instantiated from now,
+    the defaults of the module for the ones left to None.
+    """
+    global tick, maxBatch, maxQueue
+    tick = tickSeconds if tickSeconds is not None else DEFAULT_TICK
+    maxBatch = maxBatchSize if maxBatchSize is not None else DEFAULT_MAX_BATCH
+    maxQueue = maxQueueSize if maxQueueSize is not None else DEFAULT_MAX_QUEUE
+    moduleLogger.debug('answering every %s s, up to %d datagrams', tick, maxBatch)
@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
 from twisted.internet.protocol import DatagramProtocol
-from time import gmtime, mktime
+from twisted.internet import reactor
+from sibyl.protocol.sibyl_bin_codec import HEADER, FramingError, BatchAnswer, isBatch, packDatagram, unpackBatch
+import sibyl.protocol.sibyl_response_pool as sibyl_response_pool
+import sibyl.protocol.sibyl_rate_limiter as sibyl_rate_limiter
 
 class SibylServerUdpBinProtocol(DatagramProtocol):
     """The class implementing the Sibyl UDP binary server protocol.
@@ -39,6 +42,8 @@ from twisted.internet import reactor
             sibylServerProxy: the instance of the server proxy.
         """
         self.sibylServerProxy = sibylServerProxy
+        self.limiter = sibyl_rate_limiter.getLimiter()
+        self.clock = reactor
         
     def datagramReceived(self, datagram, host_port):
         """Called by Twisted whenever a datagram is received
@@ -55,13 +60,40 @@ from twisted.internet import reactor
 
         """
         
-        time = str(mktime(gmtime()))        
-        rsp = str(self.sibylServerProxy.generateResponse(datagram))
-        rsp_server = time + ': ' + rsp + '\r\n'
-        
-        text = rsp_server.encode('utf-8')
-        hex_text = text.hex()
-        bytes_text = bytes.fromhex(hex_text)
-        
-        self.transport.write(bytes_text, host_port)
-    
+        # Datagrams over the rate of their source are dropped undecoded
+        if self.limiter is not None and not self.limiter.allow(host_port[0]):
+            return
+
+        if isBatch(datagram):
+            self.batchReceived(datagram, host_port)
+        else:
+            self.questionReceived(datagram, host_port)
+
+    def questionReceived(self, datagram, host_port):
+        if len(datagram) < HEADER.size:
+            return
+        # The timestamp field of the question (the request id of the clients) is sent back
+        timestamp = HEADER.unpack_from(datagram)[0]
+        sibyl_response_pool.respond(self.sibylServerProxy, datagram, datagram[HEADER.size:],
+                                    lambda rsp: self.sendResponse(timestamp, rsp, host_port))
+
+    def sendResponse(self, timestamp, rsp, host_port):
+        self.transport.write(packDatagram(timestamp, str(rsp).encode('utf-8')), host_port)
+
+    def batchReceived(self, datagram, host_port):
+        try:
+            records = unpackBatch(datagram)
+        except FramingError:
+            return
+        self.answerRecords(records, host_port)
+
+    def answerRecords(self, records, host_port):
+        # The responses are sent in batches once all of them are known
+        answer = BatchAnswer(records, lambda batches: self.sendBatches(batches, host_port))
+        for index, (recordId, question) in enumerate(records):
+            sibyl_response_pool.respond(self.sibylServerProxy, question, question,
+                                        lambda rsp, index=index, recordId=recordId: answer.reply(index, recordId, rsp))
+
+    def sendBatches(self, batches, host_port):
+        for batch in batches:
+            self.transport.write(batch, host_port)
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 from twisted.internet.protocol import DatagramProtocol
-from time import gmtime, mktime
+from sibyl.protocol.sibyl_text_codec import parseTextRequest, formatTextResponse
+import sibyl.protocol.sibyl_response_pool as sibyl_response_pool
+import sibyl.protocol.sibyl_rate_limiter as sibyl_rate_limiter
 
 class SibylServerUdpTextProtocol(DatagramProtocol):
     """The class implementing the Sibyl UDP text server protocol.
@@ -39,6 +41,7 @@ class SibylServerUdpTextProtocol(DatagramProtocol):
             sibylServerProxy: the instance of the server proxy.
         """
         self.sibylServerProxy = sibylServerProxy
+        self.limiter = sibyl_rate_limiter.getLimiter()
 
     def datagramReceived(self, datagram, host_port):
         """Called by Twisted whenever a datagram is received
@@ -54,9 +57,16 @@ class SibylServerUdpTextProtocol(DatagramProtocol):
                 parameters, as Twisted calls it.
 
         """
-        time = str(mktime(gmtime()))        
-        rsp = str(self.sibylServerProxy.generateResponse(datagram))
-        rsp_server = time + ': ' + rsp + '\r\n'
-        self.transport.write(rsp_server.encode('utf-8'), host_port)
+        # Datagrams over the rate of their source are dropped undecoded
+        if self.limiter is not None and not self.limiter.allow(host_port[0]):
+            return
+
+        # The request is "<timestamp>: <question>\r\n"
+        question = parseTextRequest(datagram)
+        sibyl_response_pool.respond(self.sibylServerProxy, datagram, question,
+                                    lambda rsp: self.sendResponse(rsp, host_port))
+
+    def sendResponse(self, rsp, host_port):
+        self.transport.write(formatTextResponse(rsp), host_port)
         
     
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+from time import gmtime, mktime
+import time
+
+"""
+Text messages: "<timestamp>: <question or response>\r\n", encoded in
+utf-8.  The client sends time.time(), the server mktime(gmtime()).
+"""
+SEPARATOR = b': '
+TERMINATOR = '\r\n'
+
+
+def formatTextRequest(line):
+    return (str(time.time()) + ': ' + str(line) + TERMINATOR).encode('utf-8')
+
+
+def parseTextRequest(datagram):
+    # Returns the question of a request (the whole datagram without separator)
+    return datagram.split(SEPARATOR, 1)[-1]
+
+
+def formatTextResponse(rsp):
+    return (str(mktime(gmtime())) + ': ' + str(rsp) + TERMINATOR).encode('utf-8')
+
+
+def parseTextResponse(datagram):
+    return datagram.decode('utf-8', 'replace')
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+
+parser = argparse.ArgumentParser(description='Sibyl load test')
+parser.add_argument('-t', '--type', dest='flavour',
+                    help='The protocol used by the server (one of ' +
+                    'sibyl.bench.load.FLAVOURS).',
+                    default='udp_bin')
+parser.add_argument('-m', '--machine', dest='host', type=str,
+                    help='The server name or IP address to connect to.',
+                    default='127.0.0.1')
+parser.add_argument('-p', '--port', dest='serverPort', type=int,
+                    help='The port number used by the server.',
+                    default=1800)
+parser.add_argument('-c', '--clients', dest='clients', type=int,
+                    help='The number of synthetic clients.',
+                    default=10)
+parser.add_argument('-d', '--duration', dest='duration', type=float,
+                    help='The duration of the run, in seconds.',
+                    default=10)
+parser.add_argument('--open-loop', dest='mode',
+                    help='Send the questions at a fixed rate instead ' +
+                    'of waiting for the responses.',
+                    action='store_const', const='open', default='closed')
+parser.add_argument('-r', '--rate', dest='rate', type=float,
+                    help='The number of questions sent per second by ' +
+                    'all the clients (open loop).',
+                    default=1000)
+parser.add_argument('--depth', dest='depth', type=int,
+                    help='The number of questions outstanding per ' +
+                    'client (closed loop).',
+                    default=1)
+parser.add_argument('--timeout', dest='timeout', type=float,
+                    help='A question unanswered after this number of ' +
+                    'seconds is counted as dropped.',
+                    default=1)
+parser.add_argument('-o', '--output', dest='outputFile',
+                    help='Write the JSON report to this file instead ' +
+                    'of the standard output.',
+                    default=None)
+parser.add_argument('-e', '--debug',
+                    dest='debugFlag',
+                    help='Raise the log level to debug',
+                    action="store_true",
+                    default=False)
+
+options = parser.parse_args()
+
+# Set path and import SibylBenchStart once the arguments are parsed
+from set_path import set_path
+set_path(options.debugFlag)
+from sibyl.bench.load import SibylBenchStart, FLAVOURS
+
+# The flavours are checked once sibyl.bench.load is importable
+if options.flavour not in FLAVOURS:
+    parser.error('argument -t/--type: invalid choice: %r (choose from %s)' %
+                 (options.flavour, ', '.join(FLAVOURS)))
+
+
+# Call start function
+SibylBenchStart(options.flavour,
+                options.host,
+                options.serverPort,
+                options.clients,
+                options.duration,
+                options.mode,
+                options.rate,
+                options.depth,
+                options.timeout,
+                options.outputFile,
+                options.debugFlag)
@@ -1,16 +1,10 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-# Set path and import SibylStart
-from set_path import set_path
-set_path()
-
 # PYTHON_ARGCOMPLETE_OK
 
 import argcomplete, argparse
 
-from  sibyl.main.sibyl_client import SibylStart
-
 # Settings
 protocol = 'TCP'
 protocolType = 'binary'
@@ -35,6 +29,11 @@ argcomplete.autocomplete(parser)
 
 options = parser.parse_args()
 
+# Set path and import SibylStart once the arguments are parsed
+from set_path import set_path
+set_path(options.debugFlag)
+from sibyl.main.sibyl_client import SibylStart
+
 # Call start function
 SibylStart(protocol, protocolType,
            options.server_port, options.host,
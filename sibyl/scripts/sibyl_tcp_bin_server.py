@@ -1,15 +1,9 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-# Set path and import SibylStart
-from set_path import set_path
-set_path()
-
 # PYTHON_ARGCOMPLETE_OK
 import argcomplete, argparse
 
-from sibyl.main.sibyl_server import SibylStart
-
 # Settings
 protocol = 'TCP'
 protocolType = 'binary'
@@ -24,11 +18,42 @@ parser.add_argument('-e', '--debug',
                     help='Raise the log level to debug',
                     action="store_true",
                     default=False)
+parser.add_argument('--cache-size', dest='cacheSize', type=int,
+                    help='Cache up to this number of responses (no cache by default).',
+                    default=0)
+parser.add_argument('--cache-ttl', dest='cacheTtl', type=float,
+                    help='The time (in seconds) a cached response is used.',
+                    default=60)
+parser.add_argument('--cache-stats', dest='cacheStatsInterval', type=float,
+                    help='Log the cache counters every this number of seconds.',
+                    default=None)
+parser.add_argument('--workers', dest='workers', type=int,
+                    help='Generate the responses in this number of worker threads (in the reactor thread by default).',
+                    default=0)
+parser.add_argument('--max-pending', dest='maxPending', type=int,
+                    help='Answer busy when this number of responses are already being generated.',
+                    default=64)
 
 argcomplete.autocomplete(parser)
 
 options = parser.parse_args()
 
+# Set path and import SibylStart once the arguments are parsed
+from set_path import set_path
+set_path(options.debugFlag)
+from sibyl.main.sibyl_server import SibylStart
+import sibyl.protocol.sibyl_response_cache as sibyl_response_cache
+import sibyl.protocol.sibyl_response_pool as sibyl_response_pool
+import logging
+
+if options.cacheSize > 0:
+    if options.cacheStatsInterval:
+        sibyl_response_cache.moduleLogger.setLevel(logging.INFO)
+    sibyl_response_cache.enable(options.cacheSize, options.cacheTtl,
+                                options.cacheStatsInterval)
+if options.workers > 0:
+    sibyl_response_pool.enable(options.workers, options.maxPending)
+
 
 # Call start function
 SibylStart(protocol, protocolType,
@@ -3,11 +3,6 @@
 
 import argparse
 
-# Set path and import SibylStart
-from set_path import set_path
-set_path()
-from sibyl.main.sibyl_client import SibylStart
-
 # Settings
 protocol = 'UDP'
 protocolType = 'text'
@@ -37,6 +32,11 @@ if __name__ == '__main__':
     parser = create_parser()
     options = parser.parse_args()
 
+    # Set path and import SibylStart once the arguments are parsed
+    from set_path import set_path
+    set_path(options.debugFlag)
+    from sibyl.main.sibyl_client import SibylStart
+
     # Call start function
     SibylStart(protocol, protocolType,
                options.serverPort, options.host,
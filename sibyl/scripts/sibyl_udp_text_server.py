@@ -3,11 +3,6 @@
 
 import argparse
 
-# Set path and import SibylStart
-from set_path import set_path
-set_path()
-from sibyl.main.sibyl_server import SibylStart
-
 # Settings
 protocol = 'UDP'
 protocolType = 'text'
@@ -24,6 +19,30 @@ def create_parser():
                     help='Raise the log level to debug',
                     action="store_true",
                     default=False)
+    parser.add_argument('--cache-size', dest='cacheSize', type=int,
+                    help='Cache up to this number of responses (no cache by default).',
+                    default=0)
+    parser.add_argument('--cache-ttl', dest='cacheTtl', type=float,
+                    help='The time (in seconds) a cached response is used.',
+                    default=60)
+    parser.add_argument('--cache-stats', dest='cacheStatsInterval', type=float,
+                    help='Log the cache counters every this number of seconds.',
+                    default=None)
+    parser.add_argument('--workers', dest='workers', type=int,
+                    help='Generate the responses in this number of worker threads (in the reactor thread by default).',
+                    default=0)
+    parser.add_argument('--max-pending', dest='maxPending', type=int,
+                    help='Answer busy when this number of responses are already being generated.',
+                    default=64)
+    parser.add_argument('--rate-limit', dest='rateLimit', type=float,
+                    help='Drop the datagrams of a source address sending more than this number per second.',
+                    default=None)
+    parser.add_argument('--rate-burst', dest='rateBurst', type=float,
+                    help='The number of datagrams a source address may send at once (twice the rate limit by default).',
+                    default=None)
+    parser.add_argument('--rate-stats', dest='rateStatsInterval', type=float,
+                    help='Log the rate limiter counters every this number of seconds.',
+                    default=None)
     return parser
 
 
@@ -33,6 +52,28 @@ if __name__ == '__main__':
 
     options = parser.parse_args()
 
+    # Set path and import SibylStart once the arguments are parsed
+    from set_path import set_path
+    set_path(options.debugFlag)
+    from sibyl.main.sibyl_server import SibylStart
+    import sibyl.protocol.sibyl_response_cache as sibyl_response_cache
+    import sibyl.protocol.sibyl_response_pool as sibyl_response_pool
+    import sibyl.protocol.sibyl_rate_limiter as sibyl_rate_limiter
+    import logging
+
+    if options.cacheSize > 0:
+        if options.cacheStatsInterval:
+            sibyl_response_cache.moduleLogger.setLevel(logging.INFO)
+        sibyl_response_cache.enable(options.cacheSize, options.cacheTtl,
+                                    options.cacheStatsInterval)
+    if options.workers > 0:
+        sibyl_response_pool.enable(options.workers, options.maxPending)
+    if options.rateLimit:
+        if options.rateStatsInterval:
+            sibyl_rate_limiter.moduleLogger.setLevel(logging.INFO)
+        sibyl_rate_limiter.enable(options.rateLimit, options.rateBurst,
+                                  options.rateStatsInterval)
+
     # Call start function
     SibylStart(protocol, protocolType,
                options.server_port,
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+from twisted.trial import unittest
+from twisted.internet.task import Clock
+from sibyl.protocol.sibyl_client_udp_bin_protocol import SibylClientUdpBinProtocol
+from sibyl.protocol.sibyl_server_udp_bin_protocol import SibylServerUdpBinProtocol
+from sibyl.protocol.sibyl_pending_requests import PendingRequests, REQUEST_TIMEOUT
+from sibyl.protocol.sibyl_bin_codec import HEADER, BATCH_MARKER, MAX_BATCH_SIZE, isBatch, packBatches, unpackBatch
+from sibyl.bench.fakes import FakeSibylServerProxy
+
+
+class RecordingTransport:
+
+    def __init__(self):
+        self.written = []
+
+    def write(self, data, host_port=None):
+        self.written.append(data)
+
+
+class RecordingClientProxy:
+
+    def __init__(self):
+        self.responses = []
+
+    def responseReceived(self, response):
+        self.responses.append(response)
+
+
+class SingleQuestionTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.clientProxy = RecordingClientProxy()
+        self.client = SibylClientUdpBinProtocol(self.clientProxy, 4242, '127.0.0.1')
+        self.clock = Clock()
+        self.client.pending = PendingRequests(self.clock, self.client.requestExpired, self.client.resendRequest)
+        self.client.transport = RecordingTransport()
+        self.server = SibylServerUdpBinProtocol(FakeSibylServerProxy())
+        self.server.limiter = None
+        self.server.transport = RecordingTransport()
+
+    def answer(self, datagram):
+        self.server.datagramReceived(datagram, ('127.0.0.1', 5000))
+        self.client.datagramReceived(self.server.transport.written.pop(), ('127.0.0.1', 4242))
+
+    def test_singleQuestionFormat(self):
+        self.client.sendRequest('Will it rain?')
+        [datagram] = self.client.transport.written
+        self.assertFalse(isBatch(datagram))
+        requestId, length = HEADER.unpack_from(datagram)
+        self.assertEqual(datagram[HEADER.size:], b'Will it rain?')
+        self.assertEqual(length, len(b'Will it rain?'))
+
+        # The server sends the request id back with the response
+        self.answer(datagram)
+        self.assertEqual(len(self.client.pending), 0)
+        self.assertEqual(len(self.clientProxy.responses), 1)
+        self.assertTrue(self.clientProxy.responses[0].startswith(str(requestId)))
+
+    def test_resentInSingleFormat(self):
+        self.client.sendRequest('Will it rain?')
+        self.clock.advance(REQUEST_TIMEOUT)
+        first, resent = self.client.transport.written
+        self.assertEqual(first, resent)
+
+        # The response to the first copy is shown, the duplicate is dropped
+        self.answer(first)
+        self.answer(resent)
+        self.assertEqual(len(self.clientProxy.responses), 1)
+
+    def test_severalQuestionsBatched(self):
+        self.client.sendRequests(['Will it rain?', 'Will it snow?'])
+        [datagram] = self.client.transport.written
+        self.assertTrue(isBatch(datagram))
+        self.assertEqual([question for recordId, question in unpackBatch(datagram)],
+                         [b'Will it rain?', b'Will it snow?'])
+        self.answer(datagram)
+        self.assertEqual(len(self.clientProxy.responses), 2)
+        self.assertEqual(len(self.client.pending), 0)
+
+    def test_batchMarkerNotUsedAsId(self):
+        self.client.pending.nextId = BATCH_MARKER
+        self.client.sendRequest('Will it rain?')
+        [datagram] = self.client.transport.written
+        self.assertFalse(isBatch(datagram))
+        self.answer(datagram)
+        self.assertEqual(len(self.clientProxy.responses), 1)
+
+    def test_recordTooLargeForBatch(self):
+        # A record larger than the MTU is sent alone, but its length must fit the batch header
+        [datagram] = packBatches([(1, b'x' * 60000)])
+        self.assertEqual(len(unpackBatch(datagram)), 1)
+        self.assertRaises(ValueError, packBatches, [(1, b'x' * MAX_BATCH_SIZE)])
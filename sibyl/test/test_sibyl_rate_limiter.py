@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+import logging
+from twisted.trial import unittest
+import sibyl.protocol.sibyl_rate_limiter as sibyl_rate_limiter
+
+
+class EnableTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(setattr, sibyl_rate_limiter, 'limiter', None)
+
+    def test_defaultBurst(self):
+        self.assertIsInstance(sibyl_rate_limiter.enable(10), sibyl_rate_limiter.RateLimiter)
+        self.assertIs(sibyl_rate_limiter.getLimiter(), sibyl_rate_limiter.limiter)
+        self.assertEqual(sibyl_rate_limiter.limiter.burst, 20)
+
+    def test_logLevelUntouched(self):
+        sibyl_rate_limiter.enable(10, 5)
+        self.assertEqual(sibyl_rate_limiter.moduleLogger.level, logging.NOTSET)
+
+
+class RateLimiterTestCase(unittest.TestCase):
+
+    def test_burstThenRate(self):
+        now = [0.0]
+        limiter = sibyl_rate_limiter.RateLimiter(10, 5, clock=lambda: now[0])
+        self.assertEqual([limiter.allow('10.0.0.1') for i in range(6)], [True] * 5 + [False])
+        now[0] += 0.1
+        self.assertEqual([limiter.allow('10.0.0.1') for i in range(2)], [True, False])
+        self.assertEqual(limiter.stats(), {'sources': 1, 'allowed': 6, 'dropped': 2})